@@ -1 +1,2 @@
-__all__ = ['network', 'index', 'ed', 'sced']
\ No newline at end of file
+__all__ = ['network', 'index', 'ed', 'sced', 'stream', 'reduction', 'backend', 'security', 'service', 'instrument',
+           'topology', 'result', 'sensitivity', 'benchmark']
@@ -0,0 +1,234 @@
+import numpy as np
+import scipy as sp
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from . import _parallel
+
+
+def partition(network, areas=None):
+    '''Area (0, ..., K - 1) of every bus.
+
+    areas is None to partition by bus['BUS_AREA'], an array with the label of every bus, or the number of areas of an
+    automatic partition. The automatic partition splits the reverse Cuthill-McKee ordering of the buses into
+    contiguous parts of equal size, which keeps the buses of each part close in the network graph.
+    '''
+    if areas is None:
+        labels = network.bus['BUS_AREA']
+    elif np.ndim(areas) == 0:
+        online = np.where(network.branch['BR_STATUS'] != 0)[0]
+        f_bus = network.branch['F_BUS'][online].astype(int) - 1
+        t_bus = network.branch['T_BUS'][online].astype(int) - 1
+        A = sp.sparse.csr_matrix((np.ones((len(online), )), (f_bus, t_bus)), (network.n_b, network.n_b))
+        order = sp.sparse.csgraph.reverse_cuthill_mckee(A + A.transpose(), symmetric_mode=True)
+        labels = np.empty((network.n_b, ), dtype=int)
+        labels[order] = np.arange(network.n_b) * int(areas) // network.n_b
+    else:
+        labels = np.asarray(areas)
+        if labels.shape != (network.n_b, ):
+            raise ValueError('Invalid areas shape. (Required: (%d,); Provided: %s)' % (network.n_b, labels.shape))
+
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def constructLP(network, labels, angle=np.pi):
+    '''Construct the B-theta LP of every area and the consistency constraints that couple them.
+
+    The LP of an area has the generators and bus angles of its buses as well as copies of the angles of the buses in
+    other areas that are connected to it by a tie line. It balances the power at its buses and limits the flows on
+    its lines and tie lines. Angles are bounded by +-angle so that the LPs remain bounded under any prices.
+
+    Returns the LPs (c, A_ub, b_ub, A_eq, b_eq, lb, ub), the (generators, buses, external buses) of every area, whose
+    generator dispatch and angles make up its variables in that order, and the coupling: for every copy of an angle,
+    the area and position of the copy and the area and position of the angle in the area that owns the bus.
+    '''
+    online = network.online
+    f_bus = network.branch['F_BUS'][online].astype(int) - 1
+    t_bus = network.branch['T_BUS'][online].astype(int) - 1
+    gen_bus = network.gen['GEN_BUS'].astype(int) - 1
+    rate = network.branch['RATE_A'][online]
+    cost = network.gencost['COST'][:, -2]
+    slack = network.bus['BUS_TYPE'] == 3
+
+    Bbus = sp.sparse.csr_matrix(network.Bbus)
+    Bf = sp.sparse.csr_matrix(network.Bf)
+
+    lps, buses = [], []
+    for a in range(np.max(labels) + 1):
+        owned = np.where(labels == a)[0]
+        lines = np.where((labels[f_bus] == a) | (labels[t_bus] == a))[0]
+        external = np.setdiff1d(np.concatenate((f_bus[lines], t_bus[lines])), owned)
+        local = np.concatenate((owned, external))
+        gens = np.where(labels[gen_bus] == a)[0]
+
+        n_g, n_own, n_loc = len(gens), len(owned), len(local)
+        position = np.full((network.n_b, ), -1, dtype=int)
+        position[owned] = np.arange(n_own)
+        Cg = sp.sparse.csr_matrix((np.ones((n_g, )), (position[gen_bus[gens]], np.arange(n_g))), (n_own, n_g))
+
+        flow = Bf[lines][:, local]
+        c = np.concatenate((cost[gens], np.zeros((n_loc, ))))
+        A_ub = sp.sparse.bmat([[sp.sparse.csr_matrix((len(lines), n_g)), flow],
+                               [sp.sparse.csr_matrix((len(lines), n_g)), -flow]], 'csr')
+        b_ub = np.concatenate((rate[lines], rate[lines]))
+        A_eq = sp.sparse.bmat([[Cg, -Bbus[owned][:, local]]], 'csr')
+        b_eq = network.bus['PD'][owned]
+
+        # The angle of the slack bus is the reference of the angles of all areas
+        bound = np.where(np.concatenate((slack[owned], np.zeros((n_loc - n_own, ), dtype=bool))), 0., angle)
+        lb = np.concatenate((np.zeros((n_g, )), -bound))
+        ub = np.concatenate((network.gen['PMAX'][gens], bound))
+
+        lps.append((c, A_ub, b_ub, A_eq, b_eq, lb, ub))
+        buses.append((gens, owned, external))
+
+    # Copies of the angles of external buses and the angles they copy
+    copies = [(a, len(buses[a][0]) + len(buses[a][1]) + np.arange(len(buses[a][2])), buses[a][2])
+              for a in range(len(buses))]
+    copy_area = np.concatenate([np.full((len(ext), ), a, dtype=int) for a, _, ext in copies])
+    copy_pos = np.concatenate([pos for _, pos, _ in copies]).astype(int)
+    copy_bus = np.concatenate([ext for _, _, ext in copies]).astype(int)
+
+    owner_pos = np.empty((network.n_b, ), dtype=int)
+    for gens, owned, _ in buses:
+        owner_pos[owned] = len(gens) + np.arange(len(owned))
+
+    coupling = {'copy_area': copy_area, 'copy_pos': copy_pos, 'owner_area': labels[copy_bus],
+                'owner_pos': owner_pos[copy_bus]}
+
+    return lps, buses, coupling
+
+
+def solve(lps, coupling, backend, solveropts=None, workers=None, tol=1e-4, gap=1e-3, max_iter=500, penalty=1.):
+    '''Solve the area LPs by Dantzig-Wolfe decomposition of the angle consistency constraints.
+
+    A master LP combines the solutions of every area found so far subject to the consistency constraints, with
+    violations allowed at the given penalty per radian. The area LPs, priced by the duals of the master, add their
+    solutions as long as they improve on the master, and their costs give a (Lagrangian) lower bound. Whenever the
+    master is optimal with inconsistent angles the penalty is increased tenfold. Iterates until the largest
+    inconsistency is below tol and the cost is within a relative gap of the lower bound, or max_iter iterations.
+
+    Returns the combined solution of every area and a report of the iterations, the residual, the cost of the
+    combined solution and the lower bound of every iteration, and the final penalty. The solution satisfies the
+    constraints of every area, but only satisfies the consistency constraints, and so is feasible, if converged.
+    '''
+    K = len(lps)
+    m = len(coupling['copy_pos'])
+
+    # Consistency constraints of every area: D_a x_a sums to copy - owner over the areas
+    rows = np.arange(m)
+    D = []
+    for a in range(K):
+        copy, owner = coupling['copy_area'] == a, coupling['owner_area'] == a
+        D.append(sp.sparse.csr_matrix((np.concatenate((np.ones((np.sum(copy), )), -np.ones((np.sum(owner), )))),
+                                       (np.concatenate((rows[copy], rows[owner])),
+                                        np.concatenate((coupling['copy_pos'][copy], coupling['owner_pos'][owner])))),
+                                      (m, len(lps[a][0]))))
+
+    report = {'iterations': 0, 'converged': False, 'residual': [], 'primal': [], 'dual': [], 'penalty': penalty}
+    columns = [[] for _ in range(K)]
+    best = -np.inf
+
+    executor = None
+    if workers is not None and workers > 1 and K > 1:
+        executor = _parallel.pool(workers, initializer=_init, initargs=(lps, solveropts, backend))
+
+    def price(C):
+        if executor is not None:
+            X = list(executor.map(_area, range(K), C))
+        else:
+            X = [_solveArea(lps[a], C[a], solveropts, backend) for a in range(K)]
+        for a in range(K):
+            if X[a] is None:
+                raise RuntimeError('Failed to solve the LP of area %d.' % a)
+        return X
+
+    try:
+        # Initial columns of the area LPs without prices
+        X = price([lp[0] for lp in lps])
+        for a in range(K):
+            columns[a].append(X[a])
+
+        for k in range(max_iter):
+            weights, y = _master(lps, D, columns, report['penalty'], backend, solveropts)
+            pi, sigma = y[:m], y[m:]
+
+            average = [np.dot(w, cols) for w, cols in zip(weights, columns)]
+            r = sum(D[a].dot(average[a]) for a in range(K))
+            rbar = np.max(np.abs(r), initial=0.)
+            primal = sum(lps[a][0].dot(average[a]) for a in range(K))
+
+            # Columns of the area LPs under the prices of the master and the lower bound from their costs
+            C = [lps[a][0] - D[a].transpose().dot(pi) for a in range(K)]
+            X = price(C)
+            reduced = np.array([C[a].dot(X[a]) - sigma[a] for a in range(K)])
+            best = max(best, sum(C[a].dot(X[a]) for a in range(K)))
+
+            report['iterations'] = k + 1
+            report['residual'].append(rbar)
+            report['primal'].append(primal)
+            report['dual'].append(best)
+
+            optimal = primal - best <= gap * max(1., abs(primal))
+            if rbar <= tol and optimal:
+                report['converged'] = True
+                break
+
+            improving = reduced < -1e-9 * max(1., abs(primal))
+            if rbar > tol and (optimal or not np.any(improving)):
+                report['penalty'] *= 10.
+            for a in np.where(improving)[0]:
+                columns[a].append(X[a])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return average, report
+
+
+def _master(lps, D, columns, penalty, backend, solveropts):
+    # Master LP over the weights of the columns of every area, with penalized slacks of the consistency constraints
+    K, m = len(lps), D[0].shape[0]
+    n = [len(cols) for cols in columns]
+    area = np.repeat(np.arange(K), n)
+
+    c = np.concatenate([[lps[a][0].dot(x) for x in columns[a]] for a in range(K)] + [np.full((2 * m, ), penalty)])
+    A = np.column_stack([D[a].dot(x) for a in range(K) for x in columns[a]])
+    I = sp.sparse.identity(m, format='csr')
+    E = sp.sparse.csr_matrix((np.ones((len(area), )), (area, np.arange(len(area)))), (K, len(area)))
+    A_eq = sp.sparse.bmat([[sp.sparse.csr_matrix(A), I, -I], [E, None, None]], 'csr')
+    b_eq = np.concatenate((np.zeros((m, )), np.ones((K, ))))
+    lb, ub = np.zeros((len(c), )), np.full((len(c), ), np.inf)
+
+    res = backend.solve((c, sp.sparse.csr_matrix((0, len(c))), np.zeros((0, )), A_eq, b_eq, lb, ub), solveropts)
+    if res['x'] is None:
+        raise RuntimeError('Failed to solve the master LP of the area decomposition.')
+    duals = backend.duals(res)
+    if duals is None:
+        raise ValueError('The area decomposition requires a backend with dual values. (Required: highs; Provided: %s)'
+                         % backend.name)
+
+    w = np.asarray(res['x'], dtype=float)[:len(area)]
+    return np.split(w, np.cumsum(n)[:-1]), np.asarray(duals[1], dtype=float)
+
+
+def _solveArea(lp, c, solveropts, backend):
+    _, A_ub, b_ub, A_eq, b_eq, lb, ub = lp
+    res = backend.solve((c, A_ub, b_ub, A_eq, b_eq, lb, ub), solveropts)
+    if res['x'] is None:
+        return None
+    x = np.asarray(res['x'], dtype=float)
+    return x if x.shape == c.shape else None
+
+
+_worker = dict()
+
+
+def _init(lps, solveropts, backend):
+    _worker['lps'] = lps
+    _worker['solveropts'] = solveropts
+    _worker['backend'] = backend
+
+
+def _area(a, c):
+    return _solveArea(_worker['lps'][a], c, _worker['solveropts'], _worker['backend'])
@@ -0,0 +1,71 @@
+import concurrent.futures
+import multiprocessing.resource_tracker
+import multiprocessing.shared_memory
+
+import numpy as np
+
+# Arrays published by the parent process, attached by name in each worker
+shared = dict()
+_handles = []
+
+
+class SharedArrays:
+    '''Publish numpy arrays to worker processes through shared memory instead of pickling them.'''
+
+    def __init__(self, **arrays):
+        self._shm = []
+        self.spec = dict()
+        for name, a in arrays.items():
+            a = np.ascontiguousarray(a)
+            shm = multiprocessing.shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+            self._shm.append(shm)
+            self.spec[name] = (shm.name, a.shape, a.dtype.str)
+
+    def __getitem__(self, name):
+        for shm in self._shm:
+            if shm.name == self.spec[name][0]:
+                return np.ndarray(self.spec[name][1], self.spec[name][2], buffer=shm.buf)
+        raise KeyError(name)
+
+    def close(self):
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(spec, initializer, initargs):
+    for name, (shm_name, shape, dtype) in spec.items():
+        # The parent owns the segments; keep the resource tracker from unlinking them when a worker exits
+        register = multiprocessing.resource_tracker.register
+        multiprocessing.resource_tracker.register = lambda *args: None
+        try:
+            shm = multiprocessing.shared_memory.SharedMemory(name=shm_name)
+        finally:
+            multiprocessing.resource_tracker.register = register
+        _handles.append(shm)
+        shared[name] = np.ndarray(shape, dtype, buffer=shm.buf)
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def pool(workers, arrays=None, initializer=None, initargs=()):
+    '''Process pool whose workers have the given SharedArrays, if any, attached in _parallel.shared.'''
+    return concurrent.futures.ProcessPoolExecutor(workers, initializer=_attach,
+                                                  initargs=(dict() if arrays is None else arrays.spec, initializer,
+                                                            initargs))
+
+
+def chunks(n, workers, chunksize=None):
+    '''Split range(n) into contiguous (start, stop) chunks for distribution over the workers.'''
+    if chunksize is None:
+        chunksize = max(1, -(-n // (4 * workers)))
+    return [(start, min(start + chunksize, n)) for start in range(0, n, chunksize)]
@@ -1,112 +1,83 @@
 import numpy as np
 import scipy as sp
 import scipy.sparse
-import stukapy as st
+import scipy.cluster.hierarchy
 
+from . import _parallel, instrument, result, sensitivity
 
-def constructLP(network, formulation, alphap):
+
+def constructLP(network, formulation, alphap, workers=None, outages=None, prob=None):
+    '''Construct the decomposed risk-based SCED LP.
+
+    Only the line outages with the given indices into network.lineOutages are included (default: all), with the given
+    probabilities (default: those of the outages). The remaining probability is attributed to the base case.
+    '''
     if formulation == 'ISF':
         c, Aub, bub, Cub, Aeq, beq, Ceq, lb, ub = [], [], [], [], [], [], [], [], []
-        p0 = 1.
-
-        for lineOutage in network.lineOutages:
-            p0 -= lineOutage['prob']
-
-            # State: yk, dgk+ (positive post-generation), dgk- (negative post-generation), ddkp (load shed), slack (flexibility)
-            H = sp.sparse.csc_matrix(lineOutage['ISF'])
-            Hg = sp.sparse.csc_matrix(lineOutage['ISF'][:, network.gen['GEN_BUS'] - 1])
-
-            # Delta formulation
-            ck = alphap * np.concatenate((lineOutage['prob'] * np.ones((1,)),
-                                          np.zeros((network.n_g,)),
-                                          np.zeros((network.n_g,)),
-                                          np.zeros((network.n_b,)),
-                                          999999 * np.ones((network.n_g,)),
-                                          999999 * np.ones((network.n_l - 1,))))
-
-            # Constraints
-            # yk >= c^T dgk+ + c^T dgk- + v^T ddkp + c^T g - z
-            # H(g - d) - slack <= f_dal
-            # dgk+ - dgk- + g >= 0
-            # dgk+ - dgk- + g <= gmax
-            # H(g + dgk+ - dgk- + ddkp - s - d) <= f_ste
-            # dgk+ - dgk- <= delta g
-            # -dgk+ + dgk- <= delta g
-            Aubk = sp.sparse.bmat(
-                [[-1, network.gencost['COST'][:, -2], network.gencost['COST'][:, -2], network.voll, None, None],
-                 [None, None, None, None, None, -sp.sparse.eye(network.n_l - 1)],
-                 [None, None, None, None, None, -sp.sparse.eye(network.n_l - 1)],
-                 [None, -sp.sparse.eye(network.n_g), sp.sparse.eye(network.n_g), None, -sp.sparse.eye(network.n_g),
-                  None],
-                 [None, sp.sparse.eye(network.n_g), -sp.sparse.eye(network.n_g), None, -sp.sparse.eye(network.n_g),
-                  None],
-                 [None, Hg, -Hg, H, None, -sp.sparse.eye(network.n_l - 1)],
-                 [None, -Hg, Hg, -H, None, -sp.sparse.eye(network.n_l - 1)],
-                 [None, sp.sparse.eye(network.n_g), -sp.sparse.eye(network.n_g), None, -sp.sparse.eye(network.n_g),
-                  None],
-                 [None, -sp.sparse.eye(network.n_g), sp.sparse.eye(network.n_g), None, -sp.sparse.eye(network.n_g),
-                  None]
-                 ], 'csc')
-            Cubk = sp.sparse.bmat([[-1, 0, network.gencost['COST'][:, -2]],
-                                   [None, None, Hg],
-                                   [None, None, -Hg],
-                                   [None, None, -sp.sparse.eye(network.n_g)],
-                                   [None, None, sp.sparse.eye(network.n_g)],
-                                   [None, None, Hg],
-                                   [None, None, -Hg],
-                                   [np.zeros((network.n_g, 1)), None, None],
-                                   [np.zeros((network.n_g, 1)), None, None]
-                                   ], 'csc')
-            bubk = np.concatenate((np.zeros((1,)),
-                                   lineOutage['branch']['RATE_C'] + H.dot(network.bus['PD']),
-                                   lineOutage['branch']['RATE_C'] - H.dot(network.bus['PD']),
-                                   np.zeros((network.n_g,)),
-                                   network.gen['PMAX'],
-                                   lineOutage['branch']['RATE_B'] + H.dot(network.bus['PD']),
-                                   lineOutage['branch']['RATE_B'] - H.dot(network.bus['PD']),
-                                   network.gen['RAMP_AGC'] * 5,
-                                   network.gen['RAMP_AGC'] * 5
-                                   ))
-
-            Aeqk = sp.sparse.bmat([[np.zeros((1, 1)), np.ones((network.n_g,)), -np.ones((network.n_g,)),
-                                    np.ones((network.n_b,)), np.zeros((network.n_g,)), np.zeros((network.n_l - 1,))]],
-                                  'csc')
-            Ceqk = sp.sparse.bmat([[np.zeros((1, 1)), np.zeros((1, 1)), np.ones((network.n_g,))]], 'csc')
-            beqk = np.array([np.sum(network.bus['PD'])])
-
-            lbk = np.concatenate((np.zeros((1,)), np.zeros((network.n_g,)), np.zeros((network.n_g,)),
-                                  np.zeros((network.n_b,)), np.zeros((network.n_g,)), np.zeros((network.n_l - 1,))))
-            ubk = np.concatenate((st.inf * np.ones((1,)), st.inf * np.ones((network.n_g,)),
-                                  st.inf * np.ones((network.n_g,)), network.bus['PD'], st.inf * np.ones((network.n_g,)),
-                                  st.inf * np.ones((network.n_l - 1,))))
 
+        gen_bus = network.gen['GEN_BUS'].astype(int) - 1
+
+        # Base-case ISF and flows, from which every outage is formed as a rank-1 update
+        lineOutages = network.lineOutages
+        if outages is None:
+            outages = slice(None)
+        # Dense copy for the assembly; the shared operator is left factorized (see sensitivity.InjectionShiftFactor)
+        ISF = network.ISF.columns(np.arange(network.n_b))
+        flowPD = network.ISF.dot(network.bus['PD'])
+
+        prob = lineOutages.prob[outages] if prob is None else np.asarray(prob, dtype=float)
+        p0 = 1. - np.sum(prob)
+
+        # Large arrays are shared with the workers, the remaining data is passed to each worker once
+        arrays = {'ISF': ISF, 'flowPD': flowPD, 'lines': lineOutages.lines[outages],
+                  'LODF': lineOutages.LODF[:, outages], 'prob': prob,
+                  'online': lineOutages.online, 'RATE_B': network.branch['RATE_B'],
+                  'RATE_C': network.branch['RATE_C']}
+        data = {'COST': network.gencost['COST'][:, -2], 'voll': network.voll, 'PMAX': network.gen['PMAX'],
+                'RAMP_AGC': network.gen['RAMP_AGC'], 'PD': network.bus['PD'], 'gen_bus': gen_bus, 'alphap': alphap,
+                'n_g': network.n_g, 'n_b': network.n_b, 'n_l': network.n_l}
+
+        # The sparsity pattern of a scenario does not depend on the outage: build it once and only fill in the data
+        template = _template(data)
+
+        with instrument.stage('rsced.scenarios', scenarios=len(arrays['lines']), workers=workers):
+            if workers is not None and workers > 1:
+                with _parallel.SharedArrays(**arrays) as shared:
+                    with _parallel.pool(workers, shared, _init, (data,)) as executor:
+                        chunks = _parallel.chunks(len(arrays['lines']), workers)
+                        scenarios = [s for chunk in executor.map(_scenarios, chunks) for s in chunk]
+            else:
+                data.update(arrays)
+                scenarios = [_scenario(data, template, k) for k in range(len(arrays['lines']))]
+
+        # Constant blocks are shared by all scenarios
+        for ck, Aubk, bubk, Cubk in scenarios:
             c.append(ck)
-            Aub.append(Aubk)
+            Aub.append(_fill(template['A_ub'], Aubk))
             bub.append(bubk)
-            Cub.append(Cubk)
-            Aeq.append(Aeqk)
-            beq.append(beqk)
-            Ceq.append(Ceqk)
-            lb.append(lbk)
-            ub.append(ubk)
+            Cub.append(_fill(template['C_ub'], Cubk))
+            Aeq.append(template['A_eq'])
+            beq.append(template['b_eq'])
+            Ceq.append(template['C_eq'])
+            lb.append(template['lb'])
+            ub.append(template['ub'])
 
         c0 = np.concatenate((np.ones((1,)), alphap * p0 * np.ones((1,)), np.zeros((network.n_g,))))
 
-        H = sp.sparse.csc_matrix(network.ISF)
-        Hg = sp.sparse.csc_matrix(network.ISF[:, network.gen['GEN_BUS'] - 1])
+        Hg = sp.sparse.csc_matrix(ISF[:, gen_bus])
 
         Aub0 = sp.sparse.bmat([[-np.ones((1, 1)), -np.ones((1, 1)), network.gencost['COST'][:, -2]],
                                [None, None, Hg],
                                [None, None, -Hg]], 'csc')
         bub0 = np.concatenate((np.zeros((1,)),
-                               network.branch['RATE_A'] + H.dot(network.bus['PD']),
-                               network.branch['RATE_A'] - H.dot(network.bus['PD'])))
+                               network.branch['RATE_A'][network.online] + flowPD,
+                               network.branch['RATE_A'][network.online] - flowPD))
 
         Aeq0 = sp.sparse.bmat([[np.zeros((1, 1)), np.zeros((1, 1)), np.ones((network.n_g,))]], 'csc')
         beq0 = np.array([np.sum(network.bus['PD'])])
 
         lb0 = np.concatenate((np.zeros((2,)), np.zeros((network.n_g,))))
-        ub0 = np.concatenate((st.inf * np.ones((2,)), network.gen['PMAX']))
+        ub0 = np.concatenate((np.inf * np.ones((2,)), network.gen['PMAX']))
 
         c.append(c0)
         Aub.append(Aub0)
@@ -121,5 +92,228 @@ def constructLP(network, formulation, alphap):
     return c, Aub, bub, Cub, Aeq, beq, Ceq, lb, ub
 
 
+def dispatch(network, x):
+    '''Base-case generator dispatch from a solution of the decomposed LP (or of its base block).'''
+    return np.asarray(x)[-network.n_g:]
+
+
+def screen(network, g):
+    '''Worst post-outage overload of every line outage under the generator dispatch g.
+
+    Post-outage flows of all outages are computed at once from the base-case flows and the LODFs and compared against
+    the smaller of the short-term (RATE_B) and emergency (RATE_C) ratings. Returns the largest overload of each outage
+    in network.lineOutages; negative values are the remaining margin.
+    '''
+    outages = network.lineOutages
+
+    injection = -np.array(network.bus['PD'])
+    np.add.at(injection, network.gen['GEN_BUS'].astype(int) - 1, g)
+    flow = network.ISF.dot(injection)
+
+    F = outages.flows(flow)
+    rating = np.minimum(network.branch['RATE_B'], network.branch['RATE_C'])[outages.online]
+
+    return np.max(np.abs(F) - rating[:, None], axis=0)
+
+
+def reduce(network, alphap, size=None, tol=None):
+    '''Reduce the line outages to a smaller set of probability-weighted representatives.
+
+    Outages are compared by their impact: the flow shift of each monitored line when the outaged line carries its
+    long term rating, relative to the contingency rating (the smaller of RATE_B and RATE_C) of the monitored line.
+    Outages are clustered by complete linkage in the largest difference of their impacts, into at most size clusters
+    or into clusters whose impacts differ by at most tol / (alphap * total outage probability). Each cluster is
+    represented by its most severe outage, which carries the probability of the whole cluster.
+
+    Returns a dict with the indices of the representative outages into network.lineOutages ('outages'), their merged
+    probabilities ('prob'), the cluster of every outage ('clusters') and the bound on the error of the CVaR term in
+    units of line loading, alphap times the probability-weighted largest impact difference of every outage from its
+    representative ('error').
+    '''
+    if (size is None) == (tol is None):
+        raise ValueError('Either the number of scenarios or the error bound must be given.')
+
+    outages = network.lineOutages
+    rating = np.minimum(network.branch['RATE_B'], network.branch['RATE_C'])[outages.online]
+    impact = (outages.LODF * network.branch['RATE_A'][outages.online[outages.lines]] / rating[:, None]).transpose()
+    prob = outages.prob
+
+    if len(outages) < 2:
+        clusters = np.zeros((len(outages), ), dtype=int)
+    else:
+        Z = sp.cluster.hierarchy.linkage(impact, method='complete', metric='chebyshev')
+        if size is not None:
+            clusters = sp.cluster.hierarchy.fcluster(Z, max(int(size), 1), criterion='maxclust') - 1
+        else:
+            total = alphap * np.sum(prob)
+            threshold = tol / total if total > 0 else np.inf
+            clusters = sp.cluster.hierarchy.fcluster(Z, threshold, criterion='distance') - 1
+        clusters = np.unique(clusters, return_inverse=True)[1]
+
+    # Representative of each cluster: the outage with the largest impact
+    severity = np.max(np.abs(impact), axis=1) if len(outages) > 0 else np.zeros((0, ))
+    order = np.lexsort((-severity, clusters))
+    first = np.concatenate(([True], clusters[order][1:] != clusters[order][:-1])) if len(order) > 0 else order
+    representative = order[first]
+
+    distance = np.max(np.abs(impact - impact[representative[clusters]]), axis=1, initial=0.)
+
+    return {'outages': representative,
+            'prob': np.bincount(clusters, weights=prob, minlength=len(representative)),
+            'clusters': clusters,
+            'error': alphap * np.sum(prob * distance)}
+
+
 def interpretState(network, x):
-    pass
+    '''Base-case and post-outage flows of the dispatch of a solution of the decomposed LP (see result.Dispatch).
+
+    Prices are not available since the duals of the decomposed LP are not reported.
+    '''
+    return result.Dispatch(network, dispatch(network, x))
+
+
+def _template(data):
+    n_g, n_b, m = data['n_g'], data['n_b'], data['n_l'] - 1
+    g, l, rg, rm = np.arange(n_g), np.arange(m), np.zeros(n_g, dtype=int), np.zeros(m, dtype=int)
+
+    # State: yk, dgk+ (positive post-generation), dgk- (negative post-generation), ddkp (load shed), slack (flexibility)
+    y, p, q, d, s, f = np.cumsum([0, 1, n_g, n_g, n_b, n_g])
+
+    # Constraints
+    # yk >= c^T dgk+ + c^T dgk- + v^T ddkp + c^T g - z
+    # H(g - d) - slack <= f_dal
+    # dgk+ - dgk- + g >= 0
+    # dgk+ - dgk- + g <= gmax
+    # H(g + dgk+ - dgk- + ddkp - s - d) <= f_ste
+    # dgk+ - dgk- <= delta g
+    # -dgk+ + dgk- <= delta g
+    r0, r1, r2, r3, r4, r5, r6, r7, r8 = np.cumsum([0, 1, m, m, n_g, n_g, m, m, n_g])
+    n_row = r8 + n_g
+
+    cost, voll = np.asarray(data['COST'], dtype=float), np.asarray(data['voll'], dtype=float)
+    A_ub = _pattern((n_row, f + m), [
+        (np.zeros(1, dtype=int), y + np.zeros(1, dtype=int), -np.ones(1)),
+        (rg, p + g, cost), (rg, q + g, cost), (np.zeros(n_b, dtype=int), d + np.arange(n_b), voll),
+        (r1 + l, f + l, -np.ones(m)), (r2 + l, f + l, -np.ones(m)),
+        (r3 + g, p + g, -np.ones(n_g)), (r3 + g, q + g, np.ones(n_g)), (r3 + g, s + g, -np.ones(n_g)),
+        (r4 + g, p + g, np.ones(n_g)), (r4 + g, q + g, -np.ones(n_g)), (r4 + g, s + g, -np.ones(n_g)),
+        (r5 + l, f + l, -np.ones(m)), (r6 + l, f + l, -np.ones(m)),
+        (r7 + g, p + g, np.ones(n_g)), (r7 + g, q + g, -np.ones(n_g)), (r7 + g, s + g, -np.ones(n_g)),
+        (r8 + g, p + g, -np.ones(n_g)), (r8 + g, q + g, np.ones(n_g)), (r8 + g, s + g, -np.ones(n_g)),
+        _dense(r5, p, m, n_g), _dense(r5, q, m, n_g), _dense(r5, d, m, n_b),
+        _dense(r6, p, m, n_g), _dense(r6, q, m, n_g), _dense(r6, d, m, n_b)])
+
+    C_ub = _pattern((n_row, 2 + n_g), [
+        (np.zeros(1, dtype=int), np.zeros(1, dtype=int), -np.ones(1)), (rg, 2 + g, cost),
+        (r3 + g, 2 + g, -np.ones(n_g)), (r4 + g, 2 + g, np.ones(n_g)),
+        _dense(r1, 2, m, n_g), _dense(r2, 2, m, n_g), _dense(r5, 2, m, n_g), _dense(r6, 2, m, n_g)])
+
+    # Delta formulation
+    c = data['alphap'] * np.concatenate((np.ones((1,)),
+                                         np.zeros((n_g,)),
+                                         np.zeros((n_g,)),
+                                         np.zeros((n_b,)),
+                                         999999 * np.ones((n_g,)),
+                                         999999 * np.ones((m,))))
+
+    b_ub = np.zeros((n_row,))
+    b_ub[r4:r5] = data['PMAX']
+    b_ub[r7:r8] = data['RAMP_AGC'] * 5
+    b_ub[r8:] = data['RAMP_AGC'] * 5
+
+    return {
+        'c': c,
+        'A_ub': A_ub,
+        'b_ub': b_ub,
+        'C_ub': C_ub,
+        'rows': (r1, r2, r5, r6, n_row),
+        'A_eq': sp.sparse.bmat([[np.zeros((1, 1)), np.ones((n_g,)), -np.ones((n_g,)),
+                                 np.ones((n_b,)), np.zeros((n_g,)), np.zeros((m,))]], 'csc'),
+        'C_eq': sp.sparse.bmat([[np.zeros((1, 1)), np.zeros((1, 1)), np.ones((n_g,))]], 'csc'),
+        'b_eq': np.array([np.sum(data['PD'])]),
+        'lb': np.concatenate((np.zeros((1,)), np.zeros((n_g,)), np.zeros((n_g,)),
+                              np.zeros((n_b,)), np.zeros((n_g,)), np.zeros((m,)))),
+        'ub': np.concatenate((np.inf * np.ones((1,)), np.inf * np.ones((n_g,)),
+                              np.inf * np.ones((n_g,)), data['PD'], np.inf * np.ones((n_g,)),
+                              np.inf * np.ones((m,))))
+    }
+
+
+def _dense(row, col, n_row, n_col):
+    # Coordinates of a dense block in row-major order, with its values to be filled in per scenario
+    return row + np.repeat(np.arange(n_row), n_col), col + np.tile(np.arange(n_col), n_row), None
+
+
+def _pattern(shape, blocks):
+    # CSC structure of the given (rows, cols, vals) blocks with the data slot of every entry of each block
+    rows = np.concatenate([b[0] for b in blocks])
+    cols = np.concatenate([b[1] for b in blocks])
+    A = sp.sparse.csc_matrix((np.arange(1, len(rows) + 1, dtype=float), (rows, cols)), shape)
+
+    slot = np.empty(len(rows), dtype=int)
+    slot[A.data.astype(int) - 1] = np.arange(len(rows))
+    slots = np.split(slot, np.cumsum([len(b[0]) for b in blocks])[:-1])
+
+    data = np.zeros(len(rows))
+    for i, (_, _, vals) in enumerate(blocks):
+        if vals is not None:
+            data[slots[i]] = vals
+
+    # Slots of the dense blocks, i.e. those whose values vary by scenario
+    variable = [slots[i] for i, b in enumerate(blocks) if b[2] is None]
+
+    return data, A.indices, A.indptr, shape, variable
+
+
+def _fill(pattern, data):
+    # Scenario matrix on the shared index arrays of the pattern (the constructor would copy them)
+    A = sp.sparse.csc_matrix((data, pattern[1], pattern[2]), pattern[3])
+    A.indices = pattern[1]
+    A.indptr = pattern[2]
+    return A
+
+
+def _scenario(data, template, k):
+    line = data['lines'][k]
+    lodf = data['LODF'][:, k]
+    monitored = np.delete(data['online'], line)
+    rate_b = data['RATE_B'][monitored]
+    rate_c = data['RATE_C'][monitored]
+
+    Hk = sensitivity.apply_outage(data['ISF'], line, lodf)
+    HPD = sensitivity.apply_outage(data['flowPD'], line, lodf)
+    Hg = Hk[:, data['gen_bus']].ravel()
+    H = Hk.ravel()
+
+    ck = template['c'].copy()
+    ck[0] *= data['prob'][k]
+
+    Aubk = template['A_ub'][0].copy()
+    for slots, vals in zip(template['A_ub'][4], (Hg, -Hg, H, -Hg, Hg, -H)):
+        Aubk[slots] = vals
+
+    Cubk = template['C_ub'][0].copy()
+    for slots, vals in zip(template['C_ub'][4], (Hg, -Hg, Hg, -Hg)):
+        Cubk[slots] = vals
+
+    r1, r2, r5, r6, _ = template['rows']
+    bubk = template['b_ub'].copy()
+    bubk[r1:r2] = rate_c + HPD
+    bubk[r2:r2 + len(HPD)] = rate_c - HPD
+    bubk[r5:r6] = rate_b + HPD
+    bubk[r6:r6 + len(HPD)] = rate_b - HPD
+
+    return ck, Aubk, bubk, Cubk
+
+
+_worker = dict()
+
+
+def _init(data):
+    _worker.update(data)
+    _worker.update(_parallel.shared)
+    _worker['template'] = _template(data)
+
+
+def _scenarios(chunk):
+    return [_scenario(_worker, _worker['template'], k) for k in range(*chunk)]
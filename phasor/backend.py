@@ -0,0 +1,200 @@
+import numpy as np
+import scipy as sp
+import scipy.optimize
+import scipy.sparse
+
+try:
+    import stukapy as st
+except ImportError:
+    st = None
+
+__all__ = ['Backend', 'Stuka', 'HiGHS', 'backends', 'register', 'get', 'default', 'available', 'options', 'flatten']
+
+# Solver options shared by all backends
+OPTIONS = ['max_iter', 'tol', 'x0', 'lp_solver', 'qp_solver', 'dlp_solver']
+
+
+class Backend:
+    '''LP engine.
+
+    solve() takes the LP (c, A_ub, b_ub, A_eq, b_eq, lb, ub) and solveDecomposed() the decomposed LP
+    (c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub), where infinite bounds are given as +-np.inf. Both return a result
+    with at least 'x' and 'fun'. x0 is a warm start that is used unless the solver options provide one; it is ignored
+    by backends that cannot warm start. Backends that cannot solve decomposed LPs solve them as a single LP.
+    Backends that report duals return them from duals().
+    '''
+    name = None
+    decomposed = False
+    warm_start = False
+
+    def available(self):
+        return True
+
+    def solve(self, lp, solveropts=None, x0=None):
+        raise NotImplementedError
+
+    def solveDecomposed(self, dlp, solveropts=None, x0=None):
+        return self.solve(flatten(*dlp), solveropts, x0)
+
+    def duals(self, res):
+        '''Marginals (d fun / d b) of the inequality and equality constraints of a solved LP, or None if unavailable.'''
+        return None
+
+    def __repr__(self):
+        return '%s()' % type(self).__name__
+
+
+class Stuka(Backend):
+    '''Stuka LP solvers through stukapy, which solve decomposed LPs natively.'''
+    name = 'stukapy'
+    decomposed = True
+    warm_start = True
+
+    def available(self):
+        return st is not None
+
+    def options(self, solveropts=None, x0=None):
+        if st is None:
+            raise ImportError('The stukapy backend requires stukapy.')
+
+        if type(solveropts) is st.Options:
+            return solveropts
+
+        opts = st.Options()
+        for key, value in options(solveropts).items():
+            if key in OPTIONS:
+                setattr(opts, key, value)
+        if x0 is not None and 'x0' not in options(solveropts):
+            opts.x0 = x0
+
+        return opts
+
+    def solve(self, lp, solveropts=None, x0=None):
+        c, A_ub, b_ub, A_eq, b_eq, lb, ub = lp
+        opts = self.options(solveropts, x0)
+        return st.linprog(st.LinearProgram(c, A_ub, b_ub, A_eq, b_eq, _inf(lb), _inf(ub)), opts)
+
+    def solveDecomposed(self, dlp, solveropts=None, x0=None):
+        c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = dlp
+        opts = self.options(solveropts, x0)
+        dlp = st.DecomposedLinearProgram(c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, [_inf(l) for l in lb],
+                                         [_inf(u) for u in ub])
+        return st.linprog(dlp, opts)
+
+
+class HiGHS(Backend):
+    '''HiGHS through scipy.optimize.linprog.
+
+    max_iter and tol map to the HiGHS iteration limit and feasibility tolerances, and lp_solver may select the
+    scipy method ('highs', 'highs-ds' or 'highs-ipm'). Options specific to HiGHS are passed as a 'highs' dict. The
+    result is the scipy OptimizeResult, including the dual values of the constraints.
+    '''
+    name = 'highs'
+
+    def options(self, solveropts=None):
+        opts = options(solveropts)
+
+        highs = dict()
+        if opts.get('max_iter') is not None:
+            highs['maxiter'] = int(opts['max_iter'])
+        if opts.get('tol') is not None:
+            highs['primal_feasibility_tolerance'] = opts['tol']
+            highs['dual_feasibility_tolerance'] = opts['tol']
+        highs.update(opts.get('highs', dict()))
+
+        method = opts.get('lp_solver')
+        if type(method) is not str or not method.startswith('highs'):
+            method = 'highs'
+
+        return method, highs
+
+    def solve(self, lp, solveropts=None, x0=None):
+        c, A_ub, b_ub, A_eq, b_eq, lb, ub = lp
+        method, highs = self.options(solveropts)
+        return sp.optimize.linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=np.column_stack((lb, ub)),
+                                   method=method, options=highs)
+
+    def duals(self, res):
+        if res.get('ineqlin') is None or res.get('eqlin') is None:
+            return None
+        return res['ineqlin']['marginals'], res['eqlin']['marginals']
+
+
+# Registered backends by name
+backends = {'stukapy': Stuka, 'highs': HiGHS}
+
+
+def register(name, backend):
+    '''Register a Backend subclass under the given name.'''
+    if not (isinstance(backend, type) and issubclass(backend, Backend)):
+        raise TypeError('Invalid backend type. (Required: phasorpy.backend.Backend subclass; Provided: %s)' % backend)
+    backends[name] = backend
+
+
+def default():
+    '''Name of the default backend: stukapy when it is installed, HiGHS otherwise.'''
+    return 'stukapy' if st is not None else 'highs'
+
+
+def available():
+    '''Names of the registered backends that can be used.'''
+    return [name for name, backend in backends.items() if backend().available()]
+
+
+def get(backend=None):
+    '''Backend instance from a name, an instance or None (the default backend).'''
+    if isinstance(backend, Backend):
+        return backend
+    if backend is None:
+        backend = default()
+    if backend not in backends:
+        raise ValueError('Unknown backend %s. (Available: %s)' % (backend, ', '.join(backends)))
+
+    instance = backends[backend]()
+    if not instance.available():
+        raise ImportError('Backend %s is not available.' % backend)
+    return instance
+
+
+def options(solveropts):
+    '''Solver options as a dict, from None, a dict or stukapy Options.'''
+    if solveropts is None:
+        return dict()
+    if type(solveropts) is dict:
+        return solveropts
+    if st is not None and type(solveropts) is st.Options:
+        opts = {key: getattr(solveropts, key) for key in OPTIONS if getattr(solveropts, key, None) is not None}
+        if 'x0' in opts and len(opts['x0']) == 0:
+            del opts['x0']
+        return opts
+
+    raise TypeError('Invalid solver options. (Required: dict or stukapy.Options; Provided: %s)' % type(solveropts))
+
+
+def flatten(c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub):
+    '''Single LP of a decomposed LP.
+
+    The decomposed LP has K subproblem blocks and the coupling block last: the constraints of subproblem k are
+    A_ub[k] x_k + C_ub[k] x_K <= b_ub[k] (and likewise for the equalities), and those of the coupling block
+    A_ub[K] x_K <= b_ub[K]. The variables of the single LP are those of the blocks in order.
+    '''
+    K = len(C_ub)
+
+    def blocks(A, C):
+        rows = []
+        for k in range(K + 1):
+            row = [None] * (K + 1)
+            row[k] = A[k]
+            if k < K and C[k] is not None:
+                row[K] = C[k]
+            rows.append(row)
+        return sp.sparse.bmat(rows, 'csr')
+
+    return (np.concatenate(c), blocks(A_ub, C_ub), np.concatenate(b_ub), blocks(A_eq, C_eq), np.concatenate(b_eq),
+            np.concatenate(lb), np.concatenate(ub))
+
+
+def _inf(v):
+    # Infinite bounds in the representation of stukapy
+    v = np.asarray(v, dtype=float)
+    return np.where(np.isposinf(v), st.inf, np.where(np.isneginf(v), -st.inf, v))
@@ -0,0 +1,248 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import backend as phasorBackend
+from . import network as phasorNetwork
+from . import security as phasorSecurity
+
+__all__ = ['STAGES', 'benchmark_case', 'run', 'write', 'read', 'compare', 'main']
+
+# Pipeline stages in execution order; each stage uses the products of the stages before it
+STAGES = ['load_case', 'makeDC', 'makeDCLineOutages', 'ED.constructLP(ISF)', 'ED.constructLP(YT)',
+          'ED.solve(ISF)', 'RSCED.constructLP', 'RSCED.solve', 'security_assessment']
+
+FIELDS = ['case', 'stage', 'backend', 'status', 'time', 'peak_memory', 'n_b', 'n_l', 'n_g', 'message']
+
+
+def _measure(fn, repeat, memory):
+    '''Run fn repeat times, returning its last result, the best wall time and the peak traced memory in bytes.'''
+    best, peak, out = np.inf, None, None
+    for _ in range(repeat):
+        if memory:
+            tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - start)
+            if memory:
+                peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+        finally:
+            if memory:
+                tracemalloc.stop()
+
+    return out, best, peak
+
+
+def benchmark_case(case, stages=None, repeat=1, memory=True, workers=None, backend=None, verbose=0):
+    '''Benchmark the pipeline stages on a single case.
+
+    Returns a record for every requested stage with its status ('ok', 'skipped' or 'error'), its best wall time over
+    repeat runs in seconds and its peak memory in bytes as traced by tracemalloc (None if memory is disabled). The LPs
+    are solved with the given backend (see phasorpy.backend); stages that require the solver are skipped if it is not
+    available, as are the stages that depend on a stage that was skipped or failed.
+    '''
+    stages = STAGES if stages is None else [s for s in STAGES if s in stages]
+    state = dict()
+
+    def stage(name):
+        if name == 'load_case':
+            return phasorNetwork.load_case(case)
+        network = state['load_case']
+        # The topology cache is bypassed so that repeated runs measure the construction
+        if name == 'makeDC':
+            return network.makeDC(cache=False)
+        if name == 'makeDCLineOutages':
+            return network.makeDCLineOutages(workers, cache=False)
+        if name == 'security_assessment':
+            # N-1 assessment of the dispatch of the case
+            return phasorSecurity.security_assessment(network, network.gen['PG'])
+
+        phasorED, phasorSCED, engine = state['solvers']
+        if name == 'ED.constructLP(ISF)':
+            return phasorED.EconomicDispatch(network, engine).constructLP('ISF')
+        if name == 'ED.constructLP(YT)':
+            return phasorED.EconomicDispatch(network, engine).constructLP('YT')
+        if name == 'ED.solve(ISF)':
+            return phasorED.EconomicDispatch(network, engine).solve('ISF')
+        if name == 'RSCED.constructLP':
+            return phasorSCED.RSCED(network, workers=workers, backend=engine).constructLP('ISF')
+        if name == 'RSCED.solve':
+            return phasorSCED.RSCED(network, workers=workers, backend=engine).solve('ISF')
+
+    requires = {'makeDC': ['load_case'], 'makeDCLineOutages': ['makeDC'],
+                'ED.constructLP(ISF)': ['makeDC'], 'ED.constructLP(YT)': ['makeDC'], 'ED.solve(ISF)': ['makeDC'],
+                'RSCED.constructLP': ['makeDCLineOutages'], 'RSCED.solve': ['makeDCLineOutages'],
+                'security_assessment': ['makeDCLineOutages']}
+
+    # Prerequisites that were not requested are run once without being recorded
+    needed = set(stages)
+    for name in reversed(STAGES):
+        if name in needed:
+            needed.update(requires.get(name, []))
+
+    records = []
+    failed = set()
+    for name in STAGES:
+        if name not in needed:
+            continue
+
+        record = {'case': os.path.basename(case), 'stage': name, 'backend': None, 'status': 'ok', 'time': None,
+                  'peak_memory': None, 'n_b': None, 'n_l': None, 'n_g': None, 'message': ''}
+
+        if any(r in failed for r in requires.get(name, [])):
+            record['status'] = 'skipped'
+            record['message'] = 'requires %s' % ', '.join(requires[name])
+            failed.add(name)
+        else:
+            # Contingency limits are enforced once, before the first RSCED stage, so all later stages share them
+            if name.startswith('RSCED') and 'load_case' in state and not state.get('limits'):
+                state['load_case'].setContingencyLimits(True)
+                state['limits'] = True
+            try:
+                if name.startswith(('ED', 'RSCED')) and 'solvers' not in state:
+                    # Imported and resolved outside of the timed region
+                    from . import ed as phasorED
+                    from . import sced as phasorSCED
+                    state['solvers'] = (phasorED, phasorSCED, phasorBackend.get(backend))
+                if name.startswith(('ED', 'RSCED')):
+                    record['backend'] = state['solvers'][2].name
+                state[name], record['time'], record['peak_memory'] = _measure(lambda: stage(name),
+                                                                              repeat if name in stages else 1,
+                                                                              memory and name in stages)
+            except ImportError as e:
+                record['status'] = 'skipped'
+                record['message'] = str(e)
+                failed.add(name)
+            except Exception as e:
+                record['status'] = 'error'
+                record['message'] = '%s: %s' % (type(e).__name__, e)
+                failed.add(name)
+
+        if 'load_case' in state:
+            network = state['load_case']
+            record['n_b'], record['n_l'], record['n_g'] = network.n_b, network.n_l, network.n_g
+
+        if verbose:
+            print('%-40s %-22s %-8s %10s %12s' % (record['case'], name, record['status'],
+                                                   '-' if record['time'] is None else '%.4f s' % record['time'],
+                                                   '-' if record['peak_memory'] is None else
+                                                   '%.1f MB' % (record['peak_memory'] / 2**20)))
+
+        if name in stages:
+            records.append(record)
+
+    return records
+
+
+def run(cases=None, stages=None, repeat=1, memory=True, workers=None, backend=None, output=None, verbose=0):
+    '''Benchmark the pipeline stages on the given cases (default: all bundled cases), optionally writing the records.'''
+    if cases is None:
+        cases = sorted(c for c in phasorNetwork.available_cases() if c.endswith('.m'))
+
+    records = []
+    for case in cases:
+        records += benchmark_case(case, stages, repeat, memory, workers, backend, verbose)
+
+    if output is not None:
+        write(records, output)
+
+    return records
+
+
+def write(records, path):
+    '''Write benchmark records to a .json or .csv file.'''
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=1)
+
+
+def read(path):
+    '''Read benchmark records from a .json or .csv file.'''
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, newline='') as f:
+            records = list(csv.DictReader(f))
+        for record in records:
+            for field in ['time', 'peak_memory']:
+                record[field] = float(record[field]) if record[field] not in ('', None) else None
+        return records
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(records, baseline, threshold=1.2, min_time=1e-3):
+    '''Compare benchmark records against a baseline.
+
+    Returns the stages whose time or peak memory grew by more than the given factor, or that succeeded in the
+    baseline but not anymore. Times below min_time seconds are too noisy to compare and are ignored.
+    '''
+    reference = {(r['case'], r['stage']): r for r in baseline}
+
+    regressions = []
+    for record in records:
+        base = reference.get((record['case'], record['stage']))
+        if base is None or base['status'] != 'ok':
+            continue
+
+        if record['status'] != 'ok':
+            regressions.append({'case': record['case'], 'stage': record['stage'], 'metric': 'status',
+                                'baseline': base['status'], 'current': record['status'], 'ratio': None})
+            continue
+
+        for metric, floor in [('time', min_time), ('peak_memory', 0)]:
+            if base[metric] is None or record[metric] is None or max(base[metric], record[metric]) <= floor:
+                continue
+            ratio = record[metric] / max(base[metric], floor, 1e-12)
+            if ratio > threshold:
+                regressions.append({'case': record['case'], 'stage': record['stage'], 'metric': metric,
+                                    'baseline': base[metric], 'current': record[metric], 'ratio': ratio})
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the phasor pipeline stages over MATPOWER cases.')
+    parser.add_argument('cases', nargs='*', help='case files or bundled case names (default: all bundled cases)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, help='stages to benchmark (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per stage; the best time is reported')
+    parser.add_argument('--no-memory', action='store_true', help='disable peak memory tracing')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for outage generation and RSCED')
+    parser.add_argument('--backend', choices=sorted(phasorBackend.backends), help='LP backend (default: stukapy if '
+                        'installed, otherwise highs)')
+    parser.add_argument('--output', help='write the records to this .json or .csv file')
+    parser.add_argument('--baseline', help='compare against the records in this .json or .csv file')
+    parser.add_argument('--threshold', type=float, default=1.2, help='regression factor for the comparison')
+    args = parser.parse_args(argv)
+
+    records = run(args.cases or None, args.stages, args.repeat, not args.no_memory, args.workers, args.backend,
+                  args.output, verbose=1)
+
+    if args.baseline is not None:
+        regressions = compare(records, read(args.baseline), args.threshold)
+        for r in regressions:
+            if r['metric'] == 'status':
+                print('REGRESSION %s %s: %s -> %s' % (r['case'], r['stage'], r['baseline'], r['current']))
+            else:
+                print('REGRESSION %s %s %s: %.4g -> %.4g (x%.2f)' % (r['case'], r['stage'], r['metric'],
+                                                                   r['baseline'], r['current'], r['ratio']))
+        if len(regressions) > 0:
+            return 1
+        print('No regressions against %s.' % args.baseline)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
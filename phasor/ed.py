@@ -1,42 +1,52 @@
+import warnings
+
 import numpy as np
 import scipy as sp
 import scipy.sparse
-import stukapy as st
 
+from . import _area, _parallel
+from . import backend as phasorBackend
+from . import instrument as phasorInstrument
 from . import network as phasorNetwork
+from . import result as phasorResult
 
 __all__ = ['EconomicDispatch']
 
 class EconomicDispatch:
-    def __init__(self, network):
+    def __init__(self, network, backend=None):
         if type(network) is not phasorNetwork.PowerNetwork:
             raise ValueError('Invalid network type. (Required: phasorpy.network.PowerNetwork; Provided: %s)' % type(network))
 
         self.network = network
 
+        # LP engine (see phasorpy.backend); None for the default backend
+        self.backend = backend
+
         if self.network.Bbus is None:
             self.network.makeDC()
 
+        # Constructed LPs, the load and ratings of their right-hand sides and their last solutions, by formulation
+        self.lp = dict()
+        self.rhs = dict()
+        self.x = dict()
+
     def constructLP(self, formulation='ISF'):
         if formulation == 'ISF':
-            bus_ind = np.array([int(ind - 1) for ind in self.network.gen['GEN_BUS']])
-            lineFlow = self.network.ISF[:, bus_ind]
+            bus_ind = self.network.gen['GEN_BUS'].astype(int) - 1
+            lineFlow = sp.sparse.csc_matrix(self.network.ISF.columns(bus_ind))
 
             c = self.network.gencost['COST'][:, -2]
             A_ub = sp.sparse.vstack((lineFlow, -lineFlow))
-            b_ub = np.concatenate((self.network.branch['RATE_A'] + self.network.ISF.dot(self.network.bus['PD']),
-                                   self.network.branch['RATE_A'] - self.network.ISF.dot(self.network.bus['PD'])), axis=0)
-            A_eq = sp.sparse.csr_matrix((1, self.network.n_g))
-            A_eq[:, :] = 1
-            b_eq = np.array([np.sum(self.network.bus['PD'])])
+            A_eq = sp.sparse.csr_matrix(np.ones((1, self.network.n_g)))
+            b_ub, b_eq = self.constructRHS(formulation)
 
             lb = np.zeros((self.network.n_g, ))
             ub = self.network.gen['PMAX']
 
         elif formulation == 'YT':
-            genI = sp.sparse.csr_matrix((self.network.n_b, self.network.n_g))
-            for i in range(self.network.n_g):
-                genI[int(self.network.gen['GEN_BUS'][i])-1, i] = 1.
+            genI = sp.sparse.csr_matrix((np.ones((self.network.n_g, )),
+                                         (self.network.gen['GEN_BUS'].astype(int) - 1, np.arange(self.network.n_g))),
+                                        (self.network.n_b, self.network.n_g))
 
             powerBalance = sp.sparse.bmat([[genI, -self.network.Bbus]])
             lineFlow = sp.sparse.bmat([[np.zeros((self.network.n_l, self.network.n_g)), self.network.Bf]])
@@ -44,44 +54,238 @@ class EconomicDispatch:
 
             c = np.concatenate((self.network.gencost['COST'][:, -2], np.zeros((self.network.n_b, ))), axis=0)
             A_ub = sp.sparse.bmat([[lineFlow], [-lineFlow]])
-            b_ub = np.concatenate((self.network.branch['RATE_A'], self.network.branch['RATE_A']), axis=0)
             A_eq = powerBalance
-            b_eq = self.network.bus['PD']
+            b_ub, b_eq = self.constructRHS(formulation)
 
-            lb = np.concatenate((np.zeros(self.network.n_g, ), -st.inf * np.ones((self.network.n_b, ))))
-            ub = np.concatenate((self.network.gen['PMAX'], st.inf * np.ones((self.network.n_b, ))))
+            lb = np.concatenate((np.zeros(self.network.n_g, ), -np.inf * np.ones((self.network.n_b, ))))
+            ub = np.concatenate((self.network.gen['PMAX'], np.inf * np.ones((self.network.n_b, ))))
 
         else:
             raise NotImplementedError
 
         return c, A_ub, b_ub, A_eq, b_eq, lb, ub
 
-    def interpretState(self, x):
-        return ''
+    def constructRHS(self, formulation='ISF', pd=None):
+        '''Construct the right-hand sides b_ub and b_eq, the only parts of the LP that depend on load and ratings.
+
+        If pd is given as a T x n_b matrix of demands, the right-hand sides of all T intervals are computed at once
+        and returned as T x m matrices.
+        '''
+        PD = self.network.bus['PD'] if pd is None else np.asarray(pd, dtype=float).transpose()
+        rate = self.network.branch['RATE_A'][self.network.online]
+        if PD.ndim > 1:
+            rate = np.repeat(rate[:, None], PD.shape[1], axis=1)
+
+        if formulation == 'ISF':
+            flowPD = self.network.ISF.dot(PD)
+            b_ub = np.concatenate((rate + flowPD, rate - flowPD), axis=0)
+            b_eq = np.sum(PD, axis=0, keepdims=True)
+
+        elif formulation == 'YT':
+            b_ub = np.concatenate((rate, rate), axis=0)
+            b_eq = PD
 
-    def solve(self, formulation='ISF', solveropts=None):
-        if solveropts is None:
-            opts = st.Options()
-        elif type(solveropts) is st.Options:
-            opts = solveropts
         else:
-            opts = st.Options()
-            if type(solveropts) is dict:
-                if 'max_iter' in solveropts:
-                    opts.max_iter = solveropts['max_iter']
-                if 'tol' in solveropts:
-                    opts.tol = solveropts['tol']
-                if 'x0' in solveropts:
-                    opts.x0 = solveropts['x0']
-                if 'lp_solver' in solveropts:
-                    opts.lp_solver = solveropts['lp_solver']
-                if 'qp_solver' in solveropts:
-                    opts.qp_solver = solveropts['qp_solver']
-                if 'dlp_solver' in solveropts:
-                    opts.dlp_solver = solveropts['dlp_solver']
-
-        c, A_ub, b_ub, A_eq, b_eq, lb, ub = self.constructLP(formulation)
-        lp = st.LinearProgram(c, A_ub, b_ub, A_eq, b_eq, lb, ub)
-        res = st.linprog(lp, opts)
-
-        return res
+            raise NotImplementedError
+
+        if pd is not None:
+            return np.ascontiguousarray(b_ub.transpose()), np.ascontiguousarray(b_eq.transpose())
+        return b_ub, b_eq
+
+    def updateLoad(self, pd):
+        '''Set the nodal demand (in the units of bus['PD']) and update the right-hand sides of the constructed LPs.'''
+        self.network.bus['PD'] = np.array(pd, dtype=float)
+        for formulation in self.lp:
+            self.model(formulation)
+
+    def updateRatings(self, rate_a):
+        '''Set the long term line ratings (in the units of branch['RATE_A']) and update the constructed LPs.'''
+        self.network.branch['RATE_A'] = np.array(rate_a, dtype=float)
+        for formulation in self.lp:
+            self.model(formulation)
+
+    def model(self, formulation='ISF'):
+        '''Persistent LP of the given formulation.
+
+        The LP is constructed once; afterwards only its right-hand sides are recomputed, and only when the load or
+        the long term ratings have changed. Changes to any other network data require clearing self.lp.
+        '''
+        if formulation not in self.lp:
+            with phasorInstrument.stage('ed.constructLP', formulation=formulation) as s:
+                self.lp[formulation] = list(self.constructLP(formulation))
+                s.update(A_ub=self.lp[formulation][1], A_eq=self.lp[formulation][3])
+        elif not (np.array_equal(self.rhs[formulation][0], self.network.bus['PD']) and
+                  np.array_equal(self.rhs[formulation][1], self.network.branch['RATE_A'])):
+            with phasorInstrument.stage('ed.constructRHS', formulation=formulation):
+                lp = self.lp[formulation]
+                lp[2], lp[4] = self.constructRHS(formulation)
+
+        self.rhs[formulation] = (np.copy(self.network.bus['PD']), np.copy(self.network.branch['RATE_A']))
+
+        return self.lp[formulation]
+
+    def interpretState(self, x, formulation='ISF', duals=None, pd=None):
+        '''Line flows, nodal prices and congestion rents of a solution x, or a T x n matrix of solutions, of the LP.
+
+        duals are the constraint marginals of the solution(s) (see backend.Backend.duals), without which prices are
+        unavailable, and pd the demand they were solved for (default: the demand of the network). Returns a
+        result.Dispatch whose arrays are computed on first access.
+        '''
+        x = np.asarray(x, dtype=float)
+        return phasorResult.Dispatch(self.network, x[..., :self.network.n_g], pd, formulation, duals)
+
+    def solve(self, formulation='ISF', solveropts=None):
+        backend = phasorBackend.get(self.backend)
+
+        with phasorInstrument.trace() as metrics:
+            lp = self.model(formulation)
+            with phasorInstrument.stage('ed.linprog', formulation=formulation, backend=backend.name):
+                # Warm start from the previous solution unless a starting point is given
+                res = backend.solve(lp, solveropts, self.x.get(formulation))
+
+        self.x[formulation] = res['x']
+
+        dispatch = None
+        if res['x'] is not None:
+            dispatch = self.interpretState(res['x'], formulation, backend.duals(res))
+
+        return phasorResult.Result(res, metrics=metrics, dispatch=dispatch)
+
+    def solveMany(self, pd, formulation='ISF', solveropts=None, workers=None):
+        '''Solve the economic dispatch for every interval of a time series of nodal demands.
+
+        pd is a T x n_b matrix of demands (in the units of bus['PD']). The constraint matrices are shared by all
+        intervals and the right-hand sides of all intervals are computed in a single ISF product. Each interval is
+        warm started from the solution of the previous one.
+
+        With workers > 1, contiguous blocks of intervals are solved in a process pool; the LP is sent to each worker
+        once and the right-hand sides are exchanged through shared memory. solveropts must then be a dict.
+
+        Returns a dict with the T x n solutions 'x', the T x n_g dispatch 'PG' and the objective 'fun' of every
+        interval, and the result.Dispatch 'dispatch' whose flows and prices are computed when accessed. Rows of
+        intervals whose solve failed are nan.
+        '''
+        pd = np.atleast_2d(np.asarray(pd, dtype=float))
+        if pd.shape[1] != self.network.n_b:
+            raise ValueError('Invalid demand shape. (Required: (T, %d); Provided: %s)' % (self.network.n_b, pd.shape))
+
+        c, A_ub, _, A_eq, _, lb, ub = self.model(formulation)
+        with phasorInstrument.stage('ed.constructRHS', formulation=formulation, intervals=pd.shape[0]):
+            B_ub, B_eq = self.constructRHS(formulation, pd)
+        lp = (c, A_ub, A_eq, lb, ub)
+
+        if workers is not None and workers > 1 and solveropts is not None and type(solveropts) is not dict:
+            raise ValueError('Solver options must be given as a dict when solving in parallel.')
+
+        backend = phasorBackend.get(self.backend)
+        with phasorInstrument.stage('ed.linprog', formulation=formulation, intervals=pd.shape[0], workers=workers,
+                                    backend=backend.name):
+            if workers is not None and workers > 1:
+                X = np.empty((pd.shape[0], len(c)))
+                Y_ub, Y_eq = np.empty(B_ub.shape), np.empty(B_eq.shape)
+                with _parallel.SharedArrays(B_ub=B_ub, B_eq=B_eq) as arrays:
+                    with _parallel.pool(workers, arrays, _init, (lp, solveropts, backend)) as executor:
+                        chunks = _parallel.chunks(pd.shape[0], workers)
+                        for (start, stop), (Xk, Yk_ub, Yk_eq) in zip(chunks, executor.map(_intervals, chunks)):
+                            X[start:stop], Y_ub[start:stop], Y_eq[start:stop] = Xk, Yk_ub, Yk_eq
+            else:
+                X, Y_ub, Y_eq = _solveIntervals(lp, B_ub, B_eq, solveropts, backend, self.x.get(formulation))
+
+        if np.all(np.isfinite(X[-1])):
+            self.x[formulation] = X[-1]
+
+        duals = None if np.all(np.isnan(Y_eq)) else (Y_ub, Y_eq)
+
+        return {'x': X, 'PG': X[:, :self.network.n_g], 'fun': X.dot(c),
+                'dispatch': self.interpretState(X, formulation, duals, pd)}
+
+
+    def solveAreas(self, areas=None, workers=None, tol=1e-4, gap=1e-3, max_iter=500, penalty=None, angle=np.pi,
+                   compare=True, solveropts=None):
+        '''Solve the economic dispatch by decomposition into areas.
+
+        The buses are partitioned by bus['BUS_AREA'], by the given area of every bus, or automatically into the given
+        number of areas (see _area.partition). Every area solves the B-theta LP of its buses with copies of the angles
+        of the neighboring buses of its tie lines, and the copies are priced into agreement by Dantzig-Wolfe
+        decomposition (see _area.solve), which requires a backend with dual values. With workers > 1 the area LPs are
+        solved in a process pool; solveropts must then be a dict. penalty is the initial cost of an inconsistency of
+        one radian (default: the largest cost times the largest branch susceptance).
+
+        Returns a result with the solution 'x' of the YT formulation, the dispatch 'PG', the cost 'fun' and the report
+        of the decomposition: the number of 'iterations', whether it 'converged', the 'residual', 'primal' cost and
+        'dual' bound of every iteration and the final 'penalty'. The solution is only feasible if converged; a
+        RuntimeWarning is issued otherwise. If compare, the 'monolithic' cost of solve('YT') and the relative 'gap'
+        of the decomposed solution to it are included.
+        '''
+        if workers is not None and workers > 1 and solveropts is not None and type(solveropts) is not dict:
+            raise ValueError('Solver options must be given as a dict when solving in parallel.')
+
+        network = self.network
+        backend = phasorBackend.get(self.backend)
+        if penalty is None:
+            b = np.abs(network.Bf.data)
+            penalty = max(np.max(network.gencost['COST'][:, -2]), 1.) * (np.max(b) if len(b) > 0 else 1.)
+
+        with phasorInstrument.trace() as metrics:
+            labels = _area.partition(network, areas)
+            with phasorInstrument.stage('ed.constructAreas', areas=int(np.max(labels)) + 1):
+                lps, buses, coupling = _area.constructLP(network, labels, angle)
+
+            with phasorInstrument.stage('ed.solveAreas', areas=len(lps), workers=workers, backend=backend.name) as s:
+                X, report = _area.solve(lps, coupling, backend, solveropts, workers, tol, gap, max_iter, penalty)
+                s.update(iterations=report['iterations'], converged=report['converged'])
+            if not report['converged']:
+                warnings.warn('The area decomposition did not converge in %d iterations (residual %g); the '
+                              'solution violates the consistency of the angles.'
+                              % (report['iterations'], report['residual'][-1]), RuntimeWarning)
+
+            x = np.zeros((network.n_g + network.n_b, ))
+            for (gens, owned, _), xa in zip(buses, X):
+                x[gens] = xa[:len(gens)]
+                x[network.n_g + owned] = xa[len(gens):len(gens) + len(owned)]
+
+            state = {'x': x, 'PG': x[:network.n_g], 'fun': network.gencost['COST'][:, -2].dot(x[:network.n_g]),
+                     'areas': labels}
+            state.update(report)
+
+            info = dict()
+            if compare:
+                info['monolithic'] = self.solve('YT', solveropts)['fun']
+                info['gap'] = (state['fun'] - info['monolithic']) / max(1., abs(info['monolithic']))
+
+        return phasorResult.Result(state, metrics=metrics, dispatch=self.interpretState(x, 'YT'), **info)
+
+
+def _solveIntervals(lp, B_ub, B_eq, solveropts, backend, x0=None):
+    c, A_ub, A_eq, lb, ub = lp
+    X = np.full((B_ub.shape[0], len(c)), np.nan)
+    Y_ub = np.full(B_ub.shape, np.nan)
+    Y_eq = np.full(B_eq.shape, np.nan)
+    for t in range(B_ub.shape[0]):
+        res = backend.solve((c, A_ub, B_ub[t], A_eq, B_eq[t], lb, ub), solveropts, x0)
+        x = np.asarray(res['x'], dtype=float) if res['x'] is not None else None
+        if x is not None and x.shape == (len(c), ):
+            X[t] = x
+            x0 = x
+
+            duals = backend.duals(res)
+            if duals is not None:
+                Y_ub[t], Y_eq[t] = duals
+
+    return X, Y_ub, Y_eq
+
+
+_worker = dict()
+
+
+def _init(lp, solveropts, backend):
+    _worker['lp'] = lp
+    _worker['solveropts'] = solveropts
+    _worker['backend'] = backend
+
+
+def _intervals(chunk):
+    start, stop = chunk
+    s = _parallel.shared
+    return _solveIntervals(_worker['lp'], s['B_ub'][start:stop], s['B_eq'][start:stop], _worker['solveropts'],
+                           _worker['backend'])
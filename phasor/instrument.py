@@ -0,0 +1,159 @@
+import contextlib
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__all__ = ['Collector', 'LogCollector', 'register', 'unregister', 'collecting', 'enabled', 'stage', 'trace']
+
+# Registered collectors and the event lists of the active traces
+_collectors = []
+_traces = []
+
+
+class Collector:
+    '''Collector of the events emitted at the end of every instrumented stage.
+
+    Each event is a dict with the stage name, its wall time in seconds ('duration'), the peak resident set size of the
+    process in bytes ('peak_rss', None where unavailable) and stage-specific sizes, e.g. the shape and nnz of the
+    matrices that were built. The base collector keeps the events in self.events; subclasses override __call__.
+    '''
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+
+class LogCollector(Collector):
+    '''Collector that writes every event as a JSON record to a logger (default: the 'phasorpy' logger).'''
+
+    def __init__(self, logger=None, level=logging.INFO):
+        super().__init__()
+        self.logger = logging.getLogger('phasorpy') if logger is None else logger
+        self.level = level
+
+    def __call__(self, event):
+        super().__call__(event)
+        self.logger.log(self.level, json.dumps(event, default=_json))
+
+
+def register(collector):
+    '''Register a callable that receives the event of every instrumented stage.'''
+    _collectors.append(collector)
+    return collector
+
+
+def unregister(collector):
+    _collectors.remove(collector)
+
+
+@contextlib.contextmanager
+def collecting(collector=None):
+    '''Register a collector (default: a new Collector) for the duration of the context.'''
+    collector = Collector() if collector is None else collector
+    register(collector)
+    try:
+        yield collector
+    finally:
+        unregister(collector)
+
+
+def enabled():
+    '''Whether any collector is registered.'''
+    return len(_collectors) > 0
+
+
+def stage(name, **info):
+    '''Context manager that times a stage and emits its event on exit.
+
+    Sizes of the objects built in the stage are attached with update(), e.g. s.update(A_ub=A_ub). Matrices are only
+    summarized (shape and nnz) when the event is emitted, and without a registered collector a shared no-op stage is
+    returned, so instrumentation costs nothing unless enabled.
+    '''
+    if len(_collectors) == 0:
+        return _disabled
+    return _Stage(name, info)
+
+
+@contextlib.contextmanager
+def trace():
+    '''Gather the events emitted within the context in a list, e.g. to attach them to a result.'''
+    events = []
+    _traces.append(events)
+    try:
+        yield events
+    finally:
+        # Traces are removed by identity: nested traces may hold equal events
+        del _traces[next(i for i, t in enumerate(_traces) if t is events)]
+
+
+class _Stage:
+    def __init__(self, name, info):
+        self.name = name
+        self.info = info
+
+    def update(self, **info):
+        self.info.update(info)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        event = {'stage': self.name, 'duration': time.perf_counter() - self.start, 'peak_rss': _peak_rss()}
+        for key, value in self.info.items():
+            event[key] = _describe(value)
+
+        for events in _traces:
+            events.append(event)
+        for collector in list(_collectors):
+            collector(event)
+
+
+class _DisabledStage:
+    def update(self, **info):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_disabled = _DisabledStage()
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _describe(value):
+    if sp.sparse.issparse(value):
+        return {'shape': list(value.shape), 'nnz': int(value.nnz)}
+    if isinstance(value, np.ndarray):
+        return {'shape': list(value.shape), 'nnz': int(np.count_nonzero(value))}
+    if isinstance(value, (list, tuple)) and len(value) > 0 and all(sp.sparse.issparse(v) for v in value):
+        return {'blocks': len(value), 'nnz': int(sum(v.nnz for v in value))}
+    return value
+
+
+def _json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
@@ -1,15 +1,26 @@
-import pkg_resources
+import copy
+import csv
+import hashlib
+import importlib.resources
+import os
 import re
-import requests
+import warnings
 
 import numpy as np
 import scipy as sp
 import scipy.sparse
-import scipy.sparse.linalg
 
-from . import index
+from . import index, instrument, reduction, topology
 
-__all__ = ['PowerNetwork', 'load_case']
+# sensitivity, which loads the sparse solvers of scipy, is imported by the methods that factorize the DC matrices
+
+__all__ = ['PowerNetwork', 'load_case', 'available_cases', 'catalog', 'write_catalog']
+
+# Columns that determine the DC matrices of a network (see topology.key)
+TOPOLOGY = {'branch': ['BR_STATUS', 'F_BUS', 'T_BUS', 'BR_X', 'TAP', 'SHIFT'], 'bus': ['BUS_I', 'BUS_TYPE']}
+
+# Columns of the catalog of bundled cases
+CATALOG = ['case', 'n_b', 'n_l', 'n_g', 'baseMVA', 'size']
 
 
 class PowerNetwork:
@@ -67,31 +78,29 @@ class PowerNetwork:
         self.n_b = len(self.bus['BUS_I'])
         self.n_g = len(self.gen['GEN_BUS'])
 
-        # Per-unit transformations
+        # Number the buses consecutively in the order of the bus data, keeping the external numbers of the case in
+        # int2ext. All bus references (BUS_I, GEN_BUS, F_BUS and T_BUS) use the internal numbers 1..n_b.
+        self.int2ext = np.copy(self.bus['BUS_I'])
+        self._ext_order = np.argsort(self.int2ext, kind='stable')
+        self._ext_sorted = self.int2ext[self._ext_order]
+        if np.any(self._ext_sorted[1:] == self._ext_sorted[:-1]):
+            raise ValueError('Bus numbers must be unique.')
+
+        self.bus['BUS_I'] = np.arange(self.n_b) + 1.
+        self.gen['GEN_BUS'] = self.ext2int(self.gen['GEN_BUS']) + 1.
+        self.branch['F_BUS'] = self.ext2int(self.branch['F_BUS']) + 1.
+        self.branch['T_BUS'] = self.ext2int(self.branch['T_BUS']) + 1.
+
+        # Per-unit transformations, into new arrays so that the data the network was constructed from is unchanged
         if perunit:
-            self.bus['PD'] /= self.baseMVA
-            self.bus['QD'] /= self.baseMVA
-            self.gen['PG'] /= self.baseMVA
-            self.gen['QG'] /= self.baseMVA
-            self.gen['QMAX'] /= self.baseMVA
-            self.gen['QMIN'] /= self.baseMVA
-            self.gen['VG'] /= self.baseMVA
-            self.gen['PMAX'] /= self.baseMVA
-            self.gen['PMIN'] /= self.baseMVA
-            self.gen['PC1'] /= self.baseMVA
-            self.gen['PC2'] /= self.baseMVA
-            self.gen['QC1MIN'] /= self.baseMVA
-            self.gen['QC1MAX'] /= self.baseMVA
-            self.gen['QC2MIN'] /= self.baseMVA
-            self.gen['QC2MAX'] /= self.baseMVA
-            self.gen['RAMP_AGC'] /= self.baseMVA
-            self.gen['RAMP_10'] /= self.baseMVA
-            self.gen['RAMP_30'] /= self.baseMVA
-            self.gen['RAMP_Q'] /= self.baseMVA
-            self.gencost['COST'] /= self.baseMVA
-            self.branch['RATE_A'] /= self.baseMVA
-            self.branch['RATE_B'] /= self.baseMVA
-            self.branch['RATE_C'] /= self.baseMVA
+            for col in ['PD', 'QD']:
+                self.bus[col] = self.bus[col] / self.baseMVA
+            for col in ['PG', 'QG', 'QMAX', 'QMIN', 'VG', 'PMAX', 'PMIN', 'PC1', 'PC2', 'QC1MIN', 'QC1MAX', 'QC2MIN',
+                        'QC2MAX', 'RAMP_AGC', 'RAMP_10', 'RAMP_30', 'RAMP_Q']:
+                self.gen[col] = self.gen[col] / self.baseMVA
+            self.gencost['COST'] = self.gencost['COST'] / self.baseMVA
+            for col in ['RATE_A', 'RATE_B', 'RATE_C']:
+                self.branch[col] = self.branch[col] / self.baseMVA
 
         # Add nodal value of lost load
         self.voll = 70 * np.max(self.gencost['COST'][:, -2]) * np.ones((self.n_b,))
@@ -103,151 +112,542 @@ class PowerNetwork:
         self.ISF = None
         self.lineOutages = None
 
+        # Indices of the branches in service, which index the rows of Bf and the ISF
+        self.online = np.where(self.branch['BR_STATUS'] != 0)[0]
+
+    def ext2int(self, buses):
+        '''Internal (zero-based) indices of the buses with the given external numbers.'''
+        buses = np.asarray(buses, dtype=float)
+        pos = np.minimum(np.searchsorted(self._ext_sorted, buses), self.n_b - 1)
+        index = self._ext_order[pos]
+
+        unknown = self.int2ext[index] != buses
+        if np.any(unknown):
+            raise ValueError('Unknown buses: %s' % np.unique(buses[unknown]))
+
+        return index
+
     def setContingencyLimits(self, force=False):
         # Artificially enforce DA and SE limits if unenforced
         if force or np.all(self.branch['RATE_A'] >= self.branch['RATE_B']):
-            self.branch['RATE_B'] *= 1.1
+            self.branch['RATE_B'] = self.branch['RATE_B'] * 1.1
         if force or np.all(self.branch['RATE_A'] >= self.branch['RATE_C']):
-            self.branch['RATE_C'] *= 1.7
+            self.branch['RATE_C'] = self.branch['RATE_C'] * 1.7
 
         # Artificially set ramp capacity if unset
         if np.all(self.gen['RAMP_AGC'] == 0):
             self.gen['RAMP_AGC'] = np.ones((self.n_g,)) * 20. / self.baseMVA
 
-    def makeDC(self, setglobal=True):
+    def makeDC(self, setglobal=True, cache=True, ordering=None):
         '''Construct the parameters for solution of DC optimal power flow problems.
 
         This file emulates MATPOWER's makeBDC function.
+
+        The matrices are looked up in, and added to, a cache keyed by the topology of the network: either the
+        default topology.TopologyCache (bounded to 512 MB) if cache is True, or the given TopologyCache. Cached
+        matrices are shared between networks and must not be modified in place.
+
+        The ordering selects the fill-reducing ordering of the ISF factorization: None for SuperLU's default COLAMD,
+        'amd' for a minimum degree ordering or 'rcm' for a reverse Cuthill-McKee permutation of the buses.
         '''
-        if not np.array_equal(self.bus['BUS_I'], np.arange(self.n_b) + 1):
-            raise ValueError('Buses must be ordered consecutively.')
+        with instrument.stage('network.makeDC') as s:
+            if not np.array_equal(self.bus['BUS_I'], np.arange(self.n_b) + 1):
+                raise ValueError('Buses must be ordered consecutively.')
+
+            topologies = topology.resolve(cache)
+            entry = None
+            if topologies is not None:
+                key = topology.key(self)
+                entry = topologies.get(key)
+
+            if entry is not None and 'dc' in entry and entry['dc'][4].ordering == ordering:
+                Bbus, Bf, Pbusinj, Pfinj, ISF = entry['dc']
+            else:
+                entry = None
+                Bbus, Bf, Pbusinj, Pfinj, ISF = self._makeDC(ordering)
+                if topologies is not None:
+                    topologies.put(key, dc=(Bbus, Bf, Pbusinj, Pfinj, ISF))
+
+            if setglobal:
+                # Y-Theta Formulation
+                self.Bbus = Bbus
+                self.Bf = Bf
+                self.Pfinj = Pfinj
+                self.Pbusinj = Pbusinj
+
+                # ISF Formulation
+                self.ISF = ISF
+
+                self.online = np.where(self.branch['BR_STATUS'] != 0)[0]
+                self.n_l = len(self.online)
+
+            s.update(Bbus=Bbus, Bf=Bf, cached=entry is not None)
+
+            return Bbus, Bf, Pbusinj, Pfinj, ISF
+
+    def _makeDC(self, ordering=None):
+        from . import sensitivity
 
         # Determine online branches in order to ignore offline branches
         online = np.where(self.branch['BR_STATUS'] != 0)[0]
-        n_online = len(online)
 
-        # for each branch, compute the elements of the branch B matrix and the phase shift "quiescent" injections, where
+        Cft, Bf, Pfinj = self._branchMatrices(online)
+
+        # build Bbus
+        Bbus = sp.sparse.csr_matrix(Cft.transpose().dot(Bf))
+
+        # build phase shift injection vectors
+        Pbusinj = Cft.transpose().dot(Pfinj)  # Pbusinj = Cf * Pfinj + Ct * Ptinj;
+
+        # ISF Formulation - assumes Pbusinj is 0. The ISF is kept factorized and only materialized on request.
+        nonslack_buses = np.where(self.bus['BUS_TYPE'] != 3)[0]
+        ISF = sensitivity.InjectionShiftFactor(Bbus, Bf, nonslack_buses, ordering)
+
+        return Bbus, Bf, Pbusinj, Pfinj, ISF
+
+    def _branchMatrices(self, lines):
+        '''Connection matrix Cft, branch B matrix Bf and phase shift injections Pfinj of the given branches.'''
+        n_lines = len(lines)
+
+        # for each branch, compute the elements of the branch B matrix and the phase shift "quiescent" injections,
+        # where
         #
         #   | Pf |   | Bff Bft |   | Vaf |   | Pfinj |
         #   |    | = |         | * |     | + |       |
         #   | Pt |   | Btf Btt |   | Vat |   | Ptinj |
         #
-        b = np.divide(np.ones(n_online), self.branch['BR_X'][online])  # Series susceptance
-        tap = self.branch['TAP'][online]  # Set tap ratio
+        b = np.divide(np.ones(n_lines), self.branch['BR_X'][lines])  # Series susceptance
+        tap = self.branch['TAP'][lines]  # Set tap ratio
         tap[tap == 0] = 1.  # Set zero tap ratios to 1
         b = np.divide(b, tap)
 
         # build connection matrix Cft = Cf - Ct for line and from - to buses
-        rows = np.concatenate((np.arange(n_online), np.arange(n_online)))  # Set of row indices
+        rows = np.concatenate((np.arange(n_lines), np.arange(n_lines)))  # Set of row indices
         cols = np.concatenate(
-            (self.branch['F_BUS'][online] - 1, self.branch['T_BUS'][online] - 1))  # List of 'from' and 'to' buses
-        vals = np.concatenate((np.ones((n_online,)), -np.ones((n_online,))))  # Connection value
-        Cft = sp.sparse.csc_matrix((vals, (rows, cols)), (n_online, self.n_b))  # Connection matrix
+            (self.branch['F_BUS'][lines] - 1, self.branch['T_BUS'][lines] - 1))  # List of 'from' and 'to' buses
+        vals = np.concatenate((np.ones((n_lines,)), -np.ones((n_lines,))))  # Connection value
+        Cft = sp.sparse.csc_matrix((vals, (rows, cols)), (n_lines, self.n_b))  # Connection matrix
 
         # build Bf such that Bf * Va is the vector of real branch powers injected at each branch's "from" bus
         vals = np.concatenate((b, -b))
-        Bf = sp.sparse.csc_matrix((vals, (rows, cols)), (n_online, self.n_b))
+        Bf = sp.sparse.csc_matrix((vals, (rows, cols)), (n_lines, self.n_b))
 
-        # build Bbus
-        Bbus = sp.sparse.csr_matrix(Cft.transpose().dot(Bf))
+        Pfinj = np.multiply(b, (-self.branch['SHIFT'][lines] * np.pi / 180))  # Injected at the from bus
 
-        # build phase shift injection vectors
-        Pfinj = np.multiply(b, (-self.branch['SHIFT'][online] * np.pi / 180))  # Injected at the from bus
-        Pbusinj = Cft.transpose().dot(Pfinj)  # Pbusinj = Cf * Pfinj + Ct * Ptinj;
+        return Cft, Bf, Pfinj
 
-        # ISF Formulation - assumes Pbusinj is 0
-        nonslack_buses = np.where(self.bus['BUS_TYPE'] != 3)[0]
-        Bf_ref = Bf[:, nonslack_buses]
-        Bbus_ref = Bbus[:, nonslack_buses]
-        ISF = Bf_ref.dot(sp.sparse.linalg.spsolve(Bbus_ref.transpose().dot(Bbus_ref), Bbus_ref.transpose()))
+    def setBranchStatus(self, lines, status, cache=True):
+        '''Switch branches in or out of service without rebuilding the DC matrices.
+
+        lines are (zero-based) branch indices and status their new BR_STATUS, either one for all lines or one per line.
+        Bbus and Pbusinj are updated by a rank-k modification and Bf and Pfinj are assembled for the branches in
+        service. The ISF is updated through the Sherman-Morrison-Woodbury identity on the factorization of the last
+        fully factorized ISF, and topologies that are already in the cache (see makeDC) are reused. n_l and online
+        are refreshed; the line outages no longer apply and are cleared.
+
+        Raises ValueError, leaving the network unchanged, if switching out the lines islands the network.
+        '''
+        lines = np.atleast_1d(np.asarray(lines, dtype=int))
+        status = np.broadcast_to(np.asarray(status, dtype=float), lines.shape)
+        lines, index = np.unique(lines, return_index=True)
+        status = (status[index] != 0).astype(float)
+
+        # The status is replaced rather than modified in place since it may be shared with other networks
+        previous = self.branch['BR_STATUS']
+        switched = np.array(previous, dtype=float)
+        switched[lines] = status
+
+        # The switch is applied to the DC matrices of the current topology so that islanding is detected
+        if self.ISF is None:
+            self.makeDC(cache=cache)
+
+        changed = lines[(previous[lines] != 0) != (status != 0)]
+        if len(changed) == 0:
+            return
+
+        self.branch['BR_STATUS'] = switched
+
+        with instrument.stage('network.setBranchStatus', lines=len(changed)):
+            topologies = topology.resolve(cache)
+            entry = None
+            if topologies is not None:
+                key = topology.key(self)
+                entry = topologies.get(key)
+
+            if entry is not None and 'dc' in entry:
+                Bbus, Bf, Pbusinj, Pfinj, ISF = entry['dc']
+            else:
+                try:
+                    Bbus, Bf, Pbusinj, Pfinj, ISF = self._switchDC(changed)
+                except ValueError:
+                    self.branch['BR_STATUS'] = previous
+                    raise ValueError('Switching out lines %s islands the network.' % changed[status[
+                        np.searchsorted(lines, changed)] == 0])
+                if topologies is not None:
+                    topologies.put(key, dc=(Bbus, Bf, Pbusinj, Pfinj, ISF))
 
-        if setglobal:
-            # Y-Theta Formulation
             self.Bbus = Bbus
             self.Bf = Bf
             self.Pfinj = Pfinj
             self.Pbusinj = Pbusinj
+            self.ISF = ISF
+
+            self.online = np.where(self.branch['BR_STATUS'] != 0)[0]
+            self.n_l = len(self.online)
+            self.lineOutages = None
 
-            # ISF Formulation
-            self.ISF = sp.sparse.csc_matrix(ISF)
+    def _switchDC(self, changed):
+        from . import sensitivity
+
+        # Switched in branches add, and switched out branches remove, their susceptance from Bbus
+        sign = np.where(self.branch['BR_STATUS'][changed] != 0, 1., -1.)
+        Cft, Bf_k, Pfinj_k = self._branchMatrices(changed)
+        b = np.asarray(Bf_k[np.arange(len(changed)), self.branch['F_BUS'][changed].astype(int) - 1]).ravel()
+
+        U = sp.sparse.csc_matrix(Cft.transpose())
+        Bbus = sp.sparse.csr_matrix(self.Bbus + U.dot(sp.sparse.diags(sign * b)).dot(Cft))
+        Pbusinj = self.Pbusinj + U.dot(sign * Pfinj_k)
+
+        _, Bf, Pfinj = self._branchMatrices(np.where(self.branch['BR_STATUS'] != 0)[0])
+
+        if self.ISF._Bbus_ref is not None:
+            # Without a single slack bus the ISF is refactorized
+            nonslack_buses = np.where(self.bus['BUS_TYPE'] != 3)[0]
+            return Bbus, Bf, Pbusinj, Pfinj, sensitivity.InjectionShiftFactor(Bbus, Bf, nonslack_buses,
+                                                                              self.ISF.ordering)
+
+        # Accumulate the modification relative to the last factorized ISF so that switching back cancels out
+        base, d = self.ISF, dict()
+        if isinstance(self.ISF, sensitivity.ModifiedShiftFactor):
+            base = self.ISF.base
+            d = dict(zip(self.ISF.labels, self.ISF.d))
+        for line, dk in zip(changed, sign * b):
+            d[line] = d.get(line, 0.) + dk
+        labels = np.array(sorted(line for line in d if d[line] != 0), dtype=int)
+
+        if len(labels) == 0:
+            return base.Bbus, base.Bf, Pbusinj, Pfinj, base
+
+        Cft, _, _ = self._branchMatrices(labels)
+        ISF = sensitivity.ModifiedShiftFactor(base, Bbus, Bf, Cft.transpose(), [d[line] for line in labels], labels)
 
         return Bbus, Bf, Pbusinj, Pfinj, ISF
 
-    def makeDCLineOutages(self):
-        self.lineOutages = []
+    def makeDCLineOutages(self, workers=None, cache=True):
+        '''Construct the DC parameters for each single line outage.
 
-        for line in range(self.n_l):
-            if not self.branch['BR_STATUS'][line]:
-                continue
+        Post-outage sensitivities are obtained from the base-case ISF through line outage distribution factors, so
+        no network matrices are refactorized. Outages that island the network are skipped. The LODFs are computed
+        in a pool of the given number of worker processes if workers > 1, and cached with the DC matrices of the
+        topology (see makeDC). The skipped lines are recorded in lineOutages.skipped, and a RuntimeWarning is issued.
+        '''
+        from . import sensitivity
+
+        with instrument.stage('network.makeDCLineOutages', workers=workers) as s:
+            if self.ISF is None:
+                self.makeDC(cache=cache)
+
+            online = np.where(self.branch['BR_STATUS'] != 0)[0]
+            f_bus = self.branch['F_BUS'][online].astype(int) - 1
+            t_bus = self.branch['T_BUS'][online].astype(int) - 1
+
+            # Only reuse cached factors computed from the ISF that is in use
+            topologies = topology.resolve(cache)
+            entry = None
+            if topologies is not None:
+                key = topology.key(self)
+                entry = topologies.get(key)
+                if entry is not None and entry.get('dc', (None, ) * 5)[4] is not self.ISF:
+                    entry = None
+
+            if entry is not None and 'LODF' in entry:
+                LODF, islanding = entry['LODF']
+            else:
+                LODF, islanding = sensitivity.lodf(self.ISF, f_bus, t_bus, workers=workers)
+                if entry is not None:
+                    topologies.put(key, LODF=(LODF, islanding))
+
+            # Ensure that removal of a line does not disconnect graph
+            if np.any(islanding):
+                warnings.warn('Skipped the outages of lines %s, which island the network.' % online[islanding],
+                              RuntimeWarning)
+
+            lines = np.where(~islanding)[0]
+            self.lineOutages = sensitivity.LineOutageSet(self.ISF, self.branch, online, lines, LODF[:, lines],
+                                                         0.001 * np.ones((len(lines),)), online[islanding])
+
+            s.update(LODF=LODF, outages=len(lines), islanding=int(np.sum(islanding)))
+
+    def setOutageProbabilities(self, prob, lines=None):
+        '''Set the probabilities of the line outages.
+
+        prob holds the outage probability of every branch, or of the (zero-based) branches given by lines. Branches
+        without a line outage are ignored.
+        '''
+        if self.lineOutages is None:
+            self.makeDCLineOutages()
+        outages = self.lineOutages
 
-            self.branch['BR_STATUS'][line] = 0
-
-            try:
-                Bbus, Bf, _, _, ISF = self.makeDC(False)
-                self.lineOutages.append({
-                    'prob': 0.001,
-                    'Bbus': Bbus,
-                    'Bf': Bf,
-                    'ISF': ISF,
-                    'branch': {
-                        'RATE_A': self.branch['RATE_A'][np.arange(self.n_l) != line],
-                        'RATE_B': self.branch['RATE_B'][np.arange(self.n_l) != line],
-                        'RATE_C': self.branch['RATE_C'][np.arange(self.n_l) != line]
-                    }
-                })
-            except RuntimeError:
-                # Ensure that removal of a line does not disconnect graph
-                print('Failed to create contingency for line', line)
-
-            self.branch['BR_STATUS'][line] = 1
-
-
-def load_case(mfile, verbose=0):
+        branches = outages.online[outages.lines]
+        if lines is None:
+            lines = np.arange(len(self.branch['BR_STATUS']))
+        lines = np.atleast_1d(np.asarray(lines, dtype=int))
+        prob = np.broadcast_to(np.asarray(prob, dtype=float), lines.shape)
+
+        column = np.full((len(self.branch['BR_STATUS']), ), -1, dtype=int)
+        column[branches] = np.arange(len(branches))
+        k = column[lines]
+
+        # The probabilities are replaced rather than modified in place since they may be shared with scenarios
+        outages.prob = np.array(outages.prob)
+        outages.prob[k[k >= 0]] = prob[k >= 0]
+
+    def reduce(self, radial=True, series=True):
+        '''Equivalent network without radial and series zero-injection buses.
+
+        Returns the reduced PowerNetwork and a reduction.Expansion that maps its branch flows and bus angles back to
+        this network. See reduction.reduce.
+        '''
+        with instrument.stage('network.reduce', buses=self.n_b) as s:
+            reduced, expansion = reduction.reduce(self, radial=radial, series=series)
+            s.update(reduced_buses=reduced.n_b, reduced_lines=reduced.n_l)
+        return reduced, expansion
+
+    def scenario(self, bus=None, gen=None, gencost=None, branch=None, voll=None, prob=None):
+        '''Scenario of this network that overrides the given columns.
+
+        bus, gen, gencost and branch map column names to their values in the scenario, e.g. scenario(bus={'PD': pd}),
+        and voll and prob override the value of lost load and the probabilities of the line outages (which requires
+        line outages and an unchanged topology). The scenario is a PowerNetwork whose remaining columns are read-only
+        views of those of this network, so only the overridden data is copied. Unless the overrides change the
+        topology (see TOPOLOGY), the DC matrices and line outages are shared with this network; otherwise they are
+        rebuilt on demand, reusing those of topologies in the cache.
+
+        Columns of either network must not be modified in place, but replaced, since they are shared.
+        '''
+        network = copy.copy(self)
+
+        changed = False
+        for name, overrides in (('bus', bus), ('gen', gen), ('gencost', gencost), ('branch', branch)):
+            table = {col: _readonly(values) for col, values in getattr(self, name).items()}
+            for col, values in (overrides or dict()).items():
+                if col not in table:
+                    raise KeyError('Unknown %s column %s.' % (name, col))
+                values = np.array(np.broadcast_to(np.asarray(values, dtype=float), table[col].shape))
+                changed = changed or (col in TOPOLOGY.get(name, []) and not np.array_equal(values, table[col]))
+                table[col] = values
+            setattr(network, name, table)
+
+        if voll is not None:
+            network.voll = np.array(np.broadcast_to(np.asarray(voll, dtype=float), (self.n_b, )))
+
+        if prob is not None and (changed or self.lineOutages is None):
+            raise ValueError('Outage probabilities require the line outages of an unchanged topology.')
+
+        if changed:
+            network.Bbus = network.Bf = network.Pbusinj = network.Pfinj = network.ISF = None
+            network.lineOutages = None
+            network.online = np.where(network.branch['BR_STATUS'] != 0)[0]
+            network.n_l = len(network.online)
+        elif self.lineOutages is not None:
+            # The outages read their ratings from the branch data of the scenario
+            network.lineOutages = copy.copy(self.lineOutages)
+            network.lineOutages.branch = network.branch
+            if prob is not None:
+                network.lineOutages.prob = np.array(np.broadcast_to(np.asarray(prob, dtype=float),
+                                                                    self.lineOutages.prob.shape))
+
+        return network
+
+
+def _readonly(values):
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+def load_case(mfile, verbose=0, cache=False):
     """
     Imports data from Matpower case file (MATLAB m-file).
+
+    If cache is enabled, the parsed arrays of local case files are stored as an .npz file keyed by the file path,
+    modification time and size so that subsequent loads of an unchanged file skip text parsing. The cache is either
+    True (use the default cache directory) or the path of the directory in which to store cached cases.
     """
-    # Read m-file and strip MATLAB comments
+    with instrument.stage('network.load_case', case=mfile) as s:
+        path = _case_path(mfile)
+
+        cachefile = None
+        if cache and path is not None:
+            cachefile = _case_cache_file(path, cache)
+            if os.path.isfile(cachefile):
+                if verbose: print("Loading cached case file: %s." % (cachefile))
+                s.update(cached=True)
+                with np.load(cachefile) as data:
+                    return PowerNetwork({'baseMVA': float(data['baseMVA']),
+                                         'bus': data['bus'],
+                                         'gen': data['gen'],
+                                         'gencost': data['gencost'],
+                                         'branch': data['branch']})
+
+        # Read m-file
+        if mfile.startswith('http'):
+            import requests
+
+            if verbose: print("Downloading case file: %s." % (mfile))
+            response = requests.get(mfile)
+            case_as_str = response.text
+        else:
+            if verbose: print("Reading case file: %s." % (path))
+            with open(path, "r") as f:
+                case_as_str = f.read()
+
+        data = _parse_case(case_as_str)
+        s.update(cached=False)
+
+        if cachefile is not None:
+            if verbose: print("Caching case file: %s." % (cachefile))
+            os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+            tmpfile = '%s.%d.tmp' % (cachefile, os.getpid())
+            with open(tmpfile, 'wb') as f:
+                np.savez(f, **data)
+            os.replace(tmpfile, cachefile)
+
+        return PowerNetwork(data)
+
+
+def _case_path(mfile):
+    """Resolve a case name to a local file, returning None for remote cases."""
     if mfile.startswith('http'):
-        if verbose: print("Downloading case file: %s." % (mfile))
-        response = requests.get(mfile)
-        lines = response.text.split('\n')
-    elif pkg_resources.resource_exists('phasorpy', 'data/' + mfile):
-        if verbose: print("Loading case file: %s." % (mfile))
-        with pkg_resources.resource_stream('phasorpy', 'data/' + mfile) as f:
-            lines = [str(l, 'utf-8') for l in f.readlines()]
-    else:
-        if verbose: print("Reading case file: %s." % (mfile))
-        with open(mfile, "r") as f:
-            lines = f.readlines()
+        return None
+    elif _data_dir().joinpath(mfile).is_file():
+        return os.fspath(_data_dir().joinpath(mfile))
+    return mfile
+
+
+def _data_dir():
+    """Directory of the bundled case files."""
+    return importlib.resources.files(__package__).joinpath('data')
+
+
+def _case_cache_file(path, cache):
+    """Location of the binary cache entry for a case file."""
+    if cache is True:
+        cache = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                             'phasorpy')
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = hashlib.sha1(('%s|%d|%d' % (path, stat.st_mtime_ns, stat.st_size)).encode('utf-8')).hexdigest()[:16]
+
+    return os.path.join(cache, '%s-%s.npz' % (os.path.splitext(os.path.basename(path))[0], key))
 
-    for k in range(len(lines)): lines[k] = lines[k].split('%')[0]
-    case_as_str = "\n".join(lines)
 
-    def str_to_array(s):
-        return np.array([[float(v) for v in r.strip().split()] for r in s.strip(';\n\t ').split(';')])
+def _parse_case(case_as_str):
+    """Parse the text of a MATPOWER case file into its baseMVA and data arrays."""
+    # Strip MATLAB comments
+    case_as_str = re.sub(r'%[^\n]*', '', case_as_str)
+
+    def str_to_array(name, s):
+        # Parse the whole block in a single pass, inferring the row length from the first row
+        rows = [row for row in s.split(';') if row.strip()]
+        n_col = len(rows[0].split()) if rows else 0
+        try:
+            vals = np.array(s.replace(';', ' ').split(), dtype=float)
+        except ValueError as e:
+            raise ValueError('Invalid value in the %s block of the case file. (%s)' % (name, e))
+        if n_col == 0 or vals.size != len(rows) * n_col:
+            raise ValueError('Invalid size of the %s block of the case file. (Required: %d rows x %d columns; '
+                             'Provided: %d values)' % (name, len(rows), n_col, vals.size))
+        return vals.reshape((-1, n_col))
 
     try:
-        baseMVA = re.search("mpc.baseMVA = (\d+)", case_as_str).group(1)
-        version = re.search("mpc.version = '(\d+)'", case_as_str).group(1)
-        bus_str = re.search("mpc.bus = \[([-\s0-9e.;]+)\]", case_as_str).group(1)
-        gen_str = re.search("mpc.gen = \[([-\s0-9e.;Iinf]+)\]", case_as_str).group(1)
-        branch_str = re.search("mpc.branch = \[([-\s0-9e.;]+)\]", case_as_str).group(1)
-        gencost_str = re.search("mpc.gencost = \[([-\s0-9e.;]+)\]", case_as_str).group(1)
+        baseMVA = re.search(r"mpc\.baseMVA\s*=\s*([-+0-9eE.]+)", case_as_str).group(1)
+        version = re.search(r"mpc\.version\s*=\s*'(\d+)'", case_as_str).group(1)
+        blocks = dict(re.findall(r"mpc\.(bus|gen|branch|gencost)\s*=\s*\[([^\]]*)\]", case_as_str))
+        bus_str = blocks['bus']
+        gen_str = blocks['gen']
+        branch_str = blocks['branch']
+        gencost_str = blocks['gencost']
     except:
         raise TypeError("Failed to parse case file.")
     else:
-        if re.search('mpc.branch\(', case_as_str) or re.search('mpc.bus\(', case_as_str) or re.search('mpc.gen\(',
-                                                                                                      case_as_str):
+        if re.search(r'mpc\.branch\(', case_as_str) or re.search(r'mpc\.bus\(', case_as_str) or \
+                re.search(r'mpc\.gen\(', case_as_str):
             raise TypeError("Case file not supported.")
 
         if version != 2 and version != '2':
             raise TypeError('Invalid case file version. (Requires 2: Provided"', version, '")')
 
-        return PowerNetwork({'baseMVA': float(baseMVA),
-                             'bus': str_to_array(bus_str),
-                             'gen': str_to_array(gen_str),
-                             'gencost': str_to_array(gencost_str),
-                             'branch': str_to_array(branch_str)})
+        return {'baseMVA': float(baseMVA),
+                'bus': str_to_array('bus', bus_str),
+                'gen': str_to_array('gen', gen_str),
+                'gencost': str_to_array('gencost', gencost_str),
+                'branch': str_to_array('branch', branch_str)}
+
+
+def available_cases(min_buses=None, max_buses=None):
+    """Names of the bundled case files, optionally only those with a number of buses in [min_buses, max_buses]."""
+    return sorted(case for case, entry in catalog().items()
+                  if (min_buses is None or entry['n_b'] >= min_buses) and
+                  (max_buses is None or entry['n_b'] <= max_buses))
+
+
+_catalog = None
 
-def available_cases():
-    return pkg_resources.resource_listdir('phasorpy', 'data')
\ No newline at end of file
+
+def catalog():
+    """Metadata of the bundled cases by file name.
+
+    Each entry holds the number of buses n_b, of in-service branches n_l and of generators n_g, the baseMVA and the
+    size of the file in bytes. Entries are read from the precomputed data/catalog.csv; only cases that are missing
+    from it, or whose file size has changed, are parsed.
+    """
+    global _catalog
+    if _catalog is None:
+        data = _data_dir()
+
+        entries = dict()
+        if data.joinpath('catalog.csv').is_file():
+            with data.joinpath('catalog.csv').open('r') as f:
+                for row in csv.DictReader(f):
+                    entries[row['case']] = {'n_b': int(row['n_b']), 'n_l': int(row['n_l']), 'n_g': int(row['n_g']),
+                                            'baseMVA': float(row['baseMVA']), 'size': int(row['size'])}
+
+        _catalog = dict()
+        for item in data.iterdir():
+            if not item.name.endswith('.m'):
+                continue
+            size = os.stat(item).st_size
+            entry = entries.get(item.name)
+            if entry is None or entry['size'] != size:
+                entry = _catalog_entry(item.read_text(), size)
+            _catalog[item.name] = entry
+
+    return _catalog
+
+
+def write_catalog(path=None):
+    """Parse every bundled case and write the catalog (default: data/catalog.csv of the package)."""
+    global _catalog
+    _catalog = None
+
+    data = _data_dir()
+    path = os.fspath(data.joinpath('catalog.csv')) if path is None else path
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CATALOG)
+        for item in sorted(data.iterdir(), key=lambda item: item.name):
+            if item.name.endswith('.m'):
+                entry = _catalog_entry(item.read_text(), os.stat(item).st_size)
+                writer.writerow([item.name] + [entry[col] for col in CATALOG[1:]])
+
+
+def _catalog_entry(case_as_str, size):
+    """Catalog metadata of the text of a case file."""
+    data = _parse_case(case_as_str)
+    return {'n_b': data['bus'].shape[0],
+            'n_l': int(np.sum(data['branch'][:, index.branch.index('BR_STATUS')] != 0)),
+            'n_g': data['gen'].shape[0],
+            'baseMVA': data['baseMVA'],
+            'size': size}
\ No newline at end of file
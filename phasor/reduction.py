@@ -0,0 +1,228 @@
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+from . import index
+
+__all__ = ['Expansion', 'reduce']
+
+
+class Expansion:
+    '''Map from the solution of a reduced network back to the network it was reduced from.
+
+    Flows on the in-service branches of the full network (in the order of network.online) are
+    F @ f + f0 for the flows f on the branches of the reduced network, and the bus angles of the full network are
+    A @ theta + Af @ f + a0 for the bus angles theta of the reduced network. Both accept a vector or a matrix with
+    one column per case.
+    '''
+
+    def __init__(self, buses, F, f0, A, Af, a0):
+        self.buses = buses
+        self.F = F
+        self.f0 = f0
+        self.A = A
+        self.Af = Af
+        self.a0 = a0
+
+    def flows(self, f):
+        '''Flows on the in-service branches of the full network from the flows of the reduced network.'''
+        f = np.asarray(f, dtype=float)
+        return self.F.dot(f) + (self.f0 if f.ndim == 1 else self.f0[:, None])
+
+    def angles(self, theta, f):
+        '''Bus angles of the full network from the bus angles and branch flows of the reduced network.'''
+        theta = np.asarray(theta, dtype=float)
+        f = np.asarray(f, dtype=float)
+        return self.A.dot(theta) + self.Af.dot(f) + (self.a0 if theta.ndim == 1 else self.a0[:, None])
+
+
+def reduce(network, radial=True, series=True):
+    '''Eliminate radial and series zero-injection buses from a network.
+
+    Radial buses are buses without generators that are connected to the rest of the network by a single branch. The
+    flow on that branch is fixed by their demand, which is moved to the bus on the other end. A radial bus is kept if
+    the fixed flow exceeds any (nonzero) rating of its branch, so that the overload remains visible in the reduced
+    network. The fixed flows hold for the demand of the network, which must be reduced again when it changes.
+
+    Series buses are buses without generators or demand that connect two other buses by a branch each (without
+    transformer taps or phase shifts). The two branches are merged into an equivalent branch whose ratings are the smaller of theirs, so that
+    the flow limits of both are retained. Elimination is repeated until no such bus remains; the slack bus is never
+    eliminated and out of service branches are dropped.
+
+    Returns the reduced PowerNetwork, whose DC matrices, ED and RSCED models are formed as for any other network,
+    and the Expansion that recovers the flows and angles of the full network.
+    '''
+    n_b = network.n_b
+    online = np.where(network.branch['BR_STATUS'] != 0)[0]
+
+    # Working copies of the in-service branches; merged branches are appended as they are created
+    f_bus = list(network.branch['F_BUS'][online].astype(int) - 1)
+    t_bus = list(network.branch['T_BUS'][online].astype(int) - 1)
+    x = list(network.branch['BR_X'][online])
+    tap = network.branch['TAP'][online].copy()
+    tap[tap == 0] = 1.
+    tap = list(tap)
+    shift = list(network.branch['SHIFT'][online])
+    rates = {name: list(network.branch[name][online]) for name in ['RATE_A', 'RATE_B', 'RATE_C']}
+    row = list(online)  # Branch data row from which the remaining columns of each branch are taken
+
+    alive = [True] * len(online)
+    merged = dict()  # Branch -> (merged branch, sign of its flow relative to the merged branch)
+    fixed = dict()  # Branch -> constant flow of a branch to an eliminated radial bus
+    eliminated = []  # (bus, reference bus, angle offset, branch whose flow the angle depends on, coefficient)
+
+    PD = network.bus['PD'].copy()
+    slack = network.bus['BUS_TYPE'] == 3
+    has_gen = np.zeros((n_b,), dtype=bool)
+    has_gen[network.gen['GEN_BUS'].astype(int) - 1] = True
+
+    incident = [set() for _ in range(n_b)]
+    for k in range(len(online)):
+        incident[f_bus[k]].add(k)
+        incident[t_bus[k]].add(k)
+
+    def other(k, bus):
+        return t_bus[k] if f_bus[k] == bus else f_bus[k]
+
+    removed = np.zeros((n_b,), dtype=bool)
+    queue = [bus for bus in range(n_b)]
+    while len(queue) > 0:
+        bus = queue.pop()
+        if removed[bus] or slack[bus] or has_gen[bus]:
+            continue
+
+        if radial and len(incident[bus]) == 1:
+            k = next(iter(incident[bus]))
+            parent = other(k, bus)
+
+            # The branch supplies the demand of the bus, with flow b (theta_f - theta_t - shift) from f to t
+            flow = -PD[bus] if f_bus[k] == bus else PD[bus]
+            if any(rates[name][k] != 0 and abs(flow) > rates[name][k] for name in rates):
+                continue
+            fixed[k] = flow
+            delta = flow * x[k] * tap[k] + shift[k] * np.pi / 180
+            eliminated.append((bus, parent, delta if f_bus[k] == bus else -delta, None, 0.))
+
+            PD[parent] += PD[bus]
+            incident[parent].discard(k)
+            alive[k] = False
+            removed[bus] = True
+            queue.append(parent)
+
+        elif series and len(incident[bus]) == 2 and PD[bus] == 0:
+            a, c = sorted(incident[bus])
+            i, j = other(a, bus), other(c, bus)
+            if i == j or any(tap[k] != 1. or shift[k] != 0. for k in (a, c)):
+                continue
+
+            # New branch i -> j carrying the flow of both branches
+            m = len(f_bus)
+            f_bus.append(i)
+            t_bus.append(j)
+            x.append(x[a] + x[c])
+            tap.append(1.)
+            shift.append(0.)
+            for name in rates:
+                rates[name].append(_min_rating(rates[name][a], rates[name][c]))
+            row.append(row[a])
+            alive.append(True)
+
+            merged[a] = (m, 1. if f_bus[a] == i else -1.)
+            merged[c] = (m, 1. if f_bus[c] == bus else -1.)
+            # Flow i -> bus is the flow on the new branch: theta_bus = theta_i - x_a f
+            eliminated.append((bus, i, 0., m, -x[a]))
+
+            for k in (a, c):
+                alive[k] = False
+                incident[other(k, bus)].discard(k)
+            incident[i].add(m)
+            incident[j].add(m)
+            removed[bus] = True
+            queue.extend([i, j])
+
+    kept = np.where(~removed)[0]
+    branches = np.array([k for k in range(len(f_bus)) if alive[k]], dtype=int)
+    position = -np.ones((len(f_bus),), dtype=int)
+    position[branches] = np.arange(len(branches))
+    bus_position = -np.ones((n_b,), dtype=int)
+    bus_position[kept] = np.arange(len(kept))
+
+    # Expansion of the flows: every original branch follows a chain of merges to a branch of the reduced network
+    F_rows, F_cols, F_vals = [], [], []
+    f0 = np.zeros((len(online),))
+    for k in range(len(online)):
+        m, sign = _follow(merged, k)
+        if m in fixed:
+            f0[k] = sign * fixed[m]
+        elif position[m] >= 0:
+            F_rows.append(k)
+            F_cols.append(position[m])
+            F_vals.append(sign)
+    F = sp.sparse.csr_matrix((F_vals, (F_rows, F_cols)), (len(online), len(branches)))
+
+    # Expansion of the angles, resolved in the reverse order of elimination so that reference buses are known. Every
+    # bus follows the angle of one retained bus, shifted by constants and by the flows on the branches in between.
+    root = np.arange(n_b)
+    terms = [dict() for _ in range(n_b)]
+    a0 = np.zeros((n_b,))
+    for bus, ref, offset, k, coef in reversed(eliminated):
+        root[bus] = root[ref]
+        terms[bus] = dict(terms[ref])
+        a0[bus] = a0[ref] + offset
+        if k is not None:
+            # The merged branch may itself have been merged again or become radial
+            m, sign = _follow(merged, k)
+            if m in fixed:
+                a0[bus] += coef * sign * fixed[m]
+            else:
+                terms[bus][position[m]] = terms[bus].get(position[m], 0.) + coef * sign
+    A = sp.sparse.csr_matrix((np.ones((n_b,)), (np.arange(n_b), bus_position[root])), (n_b, len(kept)))
+    rows = [bus for bus in range(n_b) for _ in terms[bus]]
+    cols = [col for bus in range(n_b) for col in terms[bus]]
+    vals = [val for bus in range(n_b) for val in terms[bus].values()]
+    Af = sp.sparse.csr_matrix((vals, (rows, cols)), (n_b, len(branches)))
+
+    # Reduced network data, with the external bus numbers of the full network
+    ext = network.int2ext
+    bus = {col: np.copy(network.bus[col][kept]) for col in index.bus}
+    bus['BUS_I'] = ext[kept]
+    bus['PD'] = PD[kept]
+
+    branch = {col: np.copy(network.branch[col][np.array(row)[branches]]) for col in index.branch}
+    branch['F_BUS'] = ext[np.array(f_bus)[branches]]
+    branch['T_BUS'] = ext[np.array(t_bus)[branches]]
+    branch['BR_X'] = np.array(x)[branches]
+    for name in rates:
+        branch[name] = np.array(rates[name])[branches]
+
+    gen = {col: np.copy(network.gen[col]) for col in index.gen}
+    gen['GEN_BUS'] = ext[network.gen['GEN_BUS'].astype(int) - 1]
+
+    data = {'baseMVA': network.baseMVA,
+            'bus': np.column_stack([bus[col] for col in index.bus]),
+            'gen': np.column_stack([gen[col] for col in index.gen]),
+            'gencost': np.column_stack([network.gencost[col] for col in index.cost]),
+            'branch': np.column_stack([branch[col] for col in index.branch])}
+
+    reduced = type(network)(data, perunit=False)
+    reduced.voll = network.voll[kept]
+
+    return reduced, Expansion(kept, F, f0, A, Af, a0)
+
+
+def _follow(merged, k):
+    # Branch of the reduced network that carries the flow of branch k, and the sign of the flow of k relative to it
+    sign = 1.
+    while k in merged:
+        k, s = merged[k]
+        sign *= s
+    return k, sign
+
+
+def _min_rating(a, b):
+    # A rating of 0 means unlimited in MATPOWER
+    if a == 0:
+        return b
+    if b == 0:
+        return a
+    return min(a, b)
@@ -0,0 +1,182 @@
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+__all__ = ['Result', 'Dispatch']
+
+
+class Result:
+    '''Solver result annotated with additional information.
+
+    Wraps the state returned by the LP solver. Items and attributes that are not part of the annotations are looked up
+    on the solver state, so the result can be used in place of it (e.g. res['x']).
+    '''
+
+    def __init__(self, state, **info):
+        self.state = state
+        self.info = info
+
+    def __getitem__(self, key):
+        if key in self.info:
+            return self.info[key]
+        return self.state[key]
+
+    def __contains__(self, key):
+        return key in self.info or key in self.state
+
+    def __getattr__(self, name):
+        if name in ('state', 'info'):
+            raise AttributeError(name)
+        if name in self.info:
+            return self.info[name]
+        return getattr(self.state, name)
+
+    def __repr__(self):
+        return repr(self.state)
+
+
+class Dispatch:
+    '''Line flows, nodal prices and congestion rents of one or more dispatch solutions.
+
+    g is the n_g generator dispatch, or a T x n_g matrix with one interval per row, and pd the matching nodal demand
+    (default: the demand of the network). The network data that is needed is captured on construction, so later
+    changes to the network do not affect the result. Derived arrays are computed for all intervals at once on first
+    access and retained; those of a batch have one row per interval.
+
+    Prices require the duals of the LP of the given formulation ('ISF' or 'YT'): the marginals of its inequality and
+    its equality constraints (see backend.Backend.duals), each as a vector or a T x m matrix. Items can be accessed
+    by name as well, e.g. dispatch['lmp'].
+
+    Bus-indexed arrays (injection and lmp) are in the internal bus order; buses holds the external bus number of each
+    of their entries and atBuses selects them by external bus numbers.
+    '''
+
+    def __init__(self, network, g, pd=None, formulation='ISF', duals=None):
+        g = np.asarray(g, dtype=float)
+        self.batch = g.ndim > 1
+        self.formulation = formulation
+
+        self.ISF = network.ISF
+        self.lineOutages = network.lineOutages
+        self.online = network.online
+        self.f_bus = network.branch['F_BUS'][network.online].astype(int) - 1
+        self.t_bus = network.branch['T_BUS'][network.online].astype(int) - 1
+        self.rate = network.branch['RATE_A'][network.online]
+
+        # External bus numbers of the internal buses, for the bus-indexed arrays
+        self.buses = np.copy(network.int2ext)
+        self._ext2int = network.ext2int
+
+        gen_bus = network.gen['GEN_BUS'].astype(int) - 1
+        self._Cg = sp.sparse.csr_matrix((np.ones((network.n_g, )), (gen_bus, np.arange(network.n_g))),
+                                        (network.n_b, network.n_g))
+
+        self._g = np.atleast_2d(g)
+        pd = network.bus['PD'] if pd is None else pd
+        self._pd = np.array(np.broadcast_to(np.asarray(pd, dtype=float), (self._g.shape[0], network.n_b)))
+
+        self._duals = None
+        if duals is not None:
+            self._duals = tuple(np.atleast_2d(np.asarray(d, dtype=float)) for d in duals)
+
+        # Derived arrays of all intervals (T x ...), by name
+        self._cache = dict()
+
+    def _get(self, name):
+        if name not in self._cache:
+            self._cache[name] = getattr(self, '_' + name)()
+        return self._cache[name]
+
+    def _out(self, name):
+        value = self._get(name)
+        return value if self.batch else value[0]
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    @property
+    def PG(self):
+        '''Generator dispatch.'''
+        return self._g if self.batch else self._g[0]
+
+    @property
+    def injection(self):
+        '''Net nodal injections Cg g - PD.'''
+        return self._out('injection')
+
+    @property
+    def flows(self):
+        '''Flows on the in-service branches (in the order of network.online).'''
+        return self._out('flows')
+
+    @property
+    def loading(self):
+        '''Flows on the in-service branches relative to their long term ratings (RATE_A).'''
+        return self._out('loading')
+
+    @property
+    def contingencyFlows(self):
+        '''Post-outage flows on the in-service branches (rows) under each outage of network.lineOutages (columns).
+
+        The row of the outaged line is zero. For a batch the array is T x n_l x n_o.
+        '''
+        return self._out('contingencyFlows')
+
+    @property
+    def shadowPrices(self):
+        '''Marginal cost of the flow limits of the in-service branches, positive if limited in the from-to direction.'''
+        return self._out('shadowPrices')
+
+    @property
+    def lmp(self):
+        '''Locational marginal prices, i.e. the marginal cost of demand at each bus.'''
+        return self._out('lmp')
+
+    @property
+    def congestionRent(self):
+        '''Congestion rent of the in-service branches: their flows times the price difference across them.'''
+        return self._out('congestionRent')
+
+    def atBuses(self, key, buses):
+        '''Values of the bus-indexed array key ('injection' or 'lmp') at the buses with the given external numbers.'''
+        if key not in ('injection', 'lmp'):
+            raise ValueError('Invalid bus-indexed array. (Required: \'injection\' or \'lmp\'; Provided: %s)' % key)
+        return self[key][..., self._ext2int(buses)]
+
+    def _injection(self):
+        return self._Cg.dot(self._g.transpose()).transpose() - self._pd
+
+    def _flows(self):
+        return self.ISF.dot(self._get('injection').transpose()).transpose()
+
+    def _loading(self):
+        return np.abs(self._get('flows')) / self.rate
+
+    def _contingencyFlows(self):
+        if self.lineOutages is None:
+            raise ValueError('Contingency flows require the line outages of the network (see makeDCLineOutages).')
+
+        return self.lineOutages.flows(self._get('flows'))
+
+    def _shadowPrices(self):
+        # The flow limits are the upper (from-to) and then the lower (to-from) limits of the in-service branches
+        n_l = len(self.online)
+        marginals = self._dual(0)
+        return marginals[:, n_l:2 * n_l] - marginals[:, :n_l]
+
+    def _lmp(self):
+        if self.formulation == 'ISF':
+            # Energy price less the cost of the flows that an injection at each bus induces on the limited lines
+            return self._dual(1)[:, :1] - self.ISF.rdot(self._get('shadowPrices').transpose()).transpose()
+        elif self.formulation == 'YT':
+            return self._dual(1)
+        raise NotImplementedError
+
+    def _congestionRent(self):
+        lmp = self._get('lmp')
+        return self._get('flows') * (lmp[:, self.t_bus] - lmp[:, self.f_bus])
+
+    def _dual(self, i):
+        if self._duals is None:
+            raise ValueError('Prices require the duals of the LP, which were not provided by the backend.')
+        return self._duals[i]
@@ -1,22 +1,151 @@
-import stukapy as st
+import time
 
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+from . import backend as phasorBackend
+from . import ed as phasorED
+from . import instrument as phasorInstrument
 from . import network as phasorNetwork
-from . import _psced, _csced, _rsced
+from . import result as phasorResult
+from . import _parallel, _psced, _csced, _rsced
+
+__all__ = ['PSCED', 'CSCED', 'RSCED', 'Benders']
+
+class Benders:
+    '''Benders decomposition driver for decomposed LPs.
+
+    The master problem is the coupling block of the decomposed LP (the base case, appended last) with a cost-to-go
+    variable per subproblem, or a single one if cuts are aggregated. Each iteration solves the master problem and
+    then all subproblems at its solution, in a pool of the given number of worker processes if workers > 1 (default:
+    the workers of the model), and adds optimality cuts from the subproblem duals. With warm_start, every subproblem
+    is started from its previous solution on backends that support it. Iterates until the gap between the lower
+    bound of the master problem and the best upper bound is within a relative tolerance tol, or max_iter iterations.
+
+    Requires a backend that reports duals (e.g. highs) and subproblems that are feasible for every master solution,
+    as are those of RSCED, whose violations are penalized by slack variables.
+    '''
+
+    def __init__(self, workers=None, aggregate=False, warm_start=True, tol=1e-6, max_iter=100):
+        self.workers = workers
+        self.aggregate = aggregate
+        self.warm_start = warm_start
+        self.tol = tol
+        self.max_iter = max_iter
+
+    def solve(self, dlp, backend, solveropts=None, workers=None):
+        '''Solve the decomposed LP (c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub).
+
+        Returns a dict with the solution 'x' (the subproblem blocks followed by the coupling block), its cost 'fun',
+        the 'lower' bound, whether it 'converged', and the bounds, cut counts and timings of every iteration.
+        '''
+        c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = dlp
+        K = len(C_ub)
+        n = len(c[K])
+        workers = self.workers if self.workers is not None else workers
+        if workers is not None and workers > 1 and solveropts is not None and type(solveropts) is not dict:
+            raise ValueError('Solver options must be given as a dict when solving in parallel.')
+
+        subproblems = [(c[k], A_ub[k], b_ub[k], C_ub[k], A_eq[k], b_eq[k], C_eq[k], lb[k], ub[k]) for k in range(K)]
+
+        # Cost-to-go variables are bounded below by the cost of the subproblems over their variable bounds
+        bound = np.array([np.sum(ck[ck > 0] * lbk[ck > 0]) + np.sum(ck[ck < 0] * ubk[ck < 0])
+                          for ck, lbk, ubk in zip(c[:K], lb[:K], ub[:K])])
+        if self.aggregate:
+            bound = np.array([np.sum(bound)])
+        if not np.all(np.isfinite(bound)):
+            raise ValueError('Benders decomposition requires subproblem costs bounded below by the variable bounds.')
+        n_theta = len(bound)
+
+        master = (np.concatenate((c[K], np.ones((n_theta, )))),
+                  sp.sparse.hstack((A_ub[K], sp.sparse.csr_matrix((A_ub[K].shape[0], n_theta)))), b_ub[K],
+                  sp.sparse.hstack((A_eq[K], sp.sparse.csr_matrix((A_eq[K].shape[0], n_theta)))), b_eq[K],
+                  np.concatenate((lb[K], bound)), np.concatenate((ub[K], np.inf * np.ones((n_theta, )))))
+        cuts, rhs = [], []
+
+        state = {'x': None, 'fun': np.inf, 'lower': -np.inf, 'converged': False, 'iterations': []}
+        x0 = [None] * K
+
+        executor = None
+        if workers is not None and workers > 1 and K > 1:
+            executor = _parallel.pool(workers, initializer=_benders_init, initargs=(subproblems, solveropts, backend))
+
+        try:
+            for i in range(self.max_iter):
+                start = time.perf_counter()
+                A = sp.sparse.vstack([master[1]] + cuts, 'csr')
+                res = backend.solve((master[0], A, np.concatenate([master[2]] + rhs), master[3], master[4],
+                                     master[5], master[6]), solveropts)
+                if res['x'] is None:
+                    raise RuntimeError('Failed to solve the Benders master problem.')
+                y = np.asarray(res['x'], dtype=float)
+                xK, theta = y[:n], y[n:]
+                lower = master[0].dot(y)
+
+                middle = time.perf_counter()
+                if executor is not None:
+                    # Warm starts are sent with every chunk since chunks may be solved by any worker
+                    chunks = _parallel.chunks(K, workers)
+                    results = [r for chunk in executor.map(_benders_chunk, chunks, [xK] * len(chunks),
+                                                           [x0[start:stop] for start, stop in chunks]) for r in chunk]
+                else:
+                    results = [_benders_subproblem(subproblems[k], xK, solveropts, backend, x0[k]) for k in range(K)]
+                if self.warm_start:
+                    x0 = [r[2] for r in results]
+                stop = time.perf_counter()
+
+                fun = np.array([r[0] for r in results])
+                G = np.array([r[1] for r in results]).reshape((K, n))
+                upper = c[K].dot(xK) + np.sum(fun)
+                if upper < state['fun']:
+                    state['fun'] = upper
+                    state['x'] = np.concatenate([r[2] for r in results] + [xK])
+                state['lower'] = max(state['lower'], lower)
+
+                # Optimality cuts theta_k >= Q_k(xK) + g_k (x - xK) of the subproblems whose cost is underestimated
+                if self.aggregate:
+                    G, fun = G.sum(axis=0, keepdims=True), np.array([np.sum(fun)])
+                violated = np.where(fun - theta > self.tol * max(1., abs(upper)) / n_theta)[0]
+                if len(violated) > 0:
+                    E = sp.sparse.csr_matrix((-np.ones((len(violated), )), (np.arange(len(violated)), violated)),
+                                             (len(violated), n_theta))
+                    cuts.append(sp.sparse.hstack((sp.sparse.csr_matrix(G[violated]), E), 'csr'))
+                    rhs.append(G[violated].dot(xK) - fun[violated])
+
+                gap = state['fun'] - state['lower']
+                state['iterations'].append({'lower': lower, 'upper': upper, 'gap': gap, 'cuts': len(violated),
+                                            'master_time': middle - start, 'subproblem_time': stop - middle})
+
+                if gap <= self.tol * max(1., abs(state['fun'])) or len(violated) == 0:
+                    state['converged'] = True
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return state
 
-__all__ = ['PSCED', 'CSCED', 'RSCED']
 
 class SCED:
-    def __init__(self, network):
+    def __init__(self, network, workers=None, backend=None, driver=None):
         if type(network) is not phasorNetwork.PowerNetwork:
             raise ValueError('Invalid network type. (Required: phasorpy.network.PowerNetwork; Provided: %s)' % type(network))
 
         self.network = network
+        self.workers = workers
+
+        # LP engine (see phasorpy.backend); None for the default backend
+        self.backend = backend
+
+        # Decomposition driver (e.g. Benders); None to solve the decomposed LP with the backend
+        self.driver = driver
 
         if self.network.Bbus is None:
             self.network.makeDC()
 
         if self.network.lineOutages is None or len(self.network.lineOutages) == 0:
-            self.network.makeDCLineOutages()
+            self.network.makeDCLineOutages(workers)
 
     def constructLP(self, formulation='ISF'):
         raise NotImplementedError
@@ -25,31 +154,25 @@ class SCED:
         raise NotImplementedError
 
     def solve(self, formulation='ISF', solveropts=None):
-        if solveropts is None:
-            opts = st.Options()
-        elif type(solveropts) is st.Options:
-            opts = solveropts
-        else:
-            opts = st.Options()
-            if type(solveropts) is dict:
-                if 'max_iter' in solveropts:
-                    opts.max_iter = solveropts['max_iter']
-                if 'tol' in solveropts:
-                    opts.tol = solveropts['tol']
-                if 'x0' in solveropts:
-                    opts.x0 = solveropts['x0']
-                if 'lp_solver' in solveropts:
-                    opts.lp_solver = solveropts['lp_solver']
-                if 'qp_solver' in solveropts:
-                    opts.qp_solver = solveropts['qp_solver']
-                if 'dlp_solver' in solveropts:
-                    opts.dlp_solver = solveropts['dlp_solver']
-
-        c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = self.constructLP(formulation)
-        dlp = st.DecomposedLinearProgram(c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub)
-        res = st.linprog(dlp, opts)
+        backend = phasorBackend.get(self.backend)
 
-        return res
+        with phasorInstrument.trace() as metrics:
+            with phasorInstrument.stage('sced.constructLP', formulation=formulation) as s:
+                c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = self.constructLP(formulation)
+                s.update(A_ub=A_ub, C_ub=C_ub, A_eq=A_eq, C_eq=C_eq)
+
+            dlp = (c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub)
+            if self.driver is None:
+                with phasorInstrument.stage('sced.linprog', formulation=formulation, backend=backend.name):
+                    res = backend.solveDecomposed(dlp, solveropts)
+            else:
+                with phasorInstrument.stage('sced.benders', formulation=formulation, backend=backend.name) as s:
+                    res = self.driver.solve(dlp, backend, solveropts, self.workers)
+                    s.update(iterations=len(res['iterations']), converged=res['converged'])
+
+        dispatch = None if res['x'] is None else self.interpretState(res['x'])
+
+        return phasorResult.Result(res, metrics=metrics, dispatch=dispatch)
 
 
 class PSCED(SCED):
@@ -69,16 +192,141 @@ class CSCED(SCED):
 
 
 class RSCED(SCED):
-    def __init__(self, network, alpha=0.):
-        super().__init__(network)
+    def __init__(self, network, alpha=0., workers=None, backend=None, driver=None):
+        super().__init__(network, workers, backend, driver)
 
         assert alpha >= 0. and alpha < 1.
         self.alpha = alpha
         self.alphap = 1./(1. - self.alpha)
 
+        # Indices of the line outages included in the LP (None for all) and their probabilities (None for their own)
+        self.outages = None
+        self.prob = None
+
+        # Reduced scenario set (see reduce)
+        self.reduction = None
 
     def constructLP(self, formulation='ISF'):
-        return _rsced.constructLP(self.network, formulation, self.alphap)
+        return _rsced.constructLP(self.network, formulation, self.alphap, self.workers, self.outages, self.prob)
+
+    def reduce(self, size=None, tol=None):
+        '''Solve for a reduced set of outage scenarios from now on.
+
+        Outages with similar impacts are merged into at most size scenarios, or into as few scenarios as keep the
+        error bound of the CVaR term below tol (see _rsced.reduce). The merged probabilities are those of the outages
+        at the time of the call. Returns the reduction, which is also reported as res['reduction'] of solve. reduce()
+        without arguments restores the full set.
+        '''
+        if size is None and tol is None:
+            self.reduction = None
+            return None
+
+        with phasorInstrument.stage('rsced.reduce', outages=len(self.network.lineOutages)) as s:
+            self.reduction = _rsced.reduce(self.network, self.alphap, size, tol)
+            s.update(scenarios=len(self.reduction['outages']), error=self.reduction['error'])
+
+        return self.reduction
+
+    def screen(self, g):
+        '''Worst post-outage overload of every line outage under the generator dispatch g.'''
+        with phasorInstrument.stage('rsced.screen', outages=len(self.network.lineOutages)):
+            return _rsced.screen(self.network, g)
+
+    def solve(self, formulation='ISF', solveropts=None, screening=False, margin=0., max_rounds=20):
+        '''Solve the risk-based SCED.
+
+        With screening, the LP only includes the line outages that overload a line (within the given margin) under the
+        economic dispatch, or under the solveropts x0 if provided. The LP is then re-solved with any further outages
+        that are violated by its dispatch until none remain. The screening report is returned as res['screening'] with
+        the kept and dropped outages, the outages added in each round and the final overloads.
+
+        Without screening, the reduced scenarios are solved if reduce was called; screening always starts from the
+        full set of outages.
+        '''
+        self.prob = None
+        if not screening:
+            if self.reduction is None:
+                self.outages = None
+                return super().solve(formulation, solveropts)
+
+            self.outages, self.prob = self.reduction['outages'], self.reduction['prob']
+            res = super().solve(formulation, solveropts)
+            res.info['reduction'] = self.reduction
+            return res
+
+        with phasorInstrument.trace() as metrics:
+            x0 = phasorBackend.options(solveropts).get('x0')
+            if x0 is None:
+                x0 = phasorED.EconomicDispatch(self.network, self.backend).solve('ISF')['x']
+
+            violation = self.screen(_rsced.dispatch(self.network, x0))
+            ranking = np.argsort(-violation)
+
+            # Always retain the highest ranked outage so that the LP is decomposed
+            kept = np.sort(ranking[violation[ranking] > -margin])
+            if len(kept) == 0:
+                kept = ranking[:1]
+
+            report = {'ranking': ranking,
+                      'kept': kept,
+                      'dropped': np.setdiff1d(np.arange(len(violation)), kept),
+                      'added': []}
+
+            self.outages = kept
+            for _ in range(max_rounds):
+                res = super().solve(formulation, solveropts)
+
+                violation = self.screen(_rsced.dispatch(self.network, res['x']))
+                added = np.setdiff1d(np.where(violation > -margin)[0], self.outages)
+                if len(added) == 0:
+                    break
+
+                report['added'].append(added)
+                self.outages = np.union1d(self.outages, added)
+
+        report['outages'] = self.outages
+        report['violation'] = violation
+        res.info['screening'] = report
+        res.info['metrics'] = metrics
+
+        return res
 
     def interpretState(self, x):
-        return _rsced.interpretState(self.network, x)
\ No newline at end of file
+        return _rsced.interpretState(self.network, x)
+
+
+def _benders_subproblem(subproblem, xK, solveropts, backend, x0=None):
+    # Cost of the subproblem at the coupling variables xK, its gradient in xK and the solution
+    c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = subproblem
+    rhs_ub = b_ub if C_ub is None else b_ub - C_ub.dot(xK)
+    rhs_eq = b_eq if C_eq is None else b_eq - C_eq.dot(xK)
+
+    res = backend.solve((c, A_ub, rhs_ub, A_eq, rhs_eq, lb, ub), solveropts, x0)
+    if res['x'] is None:
+        raise RuntimeError('Failed to solve a Benders subproblem.')
+    duals = backend.duals(res)
+    if duals is None:
+        raise ValueError('Benders decomposition requires a backend that reports duals.')
+
+    x = np.asarray(res['x'], dtype=float)
+    g = np.zeros((len(xK), ))
+    if C_ub is not None:
+        g -= C_ub.transpose().dot(duals[0])
+    if C_eq is not None:
+        g -= C_eq.transpose().dot(duals[1])
+
+    return c.dot(x), g, x
+
+
+_worker = dict()
+
+
+def _benders_init(subproblems, solveropts, backend):
+    _worker['subproblems'] = subproblems
+    _worker['solveropts'] = solveropts
+    _worker['backend'] = backend
+
+
+def _benders_chunk(chunk, xK, x0):
+    return [_benders_subproblem(_worker['subproblems'][k], xK, _worker['solveropts'], _worker['backend'], x0[i])
+            for i, k in enumerate(range(*chunk))]
@@ -0,0 +1,144 @@
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+from . import instrument, result
+
+__all__ = ['SecurityReport', 'security_assessment']
+
+
+class SecurityReport:
+    '''Post-contingency overloads of a dispatch.
+
+    violations is the sparse n_l x n_o matrix of the overloads (post-outage flow magnitude less the rating) of the
+    in-service branches (rows, in the order of network.online) under each single line outage (columns, the branches
+    in outages), and flows the matching post-outage flows. Only overloads above the margin are stored. Likewise
+    pairViolations and pairFlows hold those of the double outages of the branches in pairs; islanding marks the pairs
+    whose outage islands the network, which are not assessed. Pairs of a branch with itself are skipped.
+    '''
+
+    def __init__(self, outages, violations, flows, pairs, pairViolations, pairFlows, islanding, online, rating):
+        self.outages = outages
+        self.violations = violations
+        self.flows = flows
+        self.pairs = pairs
+        self.pairViolations = pairViolations
+        self.pairFlows = pairFlows
+        self.islanding = islanding
+        self.online = online
+        self.rating = rating
+
+    @property
+    def secure(self):
+        '''Whether no assessed outage overloads a line.'''
+        return self.violations.nnz == 0 and self.pairViolations.nnz == 0
+
+    def worst(self):
+        '''Largest overload under each single line outage (zero if it overloads no line).'''
+        return self.violations.max(axis=0).toarray().ravel()
+
+    def table(self, pairs=False):
+        '''Violations as rows (outaged branch, [second outaged branch,] overloaded branch, flow, rating).
+
+        Branches are given by their (zero-based) indices in the branch data.
+        '''
+        V = (self.pairViolations if pairs else self.violations).tocoo()
+        F = (self.pairFlows if pairs else self.flows).tocsc()
+        outaged = self.pairs[V.col] if pairs else self.outages[V.col][:, None]
+        flows = np.asarray(F[V.row, V.col]).ravel()
+
+        return np.column_stack((outaged, self.online[V.row], flows, self.rating[V.row]))
+
+    def __repr__(self):
+        return 'SecurityReport(outages=%d, violations=%d, pairs=%d, pairViolations=%d, islanding=%d)' % (
+            len(self.outages), self.violations.nnz, len(self.pairs), self.pairViolations.nnz,
+            int(np.sum(self.islanding)))
+
+
+def security_assessment(network, dispatch, pairs=None, rating=None, margin=0., chunksize=256):
+    '''Assess the single (N-1) and the given double (N-2) line outages under a dispatch.
+
+    dispatch is the n_g generator dispatch or a result.Dispatch of a single interval, e.g. res['dispatch'] of
+    EconomicDispatch.solve. Post-outage flows of all single line outages of network.lineOutages (which are made if
+    missing) are formed from the base-case flows and the LODFs in blocks of chunksize outages, so no network matrices
+    are refactorized. pairs is a k x 2 array of (zero-based) branch indices whose double outages are assessed as well,
+    from the LODFs of both lines.
+
+    Flows are compared against the given branch rating ('RATE_A', 'RATE_B' or 'RATE_C'; default: the smaller of
+    RATE_B and RATE_C). Returns a SecurityReport of the overloads that exceed the margin.
+    '''
+    if network.lineOutages is None:
+        network.makeDCLineOutages()
+    outages = network.lineOutages
+
+    if isinstance(dispatch, result.Dispatch):
+        if dispatch.batch:
+            raise ValueError('Security assessment requires the dispatch of a single interval.')
+        flow = dispatch.flows
+    else:
+        flow = result.Dispatch(network, dispatch).flows
+
+    if rating is None:
+        limit = np.minimum(network.branch['RATE_B'], network.branch['RATE_C'])[outages.online]
+    else:
+        limit = network.branch[rating][outages.online]
+
+    pairs = np.zeros((0, 2), dtype=int) if pairs is None else np.atleast_2d(np.asarray(pairs, dtype=int))
+
+    with instrument.stage('security.assess', outages=len(outages), pairs=len(pairs)) as s:
+        # Single outages
+        violations, flows = [], []
+        for start in range(0, max(len(outages), 1), chunksize):
+            F = outages.flows(flow, slice(start, start + chunksize))
+            V, Fv = _violations(F, limit, margin)
+            violations.append(V)
+            flows.append(Fv)
+
+        # Double outages: flows on the outaged lines a and b in the intact network shift through their LODF columns,
+        # corrected for the interaction of the two outages
+        column = np.full((len(flow), ), -1, dtype=int)
+        column[outages.lines] = np.arange(len(outages))
+        row = np.full((network.branch['BR_STATUS'].shape[0], ), -1, dtype=int)
+        row[outages.online] = np.arange(len(outages.online))
+
+        a, b = row[pairs[:, 0]], row[pairs[:, 1]]
+        if np.any(a < 0) or np.any(b < 0):
+            raise ValueError('Pairs must be of branches in service.')
+        ka, kb = column[a], column[b]
+
+        # Pairs of a branch with itself are not double outages and are skipped
+        skipped = a == b
+        islanding = ((ka < 0) | (kb < 0)) & ~skipped
+        La = outages.LODF[:, np.where(islanding | skipped, 0, ka)]
+        Lb = outages.LODF[:, np.where(islanding | skipped, 0, kb)]
+        index = np.arange(len(pairs))
+
+        # The flows za and zb shifted off a and b vanish the flows on both lines:
+        # za = flow[a] + Lb[a] zb and zb = flow[b] + La[b] za
+        Lba, Lab = Lb[a, index], La[b, index]
+        det = 1. - Lba * Lab
+        islanding |= (np.abs(det) < 1e-6) & ~skipped
+        det = np.where(islanding | skipped, 1., det)
+
+        za = (flow[a] + Lba * flow[b]) / det
+        zb = (flow[b] + Lab * flow[a]) / det
+        F = flow[:, None] + La * za + Lb * zb
+        F[a, index] = 0.
+        F[b, index] = 0.
+        F[:, islanding | skipped] = 0.
+        pairViolations, pairFlows = _violations(F, limit, margin)
+
+        report = SecurityReport(outages.online[outages.lines], sp.sparse.hstack(violations, 'csc'),
+                                sp.sparse.hstack(flows, 'csc'), pairs, pairViolations, pairFlows, islanding,
+                                outages.online, limit)
+        s.update(violations=report.violations.nnz, pair_violations=report.pairViolations.nnz)
+
+    return report
+
+
+def _violations(F, limit, margin):
+    # Sparse overloads and flows of the entries of the post-outage flows F that exceed the limit by the margin
+    overload = np.abs(F) - limit[:, None]
+    rows, cols = np.nonzero(overload > margin)
+    return (sp.sparse.csc_matrix((overload[rows, cols], (rows, cols)), F.shape),
+            sp.sparse.csc_matrix((F[rows, cols], (rows, cols)), F.shape))
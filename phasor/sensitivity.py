@@ -0,0 +1,388 @@
+import numpy as np
+import scipy as sp
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+from . import _parallel
+
+__all__ = ['InjectionShiftFactor', 'ModifiedShiftFactor', 'OutageShiftFactor', 'LineOutageSet', 'apply_outage', 'lodf']
+
+
+class InjectionShiftFactor:
+    '''Factorized injection shift factor (ISF/PTDF) operator.
+
+    Behaves like the n_l x n_b ISF matrix of a DC network, but only stores a sparse LU factorization of the reduced
+    Bbus. Rows, columns and products are computed on demand and the dense matrix is only formed by toarray().
+
+    The operator reproduces the least-squares ISF built by PowerNetwork.makeDC, i.e. for a single slack bus the
+    injections are balanced by removing their mean before solving against the reduced Bbus.
+    '''
+
+    ndim = 2
+
+    def __init__(self, Bbus, Bf, nonslack, ordering=None):
+        self.shape = (Bf.shape[0], Bbus.shape[0])
+        self.nonslack = np.asarray(nonslack)
+        self.Bbus = Bbus
+        self.Bf = Bf
+        self.ordering = ordering
+
+        self._Bf = sp.sparse.csr_matrix(Bf[:, self.nonslack])
+        self._full = None
+
+        if len(self.nonslack) == self.shape[1] - 1:
+            # Single slack bus: least squares reduces to the square system in the reduced Bbus
+            self._Bbus_ref = None
+            self._lu, self._perm = _factorize(Bbus[self.nonslack, :][:, self.nonslack], ordering)
+        else:
+            # General case: factorize the normal equations as in MATPOWER's least-squares formulation
+            self._Bbus_ref = sp.sparse.csc_matrix(Bbus[:, self.nonslack])
+            self._lu, self._perm = _factorize(self._Bbus_ref.transpose().dot(self._Bbus_ref), ordering)
+
+    @property
+    def nbytes(self):
+        '''Approximate memory held by the factorization and, if materialized, the dense matrix.'''
+        nbytes = self._lu.nnz * (np.dtype(float).itemsize + np.dtype(np.int32).itemsize)
+        nbytes += self._Bf.data.nbytes + self._Bf.indices.nbytes + self._Bf.indptr.nbytes
+        return nbytes + (0 if self._full is None else self._full.nbytes)
+
+    def _solve(self, b, trans='N'):
+        if self._perm is None:
+            return self._lu.solve(b, trans=trans)
+
+        # Symmetrically permuted factorization P B P.T: B^-1 b = P.T (P B P.T)^-1 P b, and likewise for B^-T
+        x = np.empty_like(b, dtype=float)
+        x[self._perm] = self._lu.solve(np.asarray(b, dtype=float)[self._perm], trans=trans)
+        return x
+
+    def _rhs(self, x):
+        if self._Bbus_ref is None:
+            return (x - np.mean(x, axis=0))[self.nonslack]
+        return self._Bbus_ref.transpose().dot(x)
+
+    def _rhs_transpose(self, z):
+        if self._Bbus_ref is None:
+            y = np.zeros((self.shape[1],) + z.shape[1:])
+            y[self.nonslack] = z
+            return y - np.mean(y, axis=0)
+        return self._Bbus_ref.dot(z)
+
+    def dot(self, x):
+        '''Compute ISF @ x for a vector or an n_b x k matrix x.'''
+        if self._full is not None:
+            return self._full.dot(x)
+
+        x = np.asarray(x, dtype=float)
+        return self._Bf.dot(self._solve(self._rhs(x)))
+
+    def rdot(self, y):
+        '''Compute ISF.T @ y for a vector or an n_l x k matrix y.'''
+        if self._full is not None:
+            return self._full.transpose().dot(y)
+
+        y = np.asarray(y, dtype=float)
+        return self._rhs_transpose(self._solve(self._Bf.transpose().dot(y), trans='T'))
+
+    def __matmul__(self, x):
+        return self.dot(x)
+
+    def columns(self, buses):
+        '''Dense ISF columns for the given (injection) buses.'''
+        buses = np.asarray(buses, dtype=int)
+        if self._full is not None:
+            return self._full[:, buses]
+
+        E = np.zeros((self.shape[1], len(buses)))
+        E[buses, np.arange(len(buses))] = 1.
+        return self.dot(E)
+
+    def rows(self, lines):
+        '''Dense ISF rows for the given (monitored) lines.'''
+        lines = np.asarray(lines, dtype=int)
+        if self._full is not None:
+            return self._full[lines, :]
+
+        E = np.zeros((self.shape[0], len(lines)))
+        E[lines, np.arange(len(lines))] = 1.
+        return self.rdot(E).transpose()
+
+    def toarray(self):
+        '''Materialize (and retain) the full dense ISF matrix.'''
+        if self._full is None:
+            self._full = self.columns(np.arange(self.shape[1]))
+        return self._full
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.toarray(), dtype=dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+
+        if self._full is not None:
+            return self._full[rows, cols]
+
+        if isinstance(rows, slice) and rows == slice(None):
+            cols = np.arange(self.shape[1])[cols]
+            return self.columns(np.atleast_1d(cols))[:, 0] if np.ndim(cols) == 0 else self.columns(cols)
+
+        rows = np.arange(self.shape[0])[rows]
+        H = self.rows(np.atleast_1d(rows))
+        return H[0, cols] if np.ndim(rows) == 0 else H[:, cols]
+
+
+class ModifiedShiftFactor(InjectionShiftFactor):
+    '''ISF operator of a network whose Bbus differs from that of a factorized ISF by a low-rank modification.
+
+    The modification Bbus = base.Bbus + U diag(d) U.T, e.g. from switching k lines with terminal incidence U and
+    susceptance changes d, is applied through the Sherman-Morrison-Woodbury identity so that the sparse LU
+    factorization of the base ISF is reused and only a k x k system is factorized. Requires a single slack bus.
+    The optional labels identify the columns of U, e.g. the indices of the switched branches.
+
+    Raises ValueError if the modified Bbus is singular, i.e. if the modification islands the network.
+    '''
+
+    def __init__(self, base, Bbus, Bf, U, d, labels=None, tol=1e-6):
+        if base._Bbus_ref is not None:
+            raise NotImplementedError('Low-rank ISF updates require a single slack bus.')
+
+        self.shape = (Bf.shape[0], Bbus.shape[0])
+        self.nonslack = base.nonslack
+        self.Bbus = Bbus
+        self.Bf = Bf
+        self.base = base
+
+        self._Bf = sp.sparse.csr_matrix(Bf[:, self.nonslack])
+        self._full = None
+        self._Bbus_ref = None
+        self._lu = base._lu
+        self._perm = None
+        self.ordering = base.ordering
+
+        self.U = sp.sparse.csc_matrix(U)
+        self.d = np.asarray(d, dtype=float)
+        self.labels = labels
+
+        d = self.d
+        self._U = sp.sparse.csr_matrix(U)[self.nonslack, :]
+        self._W = base._solve(self._U.toarray())
+        self._Wt = base._solve(self._U.toarray(), trans='T')
+
+        # Capacitance matrix diag(1/d) + U.T B^-1 U, singular exactly when the modified Bbus is; checked in the
+        # symmetrically scaled form sign(d) + |d|^1/2 U.T B^-1 U |d|^1/2 so that the tolerance is relative
+        scale = np.sqrt(np.abs(d))
+        S = self._U.transpose().dot(self._W)
+        if len(d) > 0 and np.min(np.linalg.svd(np.diag(np.sign(d)) + scale[:, None] * S * scale[None, :],
+                                               compute_uv=False)) < tol:
+            raise ValueError('Bbus modification islands the network.')
+        self._S = sp.linalg.lu_factor(np.diag(1. / d) + S)
+
+    @property
+    def nbytes(self):
+        nbytes = self._W.nbytes + self._Wt.nbytes + self._Bf.data.nbytes + self._Bf.indices.nbytes
+        return nbytes + (0 if self._full is None else self._full.nbytes)
+
+    def _solve(self, b, trans='N'):
+        y = self.base._solve(b, trans)
+        if trans == 'N':
+            return y - self._W.dot(sp.linalg.lu_solve(self._S, self._U.transpose().dot(y)))
+        return y - self._Wt.dot(sp.linalg.lu_solve(self._S, self._U.transpose().dot(y), trans=1))
+
+
+class OutageShiftFactor:
+    '''Post-outage ISF operator for the outage of a single line.
+
+    Represents ISF + LODF[:, k] ISF[k, :] with the row of the outaged line k removed. Everything is computed on demand
+    from the base-case ISF operator, so only the LODF column of the outage is stored.
+    '''
+
+    ndim = 2
+
+    def __init__(self, base, line, lodf):
+        self.shape = (base.shape[0] - 1, base.shape[1])
+        self.base = base
+        self.line = line
+        self.lodf = lodf
+
+    def update(self, F):
+        '''Apply the outage to base-case flows (or base-case ISF columns) F.'''
+        return apply_outage(F, self.line, self.lodf)
+
+    def dot(self, x):
+        '''Compute the post-outage flows ISF_k @ x for a vector or an n_b x k matrix x.'''
+        return self.update(self.base.dot(x))
+
+    def __matmul__(self, x):
+        return self.dot(x)
+
+    def columns(self, buses):
+        '''Dense post-outage ISF columns for the given (injection) buses.'''
+        return self.update(self.base.columns(buses))
+
+    def toarray(self):
+        '''Form the full dense post-outage ISF matrix.'''
+        return self.columns(np.arange(self.shape[1]))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.toarray(), dtype=dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+
+        cols = np.arange(self.shape[1])[cols]
+        H = self.columns(np.atleast_1d(cols))
+        return H[rows, 0] if np.ndim(cols) == 0 else H[rows, :]
+
+
+class LineOutageSet:
+    '''Compact representation of a set of single line outages.
+
+    Stores the base-case ISF together with, for each outage, the row of the outaged line in the ISF, its LODF column
+    and its probability. Post-outage sensitivities and ratings are formed on demand from the base case; ratings are
+    read from the network's branch data rather than copied for every outage.
+
+    Iterating over the set (or indexing it) yields dicts with the keys 'prob', 'line', 'ISF' and 'branch'. skipped
+    holds the (zero-based) branches whose outage islands the network and which therefore have no outage in the set.
+    '''
+
+    def __init__(self, ISF, branch, online, lines, LODF, prob, skipped=None):
+        self.ISF = ISF
+        self.branch = branch
+        self.online = online
+        self.lines = lines
+        self.LODF = LODF
+        self.prob = prob
+        self.skipped = np.zeros((0, ), dtype=int) if skipped is None else skipped
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def __getitem__(self, k):
+        monitored = self.monitored(k)
+        return {
+            'prob': self.prob[k],
+            'line': self.online[self.lines[k]],
+            'ISF': self.isf(k),
+            'branch': {
+                'RATE_A': self.branch['RATE_A'][monitored],
+                'RATE_B': self.branch['RATE_B'][monitored],
+                'RATE_C': self.branch['RATE_C'][monitored]
+            }
+        }
+
+    def isf(self, k):
+        '''Post-outage ISF operator of outage k.'''
+        return OutageShiftFactor(self.ISF, self.lines[k], self.LODF[:, k])
+
+    def monitored(self, k):
+        '''Branch indices of the lines remaining in service after outage k.'''
+        return np.delete(self.online, self.lines[k])
+
+    def flows(self, F, outages=slice(None)):
+        '''Post-outage flows of the given outages (default: all) from base-case flows F.
+
+        F holds the flows of the in-service lines along its last axis, optionally for a batch of cases along the
+        leading axes. Returns an array of shape F.shape + (n_o, ) whose last axis indexes the outages. The row of the
+        outaged line vanishes since its LODF is -1.
+        '''
+        F = np.asarray(F)
+        return F[..., :, None] + self.LODF[:, outages] * F[..., self.lines[outages]][..., None, :]
+
+
+def _factorize(A, ordering=None):
+    '''Sparse LU factorization of the symmetric matrix A with the given fill-reducing ordering.
+
+    The ordering is None for SuperLU's default column ordering (COLAMD), 'amd' for a minimum degree ordering of the
+    symmetric structure, or 'rcm' for a reverse Cuthill-McKee permutation. Returns the factorization and, for 'rcm',
+    the permutation that was applied to the rows and columns of A.
+    '''
+    A = sp.sparse.csc_matrix(A)
+    if ordering is None:
+        return sp.sparse.linalg.splu(A), None
+    if ordering == 'amd':
+        return sp.sparse.linalg.splu(A, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.,
+                                     options=dict(SymmetricMode=True)), None
+    if ordering == 'rcm':
+        perm = sp.sparse.csgraph.reverse_cuthill_mckee(A, symmetric_mode=True)
+        return sp.sparse.linalg.splu(A[perm, :][:, perm], permc_spec='NATURAL', diag_pivot_thresh=0.,
+                                     options=dict(SymmetricMode=True)), perm
+    raise ValueError('Invalid ordering. (Required: None, \'amd\' or \'rcm\'; Provided: %s)' % ordering)
+
+
+def apply_outage(F, line, lodf):
+    '''Post-outage flows (or ISF columns) from base-case flows F for the outage of the given line (row of F).'''
+    F = F + np.multiply.outer(lodf, F[line])
+    return np.delete(F, line, axis=0)
+
+
+def lodf(ISF, f_bus, t_bus, lines=None, tol=1e-6, chunksize=512, workers=None):
+    '''Line outage distribution factors computed from the ISF of the intact network.
+
+    f_bus and t_bus are the (zero-based) terminal buses of the lines indexing the rows of the ISF. Returns the
+    n_l x k matrix of LODF columns for the outage of each of the given lines (default: all lines) along with a mask of
+    the outages that island the network, i.e. for which the LODF denominator 1 - PTDF_kk vanishes. The columns of
+    islanding outages are set to nan.
+
+    With workers > 1, blocks of columns are solved in a process pool. The network matrices and the result are
+    exchanged through shared memory and each worker factorizes the reduced Bbus once.
+    '''
+    lines = np.arange(ISF.shape[0]) if lines is None else np.asarray(lines, dtype=int)
+    f_bus = np.asarray(f_bus, dtype=int)
+    t_bus = np.asarray(t_bus, dtype=int)
+
+    # PTDF of a unit transfer between the terminals of each outaged line, solved in blocks to bound memory use
+    if workers is not None and workers > 1:
+        Bbus = sp.sparse.csc_matrix(ISF.Bbus)
+        Bf = sp.sparse.csr_matrix(ISF.Bf)
+        with _parallel.SharedArrays(Bbus_data=Bbus.data, Bbus_indices=Bbus.indices, Bbus_indptr=Bbus.indptr,
+                                    Bf_data=Bf.data, Bf_indices=Bf.indices, Bf_indptr=Bf.indptr,
+                                    nonslack=ISF.nonslack, f_bus=f_bus, t_bus=t_bus, lines=lines,
+                                    LODF=np.empty((ISF.shape[0], len(lines)))) as arrays:
+            with _parallel.pool(workers, arrays, _lodf_init, (Bbus.shape, Bf.shape, ISF.ordering)) as executor:
+                list(executor.map(_lodf_block, _parallel.chunks(len(lines), workers, chunksize)))
+            LODF = arrays['LODF'].copy()
+    else:
+        LODF = np.empty((ISF.shape[0], len(lines)))
+        for start in range(0, len(lines), chunksize):
+            LODF[:, start:start + chunksize] = _transfers(ISF, f_bus, t_bus, lines[start:start + chunksize])
+
+    denom = 1. - LODF[lines, np.arange(len(lines))]
+    islanding = np.abs(denom) < tol
+
+    LODF /= np.where(islanding, np.nan, denom)
+    LODF[lines, np.arange(len(lines))] = -1.
+    LODF[:, islanding] = np.nan
+
+    return LODF, islanding
+
+
+def _transfers(ISF, f_bus, t_bus, lines):
+    E = np.zeros((ISF.shape[1], len(lines)))
+    np.add.at(E, (f_bus[lines], np.arange(len(lines))), 1.)
+    np.add.at(E, (t_bus[lines], np.arange(len(lines))), -1.)
+    return ISF.dot(E)
+
+
+_worker = dict()
+
+
+def _lodf_init(Bbus_shape, Bf_shape, ordering):
+    s = _parallel.shared
+    Bbus = sp.sparse.csc_matrix((s['Bbus_data'], s['Bbus_indices'], s['Bbus_indptr']), Bbus_shape)
+    Bf = sp.sparse.csr_matrix((s['Bf_data'], s['Bf_indices'], s['Bf_indptr']), Bf_shape)
+    _worker['ISF'] = InjectionShiftFactor(Bbus, Bf, s['nonslack'], ordering)
+
+
+def _lodf_block(chunk):
+    start, stop = chunk
+    s = _parallel.shared
+    s['LODF'][:, start:stop] = _transfers(_worker['ISF'], s['f_bus'], s['t_bus'], s['lines'][start:stop])
@@ -0,0 +1,310 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+
+import numpy as np
+
+from . import backend as phasorBackend
+from . import ed as phasorED
+from . import network as phasorNetwork
+from . import sced as phasorSCED
+from . import _rsced
+
+__all__ = ['DispatchService', 'Client']
+
+# Models that can be requested
+MODELS = ['ED', 'RSCED']
+
+
+class _Request:
+    def __init__(self, future, case, model='ED', formulation='ISF', pd=None, alpha=0., solveropts=None):
+        if model not in MODELS:
+            raise ValueError('Invalid model. (Required: %s; Provided: %s)' % (', '.join(MODELS), model))
+
+        self.future = future
+        self.case = case
+        self.model = model
+        self.formulation = formulation
+        self.pd = None if pd is None else np.asarray(pd, dtype=float)
+        self.alpha = alpha
+        self.solveropts = solveropts
+        self.submitted = time.perf_counter()
+
+    def key(self):
+        '''Requests with equal keys are solved together; only economic dispatches with default options are batched.
+
+        RSCED requests are never batched: each is solved on its own scenario of the network with its demand and risk
+        parameter, whose LP is assembled for that demand.
+        '''
+        if self.model == 'ED' and self.solveropts is None:
+            return self.case, self.model, self.formulation
+        return id(self)
+
+
+class DispatchService:
+    '''Asyncio dispatch service that keeps warm networks in memory.
+
+    Networks are loaded on first use (or on start for the cases given) with their DC matrices and, for RSCED, line
+    outages built, and are kept by case name. prepare is called with every network after it is loaded, e.g. to apply
+    setContingencyLimits. Solve requests are queued and run on a pool of the given number of worker threads. Waiting
+    economic dispatch requests of the same case and formulation without solver options are solved as a single batch
+    of at most batch_size intervals (see EconomicDispatch.solveMany) by an EconomicDispatch that is kept per case
+    and formulation, so its LP is constructed once and every batch is warm started from the last; batches of the
+    same case and formulation are therefore solved one at a time. RSCED requests are solved one at a time on
+    scenario overlays of the warm networks with their demands (see PowerNetwork.scenario). Requests only read the
+    warm networks.
+
+    Every response reports the time the request spent queued ('queue_time'), the solve time of its batch
+    ('solve_time') and the batch size ('batch'); stats() summarizes them over all requests.
+    '''
+
+    def __init__(self, cases=(), workers=4, batch_size=32, backend=None, cache=False, prepare=None):
+        self.cases = list(cases)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.backend = backend
+        self.cache = cache
+        self.prepare = prepare
+
+        self.networks = dict()
+        self.models = dict()
+        self._lock = threading.Lock()
+        self._queue = None
+        self._executor = None
+        self._dispatcher = None
+        self._tasks = set()
+        self._stats = {'requests': 0, 'batches': 0, 'errors': 0, 'queue_time': [], 'solve_time': []}
+
+    def network(self, case, outages=False):
+        '''Warm network of the given case, loading it if necessary.'''
+        with self._lock:
+            network = self.networks.get(case)
+            if network is None:
+                network = phasorNetwork.load_case(case, cache=self.cache)
+                if self.prepare is not None:
+                    self.prepare(network)
+                network.makeDC()
+                self.networks[case] = network
+            if outages and network.lineOutages is None:
+                network.makeDCLineOutages()
+            return network
+
+    def model(self, case, formulation='ISF'):
+        '''Warm economic dispatch of the given case and formulation and the lock that serializes its solves.'''
+        network = self.network(case)
+        with self._lock:
+            model = self.models.get((case, formulation))
+            if model is None:
+                model = (phasorED.EconomicDispatch(network, self.backend), threading.Lock())
+                self.models[case, formulation] = model
+            return model
+
+    async def start(self):
+        '''Load the networks of the given cases and start serving requests.'''
+        if self._dispatcher is not None:
+            return
+
+        phasorBackend.get(self.backend)
+        loop = asyncio.get_running_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+        await asyncio.gather(*[loop.run_in_executor(self._executor, self.network, case) for case in self.cases])
+
+        self._queue = asyncio.Queue()
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def stop(self):
+        '''Finish the queued requests and stop the workers.'''
+        if self._dispatcher is None:
+            return
+
+        await self._queue.put(None)
+        await self._dispatcher
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown()
+        self._dispatcher = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def solve(self, case, model='ED', formulation='ISF', pd=None, alpha=0., solveropts=None):
+        '''Queue a solve request and wait for its response.
+
+        pd is the n_b nodal demand (in the units of bus['PD'], default: the demand of the case) and alpha the risk
+        parameter of RSCED. The response is a dict with the solution 'x', the dispatch 'PG' and the objective 'fun'
+        along with the latencies of the request. Raises ValueError for a demand of the wrong shape before the request
+        is queued, so that it does not fail the requests it would be batched with.
+        '''
+        if self._dispatcher is None:
+            raise RuntimeError('The dispatch service is not running.')
+
+        loop = asyncio.get_running_loop()
+        request = _Request(loop.create_future(), case, model, formulation, pd, alpha, solveropts)
+        if request.pd is not None:
+            network = await loop.run_in_executor(self._executor, self.network, case)
+            if request.pd.shape != (network.n_b, ):
+                raise ValueError('Invalid demand shape. (Required: (%d,); Provided: %s)' % (network.n_b,
+                                                                                          request.pd.shape))
+
+        await self._queue.put(request)
+        return await request.future
+
+    def stats(self):
+        '''Number of requests, batches and errors, and the mean and maximum queue and solve times in seconds.'''
+        stats = {key: self._stats[key] for key in ['requests', 'batches', 'errors']}
+        for key in ['queue_time', 'solve_time']:
+            values = self._stats[key]
+            stats[key] = {'mean': float(np.mean(values)) if values else None,
+                          'max': float(np.max(values)) if values else None}
+        return stats
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        '''Serve requests from Clients over TCP as JSON lines until cancelled.'''
+        server = await asyncio.start_server(self._connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _connection(self, reader, writer):
+        async def respond(line):
+            try:
+                response = await self.solve(**json.loads(line))
+            except Exception as e:
+                response = {'error': '%s: %s' % (type(e).__name__, e)}
+            writer.write((json.dumps(response, default=_json) + '\n').encode('utf-8'))
+            await writer.drain()
+
+        # Requests of a connection are answered in order
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await respond(line)
+        finally:
+            writer.close()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        running = True
+        while running:
+            requests = [await self._queue.get()]
+            while not self._queue.empty():
+                requests.append(self._queue.get_nowait())
+
+            if requests[-1] is None:
+                running = False
+                requests.pop()
+
+            groups = dict()
+            for request in requests:
+                groups.setdefault(request.key(), []).append(request)
+
+            for group in groups.values():
+                for start in range(0, len(group), self.batch_size):
+                    batch = group[start:start + self.batch_size]
+                    task = loop.run_in_executor(self._executor, self._solve, batch)
+                    task.add_done_callback(lambda task, batch=batch: self._respond(task, batch))
+                    self._tasks.add(task)
+
+    def _respond(self, task, batch):
+        self._tasks.discard(task)
+        self._stats['batches'] += 1
+        self._stats['requests'] += len(batch)
+
+        if task.exception() is not None:
+            self._stats['errors'] += len(batch)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(task.exception())
+            return
+
+        for request, response in zip(batch, task.result()):
+            self._stats['queue_time'].append(response['queue_time'])
+            self._stats['solve_time'].append(response['solve_time'])
+            if not request.future.done():
+                request.future.set_result(response)
+
+    def _solve(self, batch):
+        start = time.perf_counter()
+        first = batch[0]
+        network = self.network(first.case, outages=first.model == 'RSCED')
+
+        if first.model == 'ED':
+            pd = np.array([network.bus['PD'] if r.pd is None else r.pd for r in batch])
+            ed, lock = self.model(first.case, first.formulation)
+            with lock:
+                res = ed.solveMany(pd, first.formulation, first.solveropts)
+            responses = [{'x': res['x'][t], 'PG': res['PG'][t], 'fun': res['fun'][t]} for t in range(len(batch))]
+        else:
+            scenario = network.scenario(bus=None if first.pd is None else {'PD': first.pd})
+            res = phasorSCED.RSCED(scenario, first.alpha, backend=self.backend).solve(first.formulation,
+                                                                                     first.solveropts)
+            x = None if res['x'] is None else np.asarray(res['x'])
+            responses = [{'x': x, 'PG': None if x is None else _rsced.dispatch(scenario, x), 'fun': res['fun']}]
+
+        stop = time.perf_counter()
+        for request, response in zip(batch, responses):
+            response.update(queue_time=start - request.submitted, solve_time=stop - start, batch=len(batch))
+
+        return responses
+
+
+class Client:
+    '''Minimal client of a DispatchService.
+
+    Client(service) submits requests to a service running in the same event loop; Client.connect(host, port) opens
+    a connection to a service that is serving over TCP (see DispatchService.serve), whose responses hold lists
+    instead of arrays.
+    '''
+
+    def __init__(self, service=None, reader=None, writer=None):
+        self.service = service
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader=reader, writer=writer)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+    async def solve(self, case, model='ED', formulation='ISF', pd=None, alpha=0., solveropts=None):
+        '''Solve a dispatch request (see DispatchService.solve).'''
+        if self.service is not None:
+            return await self.service.solve(case, model, formulation, pd, alpha, solveropts)
+
+        request = {'case': case, 'model': model, 'formulation': formulation, 'pd': pd, 'alpha': alpha,
+                   'solveropts': solveropts}
+        async with self._lock:
+            self._writer.write((json.dumps(request, default=_json) + '\n').encode('utf-8'))
+            await self._writer.drain()
+            response = json.loads(await self._reader.readline())
+
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    async def ed(self, case, pd=None, formulation='ISF', solveropts=None):
+        return await self.solve(case, 'ED', formulation, pd, solveropts=solveropts)
+
+    async def rsced(self, case, pd=None, alpha=0., formulation='ISF', solveropts=None):
+        return await self.solve(case, 'RSCED', formulation, pd, alpha, solveropts)
+
+
+def _json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
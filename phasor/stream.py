@@ -0,0 +1,164 @@
+import itertools
+import os
+
+import numpy as np
+
+from . import ed as phasorED
+from . import sced as phasorSCED
+from . import _rsced
+
+__all__ = ['read_profile', 'profile_header', 'load_profile', 'outage_profile', 'run']
+
+
+def profile_header(source, delimiter=','):
+    '''Column labels in the header row of a CSV profile, or None for other sources.'''
+    if not isinstance(source, str) or os.path.splitext(source)[1].lower() == '.npy':
+        return None
+
+    with open(source) as f:
+        return [s.strip() for s in f.readline().split(delimiter)]
+
+
+def read_profile(source, chunksize=96, delimiter=','):
+    '''Read a T x n profile in chunks of at most chunksize rows.
+
+    The source is either a .npy file, which is memory mapped so that only the current chunk is read, a CSV file with
+    a header row of column labels, which is parsed chunk by chunk, or an array. Only one chunk is held in memory at a
+    time.
+    '''
+    if not isinstance(source, str):
+        source = np.atleast_2d(source)
+        for start in range(0, source.shape[0], chunksize):
+            yield np.array(source[start:start + chunksize], dtype=float)
+
+    elif os.path.splitext(source)[1].lower() == '.npy':
+        data = np.load(source, mmap_mode='r')
+        if data.ndim == 1:
+            data = data.reshape((1, -1))
+        for start in range(0, data.shape[0], chunksize):
+            yield np.array(data[start:start + chunksize], dtype=float)
+
+    else:
+        with open(source) as f:
+            f.readline()
+            while True:
+                lines = [line for line in itertools.islice(f, chunksize) if line.strip()]
+                if len(lines) == 0:
+                    break
+                yield np.loadtxt(lines, delimiter=delimiter, ndmin=2)
+
+
+def load_profile(network, source, chunksize=96, buses=None, perunit=True, delimiter=','):
+    '''Read a nodal load profile in chunks mapped to the bus['PD'] ordering of the network.
+
+    The columns of the profile are the buses with the external bus numbers of the case given by buses, by the header
+    of a CSV profile if it is numeric, or otherwise all buses of the network in order. Buses without a column keep
+    their demand from the case. Demands are given in MW and converted to per unit if perunit. Yields T_k x n_b demand
+    matrices.
+    '''
+    if buses is None:
+        buses = profile_header(source, delimiter)
+        try:
+            buses = None if buses is None else [float(b) for b in buses]
+        except ValueError:
+            buses = None
+    if buses is None:
+        columns = np.arange(network.n_b)
+    else:
+        columns = network.ext2int(np.array([float(b) for b in buses]))
+
+    scale = 1. / network.baseMVA if perunit else 1.
+    for chunk in read_profile(source, chunksize, delimiter):
+        if chunk.shape[1] != len(columns):
+            raise ValueError('Invalid profile width. (Required: %d; Provided: %d)' % (len(columns), chunk.shape[1]))
+
+        PD = np.repeat(network.bus['PD'][None, :], chunk.shape[0], axis=0)
+        PD[:, columns] = chunk * scale
+        yield PD
+
+
+def outage_profile(network, source, chunksize=96, lines=None, delimiter=','):
+    '''Read a line outage probability profile in chunks mapped to the ordering of network.lineOutages.
+
+    The columns of the profile are the (zero-based) branch indices given by lines, or otherwise the outages of
+    network.lineOutages in order. Outages without a column keep their current probability. Yields T_k x n_o
+    probability matrices.
+    '''
+    outages = network.lineOutages
+    if lines is None:
+        columns = np.arange(len(outages))
+    else:
+        branches = outages.online[outages.lines]
+        lookup = dict(zip(branches, range(len(branches))))
+        try:
+            columns = np.array([lookup[int(l)] for l in lines], dtype=int)
+        except KeyError as e:
+            raise ValueError('Profile column refers to a line without an outage: %s' % e)
+
+    for chunk in read_profile(source, chunksize, delimiter):
+        if chunk.shape[1] != len(columns):
+            raise ValueError('Invalid profile width. (Required: %d; Provided: %d)' % (len(columns), chunk.shape[1]))
+
+        prob = np.repeat(outages.prob[None, :], chunk.shape[0], axis=0)
+        prob[:, columns] = chunk
+        yield prob
+
+
+def run(model, loads, output, outages=None, formulation='ISF', solveropts=None, workers=None, verbose=0):
+    '''Solve a dispatch model for every interval of a streamed load (and outage probability) profile.
+
+    model is an EconomicDispatch or RSCED, loads an iterable of T_k x n_b demand chunks (e.g. from load_profile) and
+    outages an optional iterable of matching T_k x n_o probability chunks (e.g. from outage_profile, RSCED only).
+    The interval, objective and dispatch of every interval are appended to the CSV file output as each chunk is solved,
+    so memory use does not grow with the horizon. Economic dispatch chunks are solved with solveMany.
+
+    Returns the number of intervals solved.
+    '''
+    if not isinstance(model, (phasorED.EconomicDispatch, phasorSCED.RSCED)):
+        raise TypeError('Invalid model type. (Required: EconomicDispatch or RSCED; Provided: %s)' % type(model))
+    if outages is not None and not isinstance(model, phasorSCED.RSCED):
+        raise ValueError('Outage probability profiles require an RSCED model.')
+
+    network = model.network
+    PD = network.bus['PD']
+    prob = None if network.lineOutages is None else network.lineOutages.prob
+
+    T = 0
+    try:
+        with open(output, 'w') as f:
+            f.write(','.join(['interval', 'fun'] + ['PG_%d' % (i + 1) for i in range(network.n_g)]) + '\n')
+
+            for pd, p in zip(loads, outages if outages is not None else _none()):
+                if isinstance(model, phasorED.EconomicDispatch):
+                    res = model.solveMany(pd, formulation, solveropts, workers)
+                    fun, PG = res['fun'], res['PG']
+                else:
+                    fun = np.full((pd.shape[0], ), np.nan)
+                    PG = np.full((pd.shape[0], network.n_g), np.nan)
+                    for t in range(pd.shape[0]):
+                        network.bus['PD'] = pd[t]
+                        if p is not None:
+                            network.lineOutages.prob = p[t]
+                        res = model.solve(formulation, solveropts)
+                        if res['x'] is not None:
+                            fun[t] = res['fun']
+                            PG[t] = _rsced.dispatch(network, res['x'])
+
+                rows = np.column_stack((np.arange(T, T + pd.shape[0]), fun, PG))
+                np.savetxt(f, rows, delimiter=',', fmt=['%d'] + ['%.12g'] * (rows.shape[1] - 1))
+                f.flush()
+
+                T += pd.shape[0]
+                if verbose:
+                    print('Solved intervals %d-%d' % (T - pd.shape[0], T - 1))
+    finally:
+        network.bus['PD'] = PD
+        if prob is not None:
+            network.lineOutages.prob = prob
+
+    return T
+
+
+def _none():
+    while True:
+        yield None
@@ -0,0 +1,102 @@
+import collections
+import hashlib
+
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+__all__ = ['TopologyCache', 'key', 'resolve', 'default']
+
+
+def key(network):
+    '''Hash of the network data that determines its DC matrices.
+
+    Covers the branch status, terminals, reactance, tap ratio and phase shift, and the bus numbering and types (which
+    determine the slack bus).
+    '''
+    h = hashlib.sha1()
+    for name in ['BR_STATUS', 'F_BUS', 'T_BUS', 'BR_X', 'TAP', 'SHIFT']:
+        h.update(np.ascontiguousarray(network.branch[name], dtype=float).tobytes())
+    for name in ['BUS_I', 'BUS_TYPE']:
+        h.update(np.ascontiguousarray(network.bus[name], dtype=float).tobytes())
+    return h.hexdigest()
+
+
+class TopologyCache:
+    '''Bounded LRU cache of the DC matrices and line outage factors of network topologies.
+
+    Entries are dicts keyed by topology.key and hold 'dc', the (Bbus, Bf, Pbusinj, Pfinj, ISF) tuple of makeDC, and
+    optionally 'LODF', the (LODF, islanding) pair of makeDCLineOutages. The least recently used entries are evicted
+    once there are more than max_entries of them or they take up more than max_bytes (None for no limit). The cached
+    matrices are shared by every network with the same topology and must not be modified in place.
+    '''
+
+    def __init__(self, max_entries=8, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        '''Entry of the given topology (marked as most recently used), or None.'''
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, **items):
+        '''Add items to the entry of the given topology and evict entries beyond the bounds.'''
+        entry = self._entries.setdefault(key, dict())
+        entry.update(items)
+        self._entries.move_to_end(key)
+        self._evict()
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def nbytes(self):
+        '''Memory held by the cached entries, including factorizations and materialized ISF matrices.'''
+        return sum(_nbytes(entry) for entry in self._entries.values())
+
+    def _evict(self):
+        while len(self._entries) > 0 and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries) or
+                (self.max_bytes is not None and len(self._entries) > 1 and self.nbytes() > self.max_bytes)):
+            self._entries.popitem(last=False)
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if sp.sparse.issparse(value):
+        value = value.tocsr() if not hasattr(value, 'indptr') else value
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
+
+
+def resolve(cache):
+    '''Cache selected by the cache argument of makeDC: the default cache for True, none for False or None.'''
+    if cache is True:
+        return default
+    if cache is False or cache is None:
+        return None
+    return cache
+
+
+# Cache used by PowerNetwork.makeDC and makeDCLineOutages unless another cache is given, bounded to 512 MB
+default = TopologyCache(max_bytes=512 * 2**20)
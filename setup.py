@@ -5,7 +5,7 @@ setup(
     version='0.1.0',
     packages=['phasorpy'],
     package_dir={'phasorpy': 'phasor'},
-    package_data={'phasorpy': ['data/*.m']},
+    package_data={'phasorpy': ['data/*.m', 'data/catalog.csv']},
     author='Avinash Madavan',
     author_email='avinash.madavan@gmail.com',
     description='A python library for solving economic dispatch problems for MATPOWER case files.',
@@ -14,7 +14,7 @@ setup(
                      'from MATPOWER without the need for MATLAB.',
     install_requires=[
         'numpy>=1.14.2',
-        'scipy>=1.0.0'
+        'scipy>=1.6.0'
     ],
     license='MIT',
 )
@@ -0,0 +1,53 @@
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.ed as phasorED
+import phasor.network as phasorNetwork
+
+
+class TestAreaDecomposition(unittest.TestCase):
+    def assertFeasible(self, network, x):
+        g, theta = x[:network.n_g], x[network.n_g:]
+        injection = np.zeros((network.n_b, ))
+        np.add.at(injection, network.gen['GEN_BUS'].astype(int) - 1, g)
+        np.testing.assert_allclose(injection - network.Bbus.dot(theta), network.bus['PD'], atol=1e-6)
+        self.assertTrue(np.all(np.abs(network.Bf.dot(theta)) <= network.branch['RATE_A'][network.online] + 1e-6))
+        self.assertTrue(np.all(g >= -1e-9) and np.all(g <= network.gen['PMAX'] + 1e-9))
+
+    def test_bus_areas(self):
+        network = phasorNetwork.load_case('pglib_opf_case73_ieee_rts.m')
+        network.makeDC()
+        self.assertEqual(len(np.unique(network.bus['BUS_AREA'])), 3)
+
+        res = phasorED.EconomicDispatch(network, 'highs').solveAreas()
+        self.assertTrue(res['converged'])
+        self.assertLess(abs(res['gap']), 1e-3)
+        self.assertFeasible(network, res['x'])
+
+    def test_automatic_areas_in_parallel(self):
+        network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        network.makeDC()
+
+        ed = phasorED.EconomicDispatch(network, 'highs')
+        serial = ed.solveAreas(2)
+        parallel = ed.solveAreas(2, workers=2, compare=False)
+        self.assertTrue(serial['converged'] and parallel['converged'])
+        self.assertLess(abs(serial['gap']), 1e-3)
+        self.assertAlmostEqual(parallel['fun'], serial['fun'], places=6)
+        self.assertFeasible(network, serial['x'])
+
+    def test_warns_without_convergence(self):
+        network = phasorNetwork.load_case('pglib_opf_case39_epri.m')
+        network.makeDC()
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            res = phasorED.EconomicDispatch(network, 'highs').solveAreas(max_iter=1, compare=False)
+        self.assertFalse(res['converged'])
+        self.assertTrue(any(issubclass(w.category, RuntimeWarning) for w in caught))
+
+
+if __name__ == '__main__':
+    unittest.main()
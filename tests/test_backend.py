@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+import phasor.backend as phasorBackend
+
+
+class TestBackend(unittest.TestCase):
+    def test_registry(self):
+        self.assertIn('highs', phasorBackend.available())
+        self.assertIsInstance(phasorBackend.get('highs'), phasorBackend.HiGHS)
+        backend = phasorBackend.HiGHS()
+        self.assertIs(phasorBackend.get(backend), backend)
+
+        with self.assertRaises(ValueError):
+            phasorBackend.get('unknown')
+        with self.assertRaises(TypeError):
+            phasorBackend.register('unknown', object)
+
+    def test_highs_duals(self):
+        # min x + 2 y s.t. x + y = 1, x <= 0.25
+        lp = (np.array([1., 2.]), sp.sparse.csr_matrix([[1., 0.]]), np.array([0.25]),
+              sp.sparse.csr_matrix([[1., 1.]]), np.array([1.]), np.zeros((2, )), np.full((2, ), np.inf))
+        backend = phasorBackend.get('highs')
+        res = backend.solve(lp, {'tol': 1e-9})
+        np.testing.assert_allclose(res['x'], [0.25, 0.75])
+
+        y_ub, y_eq = backend.duals(res)
+        np.testing.assert_allclose(y_ub, [-1.])
+        np.testing.assert_allclose(y_eq, [2.])
+
+    def test_flatten(self):
+        # Two subproblems x_k >= x_K - k and a coupling block x_K <= 3
+        c = [np.array([1.]), np.array([1.]), np.array([-3.])]
+        A_ub = [sp.sparse.csr_matrix([[-1.]]), sp.sparse.csr_matrix([[-1.]]), sp.sparse.csr_matrix([[1.]])]
+        b_ub = [np.array([0.]), np.array([1.]), np.array([3.])]
+        C_ub = [sp.sparse.csr_matrix([[1.]]), sp.sparse.csr_matrix([[1.]])]
+        A_eq = [sp.sparse.csr_matrix((0, 1))] * 3
+        b_eq = [np.zeros((0, ))] * 3
+        C_eq = [None, None]
+        lb, ub = [np.zeros((1, ))] * 3, [np.full((1, ), np.inf)] * 3
+
+        c, A_ub, b_ub, A_eq, b_eq, lb, ub = phasorBackend.flatten(c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub)
+        np.testing.assert_array_equal(A_ub.toarray(), [[-1., 0., 1.], [0., -1., 1.], [0., 0., 1.]])
+        self.assertEqual(A_eq.shape, (0, 3))
+
+        res = phasorBackend.get('highs').solve((c, A_ub, b_ub, A_eq, b_eq, lb, ub))
+        np.testing.assert_allclose(res['x'], [3., 2., 3.])
+
+    def test_options(self):
+        self.assertEqual(phasorBackend.options(None), dict())
+        self.assertEqual(phasorBackend.HiGHS().options({'max_iter': 10, 'lp_solver': 'highs-ds'}),
+                         ('highs-ds', {'maxiter': 10}))
+        with self.assertRaises(TypeError):
+            phasorBackend.options('tol')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.benchmark as phasorBenchmark
+import phasor.network as phasorNetwork
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_case(self):
+        stages = ['makeDC', 'ED.solve(ISF)', 'RSCED.solve', 'security_assessment']
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            records = phasorBenchmark.benchmark_case('pglib_opf_case14_ieee.m', stages, memory=False,
+                                                     backend='highs')
+
+        self.assertEqual([r['stage'] for r in records], stages)
+        for record in records:
+            self.assertEqual(record['status'], 'ok', record['message'])
+            self.assertEqual(record['n_b'], 14)
+        self.assertEqual(records[1]['backend'], 'highs')
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ['records.csv', 'records.json']:
+                path = os.path.join(directory, name)
+                phasorBenchmark.write(records, path)
+                self.assertEqual([r['time'] for r in phasorBenchmark.read(path)], [r['time'] for r in records])
+
+    def test_contingency_limits(self):
+        calls = []
+        setContingencyLimits = phasorNetwork.PowerNetwork.setContingencyLimits
+
+        def spy(network, force=False):
+            calls.append(force)
+            setContingencyLimits(network, force)
+            spy.network = network
+
+        phasorNetwork.PowerNetwork.setContingencyLimits = spy
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                records = phasorBenchmark.benchmark_case('pglib_opf_case14_ieee.m',
+                                                         ['RSCED.constructLP', 'RSCED.solve'], memory=False,
+                                                         backend='highs')
+        finally:
+            phasorNetwork.PowerNetwork.setContingencyLimits = setContingencyLimits
+
+        self.assertEqual([r['status'] for r in records], ['ok', 'ok'])
+        self.assertEqual(calls, [True])
+        network = phasorNetwork.load_case('pglib_opf_case14_ieee.m')
+        np.testing.assert_allclose(spy.network.branch['RATE_B'], 1.1 * network.branch['RATE_B'])
+        np.testing.assert_allclose(spy.network.branch['RATE_C'], 1.7 * network.branch['RATE_C'])
+
+    def test_compare(self):
+        baseline = [{'case': 'a', 'stage': 's', 'status': 'ok', 'time': 1., 'peak_memory': 100},
+                    {'case': 'a', 'stage': 't', 'status': 'ok', 'time': 1., 'peak_memory': 100}]
+        records = [{'case': 'a', 'stage': 's', 'status': 'ok', 'time': 1.5, 'peak_memory': 100},
+                   {'case': 'a', 'stage': 't', 'status': 'error', 'time': None, 'peak_memory': None}]
+
+        regressions = phasorBenchmark.compare(records, baseline)
+        self.assertEqual([(r['stage'], r['metric']) for r in regressions], [('s', 'time'), ('t', 'status')])
+        self.assertEqual(phasorBenchmark.compare(records[:1], baseline, threshold=2.), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
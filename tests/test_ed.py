@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+
+import phasor.ed as phasorED
+import phasor.network as phasorNetwork
+
+
+class TestEconomicDispatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        cls.network.makeDC()
+
+    def setUp(self):
+        # Tighten a loaded line so that the dispatch is congested
+        rate = np.array(self.network.branch['RATE_A'])
+        rate[self.network.online[6]] = 0.5
+        self.scenario = self.network.scenario(branch={'RATE_A': rate})
+
+    def test_formulations(self):
+        ed = phasorED.EconomicDispatch(self.scenario, 'highs')
+        isf, yt = ed.solve('ISF'), ed.solve('YT')
+        self.assertAlmostEqual(isf['fun'], yt['fun'], places=8)
+
+        a, b = isf['dispatch'], yt['dispatch']
+        np.testing.assert_allclose(a.flows, b.flows, atol=1e-6)
+        np.testing.assert_allclose(a.lmp, b.lmp, atol=1e-6)
+        self.assertGreater(np.ptp(a.lmp), 1e-6)
+        self.assertGreater(np.sum(a.congestionRent), 0.)
+
+    def test_solve_many(self):
+        scale = np.linspace(0.85, 1.0, 5)
+        pd = scale[:, None] * self.scenario.bus['PD'][None, :]
+        ed = phasorED.EconomicDispatch(self.scenario, 'highs')
+
+        for formulation in ['ISF', 'YT']:
+            with self.subTest(formulation=formulation):
+                serial = ed.solveMany(pd, formulation)
+                parallel = ed.solveMany(pd, formulation, workers=2)
+                np.testing.assert_allclose(parallel['fun'], serial['fun'], rtol=1e-9)
+
+                expected = []
+                for t in range(len(pd)):
+                    other = phasorED.EconomicDispatch(self.scenario.scenario(bus={'PD': pd[t]}), 'highs')
+                    expected.append(other.solve(formulation)['fun'])
+                np.testing.assert_allclose(serial['fun'], expected, rtol=1e-9)
+                self.assertEqual(serial['dispatch'].lmp.shape, pd.shape)
+
+    def test_update_load(self):
+        network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        ed = phasorED.EconomicDispatch(network, 'highs')
+        ed.solve('ISF')
+        lp = ed.model('ISF')
+
+        ed.updateLoad(1.05 * network.bus['PD'])
+        self.assertIs(ed.model('ISF'), lp)
+        expected = phasorED.EconomicDispatch(network.scenario(), 'highs').solve('ISF')['fun']
+        self.assertAlmostEqual(ed.solve('ISF')['fun'], expected, places=8)
+
+
+class TestExternalBuses(unittest.TestCase):
+    def test_non_consecutive_buses(self):
+        network = phasorNetwork.load_case('pglib_opf_case89_pegase.m')
+        network.makeDC()
+        ext = network.int2ext
+        self.assertFalse(np.array_equal(ext, np.arange(network.n_b) + 1))
+
+        dispatch = phasorED.EconomicDispatch(network, 'highs').solve('ISF')['dispatch']
+        np.testing.assert_array_equal(dispatch.buses, ext)
+
+        # Injections at the external buses, from the external buses of the generators
+        gen_ext = ext[network.gen['GEN_BUS'].astype(int) - 1]
+        buses = ext[::-7]
+        expected = [np.sum(dispatch.PG[gen_ext == b]) - network.bus['PD'][ext == b][0] for b in buses]
+        np.testing.assert_allclose(dispatch.atBuses('injection', buses), expected, atol=1e-10)
+        np.testing.assert_array_equal(dispatch.atBuses('lmp', buses), dispatch.lmp[::-7])
+
+        with self.assertRaises(ValueError):
+            dispatch.atBuses('flows', buses)
+        with self.assertRaises(ValueError):
+            dispatch.atBuses('lmp', [np.max(ext) + 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
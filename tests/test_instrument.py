@@ -0,0 +1,44 @@
+import logging
+import unittest
+
+import phasor.ed as phasorED
+import phasor.instrument as phasorInstrument
+import phasor.network as phasorNetwork
+
+
+class TestInstrument(unittest.TestCase):
+    def test_disabled(self):
+        self.assertFalse(phasorInstrument.enabled())
+        with phasorInstrument.stage('test', size=1) as s:
+            s.update(size=2)
+        self.assertIs(s, phasorInstrument._disabled)
+
+    def test_events(self):
+        with phasorInstrument.collecting() as collector:
+            self.assertTrue(phasorInstrument.enabled())
+            network = phasorNetwork.load_case('pglib_opf_case14_ieee.m')
+            network.makeDC(cache=False)
+            res = phasorED.EconomicDispatch(network, 'highs').solve('ISF')
+        self.assertFalse(phasorInstrument.enabled())
+
+        stages = [event['stage'] for event in collector.events]
+        for name in ['network.load_case', 'network.makeDC', 'ed.constructLP', 'ed.linprog']:
+            self.assertIn(name, stages)
+        self.assertEqual([event['stage'] for event in res['metrics']], ['ed.constructLP', 'ed.linprog'])
+
+        event = collector.events[stages.index('ed.constructLP')]
+        self.assertEqual(event['formulation'], 'ISF')
+        self.assertGreaterEqual(event['duration'], 0.)
+        self.assertEqual(event['A_ub']['shape'], [2 * network.n_l, network.n_g])
+
+    def test_log_collector(self):
+        logger = logging.getLogger('phasorpy.test')
+        with self.assertLogs(logger, logging.INFO) as logs:
+            with phasorInstrument.collecting(phasorInstrument.LogCollector(logger)):
+                with phasorInstrument.stage('test', size=3):
+                    pass
+        self.assertIn('"stage": "test"', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+import phasor.network as phasorNetwork
+
+
+def _reference_parse(case_as_str):
+    # Line by line parser of the original load_case
+    lines = [line.split('%')[0] for line in case_as_str.split('\n')]
+    case_as_str = '\n'.join(lines)
+
+    def str_to_array(s):
+        return np.array([[float(v) for v in r.strip().split()] for r in s.strip(';\n\t ').split(';')])
+
+    return {'baseMVA': float(re.search(r"mpc.baseMVA = (\d+)", case_as_str).group(1)),
+            'bus': str_to_array(re.search(r"mpc.bus = \[([-\s0-9e.;]+)\]", case_as_str).group(1)),
+            'gen': str_to_array(re.search(r"mpc.gen = \[([-\s0-9e.;Iinf]+)\]", case_as_str).group(1)),
+            'gencost': str_to_array(re.search(r"mpc.gencost = \[([-\s0-9e.;]+)\]", case_as_str).group(1)),
+            'branch': str_to_array(re.search(r"mpc.branch = \[([-\s0-9e.;]+)\]", case_as_str).group(1))}
+
+
+def _read_case(name):
+    return phasorNetwork._data_dir().joinpath(name).read_text()
+
+
+class TestParser(unittest.TestCase):
+    def test_matches_reference_parser(self):
+        cases = [name for name in phasorNetwork.available_cases(max_buses=3000)]
+        self.assertGreater(len(cases), 10)
+        for name in cases:
+            with self.subTest(case=name):
+                text = _read_case(name)
+                parsed, expected = phasorNetwork._parse_case(text), _reference_parse(text)
+                self.assertEqual(parsed['baseMVA'], expected['baseMVA'])
+                for block in ['bus', 'gen', 'gencost', 'branch']:
+                    np.testing.assert_array_equal(parsed[block], expected[block])
+
+    def test_malformed_block(self):
+        text = _read_case('pglib_opf_case14_ieee.m')
+        row = re.search(r'mpc\.branch = \[\n(\s*[^;\n]+;)', text).group(1)
+
+        truncated = text.replace(row, row.rsplit(None, 2)[0] + ';', 1)
+        with self.assertRaisesRegex(ValueError, 'branch'):
+            phasorNetwork._parse_case(truncated)
+
+        malformed = text.replace(row, row.replace(row.split()[2], 'x1', 1), 1)
+        with self.assertRaisesRegex(ValueError, 'branch'):
+            phasorNetwork._parse_case(malformed)
+
+
+class TestCatalog(unittest.TestCase):
+    def test_catalog_matches_cases(self):
+        catalog = phasorNetwork.catalog()
+        for name, entry in catalog.items():
+            if entry['n_b'] > 1000:
+                continue
+            with self.subTest(case=name):
+                size = os.stat(phasorNetwork._data_dir().joinpath(name)).st_size
+                self.assertEqual(entry, phasorNetwork._catalog_entry(_read_case(name), size))
+
+    def test_available_cases(self):
+        cases = phasorNetwork.available_cases(min_buses=100, max_buses=200)
+        self.assertIn('pglib_opf_case118_ieee.m', cases)
+        self.assertTrue(all(100 <= phasorNetwork.catalog()[name]['n_b'] <= 200 for name in cases))
+
+
+class TestBusNumbering(unittest.TestCase):
+    def test_external_numbers(self):
+        text = _read_case('pglib_opf_case14_ieee.m')
+        data = phasorNetwork._parse_case(text)
+        network = phasorNetwork.PowerNetwork(data)
+
+        # Renumber the buses in reverse with gaps and shuffle the bus data
+        numbers = 1000 - 10 * data['bus'][:, 0]
+        order = np.random.default_rng(0).permutation(len(numbers))
+        renumber = lambda buses: numbers[buses.astype(int) - 1]
+        shuffled = dict(data, bus=np.array(data['bus'])[order], gen=np.array(data['gen']),
+                        branch=np.array(data['branch']))
+        shuffled['bus'][:, 0] = renumber(data['bus'][order, 0])
+        shuffled['gen'][:, 0] = renumber(data['gen'][:, 0])
+        shuffled['branch'][:, 0] = renumber(data['branch'][:, 0])
+        shuffled['branch'][:, 1] = renumber(data['branch'][:, 1])
+        other = phasorNetwork.PowerNetwork(shuffled)
+
+        np.testing.assert_array_equal(other.int2ext, numbers[order])
+        np.testing.assert_array_equal(other.ext2int(numbers[order]), np.arange(network.n_b))
+        with self.assertRaises(ValueError):
+            other.ext2int([1.])
+
+        network.makeDC(cache=False)
+        other.makeDC(cache=False)
+        np.testing.assert_allclose(other.ISF.toarray(), network.ISF.toarray()[:, order], atol=1e-12)
+        np.testing.assert_array_equal(data['bus'][:, 0], np.arange(network.n_b) + 1)
+
+
+class TestImports(unittest.TestCase):
+    def test_lazy_imports(self):
+        # Loading networks does not import the solvers of the DC sensitivities
+        code = ('import sys, phasor.network; '
+                'print(" ".join(m for m in ["phasor.sensitivity", "scipy.sparse.linalg", "scipy.sparse.csgraph"] '
+                'if m in sys.modules))')
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+import phasor.ed as phasorED
+import phasor.network as phasorNetwork
+import phasor.result as phasorResult
+
+
+class TestReduction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        cls.network.makeDC()
+
+    def test_dispatch_and_flows(self):
+        reduced, expansion = self.network.reduce()
+        self.assertLess(reduced.n_b, self.network.n_b)
+
+        full = phasorED.EconomicDispatch(self.network, 'highs').solve('YT')
+        res = phasorED.EconomicDispatch(reduced, 'highs').solve('YT')
+        self.assertAlmostEqual(res['fun'], full['fun'], places=8)
+
+        g = res['dispatch'].PG
+        flows = expansion.flows(phasorResult.Dispatch(reduced, g).flows)
+        np.testing.assert_allclose(flows, phasorResult.Dispatch(self.network, g).flows, atol=1e-9)
+
+    def test_overloaded_radial_branch_is_kept(self):
+        # Bus 117 (index 116) is radial and supplied by branch 183
+        self.assertEqual(self.network.branch['T_BUS'][183], 117)
+        _, expansion = self.network.reduce(series=False)
+        self.assertNotIn(116, expansion.buses)
+
+        for name in ['RATE_A', 'RATE_C']:
+            rate = np.array(self.network.branch[name])
+            rate[183] = 0.5 * self.network.bus['PD'][116]
+            reduced, expansion = self.network.scenario(branch={name: rate}).reduce(series=False)
+            self.assertIn(116, expansion.buses)
+            self.assertEqual(reduced.n_l, self.network.n_l)
+
+
+if __name__ == '__main__':
+    unittest.main()
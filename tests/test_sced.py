@@ -0,0 +1,176 @@
+import unittest
+import warnings
+
+import numpy as np
+import scipy as sp
+import scipy.sparse
+
+import phasor.backend as phasorBackend
+import phasor.network as phasorNetwork
+import phasor.sced as phasorSCED
+
+
+class _Recorder(phasorBackend.HiGHS):
+    # HiGHS backend that records the starting points it is given
+    def __init__(self):
+        self.x0 = []
+
+    def solve(self, lp, solveropts=None, x0=None):
+        self.x0.append(x0)
+        return super().solve(lp, solveropts, x0)
+
+
+def _load(name):
+    network = phasorNetwork.load_case(name)
+    network.setContingencyLimits()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        network.makeDCLineOutages()
+    return network
+
+
+def _reference_lp(network, alphap):
+    # Decomposed RSCED LP assembled block by block for every outage, as before the scenario template
+    n_g, n_b, n_l = network.n_g, network.n_b, network.n_l
+    outages = network.lineOutages
+    cost, voll, pd = network.gencost['COST'][:, -2], network.voll, network.bus['PD']
+    gen_bus = network.gen['GEN_BUS'].astype(int) - 1
+    ISF = network.ISF.columns(np.arange(n_b))
+    flowPD = network.ISF.dot(pd)
+    I_g, I_l = sp.sparse.eye(n_g), sp.sparse.eye(n_l - 1)
+
+    c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = [], [], [], [], [], [], [], [], []
+    for k in range(len(outages)):
+        line, lodf = outages.lines[k], outages.LODF[:, k]
+        monitored = outages.monitored(k)
+        rate_b, rate_c = network.branch['RATE_B'][monitored], network.branch['RATE_C'][monitored]
+        Hk = np.delete(ISF + np.outer(lodf, ISF[line]), line, axis=0)
+        HPD = np.delete(flowPD + lodf * flowPD[line], line)
+        H, Hg = sp.sparse.csc_matrix(Hk), sp.sparse.csc_matrix(Hk[:, gen_bus])
+
+        c.append(alphap * np.concatenate(([outages.prob[k]], np.zeros(2 * n_g + n_b), 999999 * np.ones(n_g + n_l - 1))))
+        A_ub.append(sp.sparse.bmat([[-np.ones((1, 1)), cost, cost, voll, None, None],
+                                    [None, None, None, None, None, -I_l],
+                                    [None, None, None, None, None, -I_l],
+                                    [None, -I_g, I_g, None, -I_g, None],
+                                    [None, I_g, -I_g, None, -I_g, None],
+                                    [None, Hg, -Hg, H, None, -I_l],
+                                    [None, -Hg, Hg, -H, None, -I_l],
+                                    [None, I_g, -I_g, None, -I_g, None],
+                                    [None, -I_g, I_g, None, -I_g, None]], 'csc'))
+        C_ub.append(sp.sparse.bmat([[-np.ones((1, 1)), np.zeros((1, 1)), cost],
+                                    [None, None, Hg],
+                                    [None, None, -Hg],
+                                    [None, None, -I_g],
+                                    [None, None, I_g],
+                                    [None, None, Hg],
+                                    [None, None, -Hg],
+                                    [np.zeros((n_g, 1)), None, None],
+                                    [np.zeros((n_g, 1)), None, None]], 'csc'))
+        b_ub.append(np.concatenate(([0.], rate_c + HPD, rate_c - HPD, np.zeros(n_g), network.gen['PMAX'],
+                                    rate_b + HPD, rate_b - HPD, 5 * network.gen['RAMP_AGC'],
+                                    5 * network.gen['RAMP_AGC'])))
+        A_eq.append(sp.sparse.csc_matrix(np.concatenate(([0.], np.ones(n_g), -np.ones(n_g), np.ones(n_b),
+                                                         np.zeros(n_g + n_l - 1)))[None, :]))
+        b_eq.append(np.array([np.sum(pd)]))
+        C_eq.append(sp.sparse.csc_matrix(np.concatenate(([0., 0.], np.ones(n_g)))[None, :]))
+        lb.append(np.zeros(1 + 3 * n_g + n_b + n_l - 1))
+        ub.append(np.concatenate((np.inf * np.ones(1 + 2 * n_g), pd, np.inf * np.ones(n_g + n_l - 1))))
+
+    # Base case
+    Hg = ISF[:, gen_bus]
+    c.append(np.concatenate(([1., alphap * (1. - np.sum(outages.prob))], np.zeros(n_g))))
+    A_ub.append(sp.sparse.bmat([[-np.ones((1, 1)), -np.ones((1, 1)), cost], [None, None, Hg], [None, None, -Hg]],
+                               'csc'))
+    b_ub.append(np.concatenate(([0.], network.branch['RATE_A'] + flowPD, network.branch['RATE_A'] - flowPD)))
+    A_eq.append(sp.sparse.csc_matrix(np.concatenate(([0., 0.], np.ones(n_g)))[None, :]))
+    b_eq.append(np.array([np.sum(pd)]))
+    lb.append(np.zeros(2 + n_g))
+    ub.append(np.concatenate((np.inf * np.ones(2), network.gen['PMAX'])))
+
+    return c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub
+
+
+class TestRSCED(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.network = _load('pglib_opf_case30_ieee.m')
+        cls.full = phasorSCED.RSCED(cls.network, 0.5, backend='highs').solve()
+
+    def test_isf_stays_factorized(self):
+        network = _load('pglib_opf_case14_ieee.m')
+        phasorSCED.RSCED(network, 0.5, backend='highs').constructLP()
+        self.assertIsNone(network.ISF._full)
+
+    def test_template_assembly(self):
+        # The LP filled into the scenario template matches the one assembled block by block
+        model = phasorSCED.RSCED(self.network, 0.5)
+        lp, expected = model.constructLP(), _reference_lp(self.network, model.alphap)
+        names = ['c', 'A_ub', 'b_ub', 'C_ub', 'A_eq', 'b_eq', 'C_eq', 'lb', 'ub']
+        for name, blocks, reference in zip(names, lp, expected):
+            self.assertEqual(len(blocks), len(reference), name)
+            for k, (block, ref) in enumerate(zip(blocks, reference)):
+                with self.subTest(name=name, k=k):
+                    block = block.toarray() if sp.sparse.issparse(block) else np.asarray(block)
+                    ref = ref.toarray() if sp.sparse.issparse(ref) else np.asarray(ref)
+                    self.assertEqual(block.shape, ref.shape)
+                    np.testing.assert_allclose(block, ref, rtol=1e-12, atol=1e-12)
+
+    def test_screening(self):
+        res = phasorSCED.RSCED(self.network, 0.5, backend='highs').solve(screening=True)
+        self.assertAlmostEqual(res['fun'], self.full['fun'], places=8)
+        np.testing.assert_allclose(res['dispatch'].PG, self.full['dispatch'].PG, atol=1e-8)
+        self.assertLess(len(res['screening']['outages']), len(self.network.lineOutages))
+
+    def test_parallel_assembly(self):
+        res = phasorSCED.RSCED(self.network, 0.5, workers=2, backend='highs').solve()
+        self.assertAlmostEqual(res['fun'], self.full['fun'], places=8)
+
+    def test_benders(self):
+        serial = phasorSCED.RSCED(self.network, 0.5, backend='highs', driver=phasorSCED.Benders()).solve()
+        parallel = phasorSCED.RSCED(self.network, 0.5, workers=2, backend='highs',
+                                    driver=phasorSCED.Benders()).solve()
+        aggregate = phasorSCED.RSCED(self.network, 0.5, backend='highs',
+                                     driver=phasorSCED.Benders(aggregate=True, max_iter=500)).solve()
+
+        for res in [serial, parallel, aggregate]:
+            self.assertTrue(res['converged'])
+            self.assertAlmostEqual(res['fun'], self.full['fun'], places=6)
+            self.assertLessEqual(res['lower'], res['fun'] + 1e-9)
+        self.assertEqual([i['lower'] for i in parallel['iterations']], [i['lower'] for i in serial['iterations']])
+
+    def test_benders_warm_start_in_workers(self):
+        # Chunks solved by the workers start from the solutions sent by the driver, whichever worker solves them
+        c, A_ub, b_ub, C_ub, A_eq, b_eq, C_eq, lb, ub = phasorSCED.RSCED(self.network, 0.5).constructLP()
+        subproblems = [(c[k], A_ub[k], b_ub[k], C_ub[k], A_eq[k], b_eq[k], C_eq[k], lb[k], ub[k])
+                       for k in range(len(C_ub))]
+        backend = _Recorder()
+        phasorSCED._benders_init(subproblems, None, backend)
+
+        xK = self.full['x'][-len(c[-1]):]
+        x0 = [np.full((len(c[k]), ), float(k)) for k in range(2, 5)]
+        results = phasorSCED._benders_chunk((2, 5), xK, x0)
+        self.assertEqual(len(results), 3)
+        for given, expected in zip(backend.x0, x0):
+            self.assertIs(given, expected)
+
+    def test_reduction(self):
+        model = phasorSCED.RSCED(self.network, 0.5, backend='highs')
+
+        reduction = model.reduce(size=len(self.network.lineOutages))
+        self.assertEqual(reduction['error'], 0.)
+        self.assertAlmostEqual(model.solve()['fun'], self.full['fun'], places=8)
+
+        reduction = model.reduce(size=5)
+        self.assertLessEqual(len(reduction['outages']), 5)
+        self.assertAlmostEqual(np.sum(reduction['prob']), np.sum(self.network.lineOutages.prob))
+        res = model.solve()
+        self.assertIs(res['reduction'], reduction)
+        self.assertLessEqual(len(res['x']), len(self.full['x']))
+
+        model.reduce()
+        self.assertAlmostEqual(model.solve()['fun'], self.full['fun'], places=8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.network as phasorNetwork
+
+
+class TestScenario(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.network = phasorNetwork.load_case('pglib_opf_case30_ieee.m')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            cls.network.makeDCLineOutages()
+
+    def test_overrides_share_data(self):
+        pd = 1.1 * self.network.bus['PD']
+        scenario = self.network.scenario(bus={'PD': pd}, voll=5.)
+
+        np.testing.assert_array_equal(scenario.bus['PD'], pd)
+        self.assertTrue(np.all(scenario.voll == 5.))
+        self.assertFalse(np.array_equal(self.network.bus['PD'], pd))
+        self.assertIs(scenario.ISF, self.network.ISF)
+        self.assertTrue(np.shares_memory(scenario.branch['RATE_A'], self.network.branch['RATE_A']))
+        with self.assertRaises(ValueError):
+            scenario.branch['RATE_A'][0] = 0.
+
+    def test_topology_change(self):
+        status = np.array(self.network.branch['BR_STATUS'])
+        status[0] = 0.
+        scenario = self.network.scenario(branch={'BR_STATUS': status})
+
+        self.assertIsNone(scenario.ISF)
+        self.assertIsNone(scenario.lineOutages)
+        self.assertEqual(scenario.n_l, self.network.n_l - 1)
+        self.assertIsNotNone(self.network.ISF)
+        with self.assertRaises(ValueError):
+            self.network.scenario(branch={'BR_STATUS': status}, prob=0.01)
+
+    def test_outage_probabilities(self):
+        outages = self.network.lineOutages
+        scenario = self.network.scenario(prob=0.02)
+        self.assertTrue(np.all(scenario.lineOutages.prob == 0.02))
+        self.assertTrue(np.all(outages.prob == 0.001))
+
+        line = outages.online[outages.lines[3]]
+        scenario.setOutageProbabilities(0.5, [line, outages.skipped[0]])
+        self.assertEqual(scenario.lineOutages.prob[3], 0.5)
+        self.assertEqual(np.sum(scenario.lineOutages.prob == 0.5), 1)
+        self.assertTrue(np.all(outages.prob == 0.001))
+
+    def test_unknown_column(self):
+        with self.assertRaises(KeyError):
+            self.network.scenario(bus={'LOAD': 0.})
+
+
+if __name__ == '__main__':
+    unittest.main()
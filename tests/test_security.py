@@ -0,0 +1,66 @@
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.ed as phasorED
+import phasor.network as phasorNetwork
+import phasor.result as phasorResult
+import phasor.security as phasorSecurity
+
+
+def _rebuild(network, lines):
+    # Network with the given branches switched out and its DC matrices built from scratch
+    status = np.array(network.branch['BR_STATUS'])
+    status[lines] = 0.
+    outaged = network.scenario(branch={'BR_STATUS': status})
+    outaged.makeDC(cache=False)
+    return outaged
+
+
+class TestSecurityAssessment(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        cls.network.makeDC()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            cls.network.makeDCLineOutages()
+        cls.g = phasorED.EconomicDispatch(cls.network, 'highs').solve('ISF')['dispatch'].PG
+
+    def test_single_outages(self):
+        outages = self.network.lineOutages
+        report = phasorSecurity.security_assessment(self.network, self.g, rating='RATE_A', margin=-np.inf)
+        flows = report.flows.toarray()
+
+        for k in range(0, len(outages), 17):
+            line = outages.online[outages.lines[k]]
+            outaged = _rebuild(self.network, [line])
+            expected = phasorResult.Dispatch(outaged, self.g).flows
+            np.testing.assert_allclose(np.delete(flows[:, k], outages.lines[k]), expected, atol=1e-10)
+
+    def test_double_outages(self):
+        outages = self.network.lineOutages
+        branches = outages.online[outages.lines]
+        pairs = np.array([(branches[i], branches[j]) for i, j in [(0, 1), (3, 40), (10, 11), (25, 120), (60, 150)]])
+        report = phasorSecurity.security_assessment(self.network, self.g, pairs, rating='RATE_A', margin=-np.inf)
+        flows = report.pairFlows.toarray()
+
+        for k, pair in enumerate(pairs):
+            if report.islanding[k]:
+                continue
+            outaged = _rebuild(self.network, pair)
+            expected = phasorResult.Dispatch(outaged, self.g).flows
+            rows = np.searchsorted(self.network.online, pair)
+            np.testing.assert_allclose(np.delete(flows[:, k], rows), expected, atol=1e-10)
+        self.assertLess(np.sum(report.islanding), len(pairs))
+
+    def test_repeated_pair_is_skipped(self):
+        line = self.network.lineOutages.online[self.network.lineOutages.lines[0]]
+        report = phasorSecurity.security_assessment(self.network, self.g, [[line, line]], margin=-np.inf)
+        self.assertFalse(report.islanding[0])
+        self.assertTrue(np.all(report.pairFlows.toarray() == 0.))
+
+
+if __name__ == '__main__':
+    unittest.main()
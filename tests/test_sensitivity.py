@@ -0,0 +1,170 @@
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.network as phasorNetwork
+import phasor.topology as phasorTopology
+
+
+def _load(name='pglib_opf_case118_ieee.m'):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        network = phasorNetwork.load_case(name)
+        network.makeDC(cache=False)
+    return network
+
+
+def _rebuild(network, status):
+    # ISF of the network with the given branch status, factorized from scratch
+    scenario = network.scenario(branch={'BR_STATUS': status})
+    scenario.makeDC(cache=False)
+    return scenario.ISF.toarray()
+
+
+def _dense_isf(network):
+    Bbus, Bf = network.Bbus.toarray(), network.Bf.toarray()
+    nonslack = np.where(network.bus['BUS_TYPE'] != 3)[0]
+    H = np.zeros((network.n_l, network.n_b))
+    H[:, nonslack] = np.linalg.solve(Bbus[np.ix_(nonslack, nonslack)], Bf[:, nonslack].transpose()).transpose()
+    # Injections are balanced by removing their mean
+    return H - np.mean(H, axis=1, keepdims=True)
+
+
+class TestInjectionShiftFactor(unittest.TestCase):
+    def test_operator(self):
+        network = _load()
+        H = _dense_isf(network)
+        rng = np.random.default_rng(0)
+        x, y = rng.standard_normal((network.n_b, 3)), rng.standard_normal((network.n_l, ))
+
+        for ordering in [None, 'amd', 'rcm']:
+            with self.subTest(ordering=ordering):
+                _, _, _, _, ISF = network.makeDC(setglobal=False, cache=False, ordering=ordering)
+                np.testing.assert_allclose(ISF.toarray(), H, atol=1e-10)
+                np.testing.assert_allclose(ISF.dot(x), H.dot(x), atol=1e-10)
+                np.testing.assert_allclose(ISF.rdot(y), H.transpose().dot(y), atol=1e-10)
+                np.testing.assert_allclose(ISF.columns([4, 0, 17]), H[:, [4, 0, 17]], atol=1e-10)
+                np.testing.assert_allclose(ISF.rows([9, 2]), H[[9, 2], :], atol=1e-10)
+
+
+class TestLineOutages(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.network = _load()
+        with warnings.catch_warnings(record=True) as cls.caught:
+            warnings.simplefilter('always')
+            cls.network.makeDCLineOutages(cache=False)
+
+    def test_skipped_islanding_lines(self):
+        outages = self.network.lineOutages
+        self.assertGreater(len(outages.skipped), 0)
+        self.assertEqual(len(outages) + len(outages.skipped), self.network.n_l)
+        self.assertTrue(any(issubclass(w.category, RuntimeWarning) for w in self.caught))
+
+        # Switching out any of the skipped lines islands the network
+        network = _load()
+        for line in outages.skipped:
+            with self.assertRaises(ValueError):
+                network.setBranchStatus(line, 0, cache=False)
+
+    def test_outage_isf_matches_rebuild(self):
+        outages = self.network.lineOutages
+        for k in range(0, len(outages), 23):
+            status = np.array(self.network.branch['BR_STATUS'])
+            status[outages.online[outages.lines[k]]] = 0.
+            np.testing.assert_allclose(outages.isf(k).toarray(), _rebuild(self.network, status), atol=1e-10)
+
+    def test_post_outage_flows(self):
+        outages = self.network.lineOutages
+        x = np.random.default_rng(0).standard_normal((2, self.network.n_b))
+        flow = np.stack([self.network.ISF.dot(xt) for xt in x])
+
+        F = outages.flows(flow)
+        self.assertEqual(F.shape, (2, self.network.n_l, len(outages)))
+        np.testing.assert_allclose(outages.flows(flow[0]), F[0])
+        np.testing.assert_allclose(outages.flows(flow[0], slice(5, 9)), F[0, :, 5:9])
+        for k in range(0, len(outages), 23):
+            np.testing.assert_allclose(F[:, outages.lines[k], k], 0., atol=1e-10)
+            for t in range(2):
+                np.testing.assert_allclose(np.delete(F[t, :, k], outages.lines[k]), outages.isf(k).dot(x[t]),
+                                           atol=1e-10)
+
+    def test_parallel_lodf(self):
+        network = _load()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            network.makeDCLineOutages(workers=2, cache=False)
+        np.testing.assert_allclose(network.lineOutages.LODF, self.network.lineOutages.LODF, atol=1e-12)
+        np.testing.assert_array_equal(network.lineOutages.skipped, self.network.lineOutages.skipped)
+
+
+class TestSetBranchStatus(unittest.TestCase):
+    def test_modified_isf_matches_rebuild(self):
+        network = _load()
+        base = network.ISF
+        status = np.array(network.branch['BR_STATUS'])
+
+        network.setBranchStatus([10, 50], 0, cache=False)
+        status[[10, 50]] = 0.
+        np.testing.assert_allclose(network.ISF.toarray(), _rebuild(network, status), atol=1e-10)
+        self.assertEqual(network.n_l, len(network.online))
+
+        network.setBranchStatus(10, 1, cache=False)
+        status[10] = 1.
+        np.testing.assert_allclose(network.ISF.toarray(), _rebuild(network, status), atol=1e-10)
+
+        network.setBranchStatus(50, 1, cache=False)
+        self.assertIs(network.ISF, base)
+
+    def test_islanding_switch_is_rejected(self):
+        network = _load()
+        status = np.array(network.branch['BR_STATUS'])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            network.makeDCLineOutages(cache=False)
+        line = network.lineOutages.skipped[0]
+
+        with self.assertRaises(ValueError):
+            network.setBranchStatus(line, 0, cache=False)
+        np.testing.assert_array_equal(network.branch['BR_STATUS'], status)
+
+    def test_islanding_switch_without_dc_matrices(self):
+        network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        status = network.branch['BR_STATUS']
+
+        # Branch 183 is the only branch to bus 117
+        with self.assertRaises(ValueError):
+            network.setBranchStatus(183, 0, cache=False)
+        self.assertIs(network.branch['BR_STATUS'], status)
+
+        network = phasorNetwork.load_case('pglib_opf_case118_ieee.m')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            network.makeDCLineOutages(cache=False)
+        network.ISF = None
+        network.setBranchStatus(10, 0, cache=False)
+        self.assertIsNone(network.lineOutages)
+        self.assertEqual(network.n_l, len(network.online))
+        status = np.array(status)
+        status[10] = 0.
+        np.testing.assert_allclose(network.ISF.toarray(), _rebuild(network, status), atol=1e-10)
+
+    def test_topology_cache(self):
+        cache = phasorTopology.TopologyCache()
+        network = _load()
+        network.makeDC(cache=cache)
+        network.setBranchStatus(10, 0, cache=cache)
+        modified = network.ISF
+        network.setBranchStatus(10, 1, cache=cache)
+        base = network.ISF
+
+        network.setBranchStatus(10, 0, cache=cache)
+        self.assertIs(network.ISF, modified)
+        other = _load()
+        other.makeDC(cache=cache)
+        self.assertIs(other.ISF, base)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+import phasor.ed as phasorED
+import phasor.network as phasorNetwork
+import phasor.service as phasorService
+
+CASE = 'pglib_opf_case14_ieee.m'
+
+
+class TestDispatchService(unittest.TestCase):
+    def test_batched_economic_dispatch(self):
+        network = phasorNetwork.load_case(CASE)
+        scale = np.linspace(0.8, 1.1, 6)
+        pd = scale[:, None] * network.bus['PD'][None, :]
+        expected = phasorED.EconomicDispatch(network, 'highs').solveMany(pd)['fun']
+
+        async def main():
+            async with phasorService.DispatchService([CASE], workers=2, backend='highs') as service:
+                client = phasorService.Client(service)
+                responses = await asyncio.gather(*[client.ed(CASE, pd=pd[t]) for t in range(len(pd))])
+                responses += await asyncio.gather(*[client.ed(CASE, pd=pd[t]) for t in range(len(pd))])
+                return service, responses
+
+        service, responses = asyncio.run(main())
+        np.testing.assert_allclose([r['fun'] for r in responses], np.tile(expected, 2), rtol=1e-9)
+        self.assertEqual(list(service.models), [(CASE, 'ISF')])
+        self.assertLess(service.stats()['batches'], len(responses))
+        self.assertEqual(service.stats()['errors'], 0)
+
+    def test_invalid_demand(self):
+        network = phasorNetwork.load_case(CASE)
+
+        async def main():
+            async with phasorService.DispatchService([CASE], backend='highs') as service:
+                client = phasorService.Client(service)
+                return await asyncio.gather(client.ed(CASE, pd=network.bus['PD']), client.ed(CASE, pd=[1., 2.]),
+                                            client.ed(CASE, pd=network.bus['PD']), return_exceptions=True)
+
+        responses = asyncio.run(main())
+        self.assertIsInstance(responses[1], ValueError)
+        self.assertAlmostEqual(responses[0]['fun'], responses[2]['fun'])
+
+    def test_rsced_is_not_batched(self):
+        async def main():
+            async with phasorService.DispatchService([CASE], backend='highs') as service:
+                client = phasorService.Client(service)
+                responses = await asyncio.gather(client.rsced(CASE), client.rsced(CASE))
+                return service, responses
+
+        service, responses = asyncio.run(main())
+        self.assertEqual([r['batch'] for r in responses], [1, 1])
+        self.assertAlmostEqual(responses[0]['fun'], responses[1]['fun'])
+        self.assertEqual(len(responses[0]['PG']), service.networks[CASE].n_g)
+
+
+if __name__ == '__main__':
+    unittest.main()
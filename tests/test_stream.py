@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.ed as phasorED
+import phasor.network as phasorNetwork
+import phasor.sced as phasorSCED
+import phasor.stream as phasorStream
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.network = phasorNetwork.load_case('pglib_opf_case14_ieee.m')
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = lambda name: os.path.join(self.directory.name, name)
+
+        # Demand profile in MW of every other bus
+        rng = np.random.default_rng(0)
+        self.buses = self.network.int2ext[::2]
+        self.profile = self.network.baseMVA * self.network.bus['PD'][::2] * rng.uniform(0.8, 1.1, (7, len(self.buses)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_sources(self):
+        csv = self.path('profile.csv')
+        np.savetxt(csv, self.profile, delimiter=',', header=','.join('%d' % b for b in self.buses), comments='')
+        npy = self.path('profile.npy')
+        np.save(npy, self.profile)
+
+        expected = np.repeat(self.network.bus['PD'][None, :], len(self.profile), axis=0)
+        expected[:, ::2] = self.profile / self.network.baseMVA
+
+        for source, buses in [(csv, None), (npy, self.buses), (self.profile, self.buses)]:
+            chunks = list(phasorStream.load_profile(self.network, source, chunksize=3, buses=buses))
+            self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+            np.testing.assert_allclose(np.concatenate(chunks), expected)
+
+        with self.assertRaises(ValueError):
+            list(phasorStream.load_profile(self.network, self.profile))
+
+    def test_run(self):
+        loads = list(phasorStream.load_profile(self.network, self.profile, chunksize=3, buses=self.buses))
+        ed = phasorED.EconomicDispatch(self.network, 'highs')
+        output = self.path('ed.csv')
+        self.assertEqual(phasorStream.run(ed, loads, output), len(self.profile))
+
+        data = np.loadtxt(output, delimiter=',', skiprows=1)
+        expected = ed.solveMany(np.concatenate(loads))
+        np.testing.assert_array_equal(data[:, 0], np.arange(len(self.profile)))
+        np.testing.assert_allclose(data[:, 1], expected['fun'], rtol=1e-9)
+        np.testing.assert_allclose(data[:, 2:], expected['PG'], atol=1e-8)
+
+    def test_run_rsced(self):
+        self.network.setContingencyLimits()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.network.makeDCLineOutages()
+        PD, prob = self.network.bus['PD'], self.network.lineOutages.prob
+
+        loads = list(phasorStream.load_profile(self.network, self.profile[:2], buses=self.buses))
+        outages = [np.full((2, len(self.network.lineOutages)), 0.01)]
+        model = phasorSCED.RSCED(self.network, 0.5, backend='highs')
+        output = self.path('rsced.csv')
+        phasorStream.run(model, loads, output, outages)
+
+        data = np.loadtxt(output, delimiter=',', skiprows=1)
+        scenario = self.network.scenario(bus={'PD': loads[0][1]}, prob=0.01)
+        self.assertAlmostEqual(data[1, 1], phasorSCED.RSCED(scenario, 0.5, backend='highs').solve()['fun'], places=8)
+        self.assertIs(self.network.bus['PD'], PD)
+        self.assertIs(self.network.lineOutages.prob, prob)
+
+
+if __name__ == '__main__':
+    unittest.main()
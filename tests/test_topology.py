@@ -0,0 +1,65 @@
+import unittest
+import warnings
+
+import numpy as np
+
+import phasor.network as phasorNetwork
+import phasor.topology as phasorTopology
+
+
+class TestTopologyCache(unittest.TestCase):
+    def test_shared_matrices(self):
+        cache = phasorTopology.TopologyCache()
+        a = phasorNetwork.load_case('pglib_opf_case30_ieee.m')
+        b = phasorNetwork.load_case('pglib_opf_case30_ieee.m')
+        a.makeDC(cache=cache)
+        b.makeDC(cache=cache)
+        self.assertIs(a.ISF, b.ISF)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            a.makeDCLineOutages(cache=cache)
+            hits = cache.hits
+            b.makeDCLineOutages(cache=cache)
+        self.assertEqual(cache.hits, hits + 1)
+        self.assertIs(cache.get(phasorTopology.key(a))['LODF'][0], cache.get(phasorTopology.key(b))['LODF'][0])
+        np.testing.assert_array_equal(a.lineOutages.LODF, b.lineOutages.LODF)
+
+    def test_key(self):
+        network = phasorNetwork.load_case('pglib_opf_case30_ieee.m')
+        key = phasorTopology.key(network)
+        self.assertEqual(phasorTopology.key(network.scenario(bus={'PD': 2. * network.bus['PD']})), key)
+
+        status = np.array(network.branch['BR_STATUS'])
+        status[0] = 0.
+        self.assertNotEqual(phasorTopology.key(network.scenario(branch={'BR_STATUS': status})), key)
+
+    def test_eviction(self):
+        cache = phasorTopology.TopologyCache(max_entries=2)
+        for name in ['pglib_opf_case14_ieee.m', 'pglib_opf_case30_ieee.m', 'pglib_opf_case39_epri.m']:
+            phasorNetwork.load_case(name).makeDC(cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(phasorTopology.key(phasorNetwork.load_case('pglib_opf_case14_ieee.m')), cache)
+        self.assertGreater(cache.nbytes(), 0)
+
+        cache = phasorTopology.TopologyCache(max_entries=None, max_bytes=1)
+        for name in ['pglib_opf_case14_ieee.m', 'pglib_opf_case30_ieee.m']:
+            phasorNetwork.load_case(name).makeDC(cache=cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_default_is_bounded(self):
+        self.assertIsNotNone(phasorTopology.default.max_bytes)
+        self.assertIs(phasorTopology.resolve(True), phasorTopology.default)
+
+    def test_no_cache(self):
+        a = phasorNetwork.load_case('pglib_opf_case14_ieee.m')
+        b = phasorNetwork.load_case('pglib_opf_case14_ieee.m')
+        a.makeDC(cache=False)
+        b.makeDC(cache=False)
+        self.assertIsNot(a.ISF, b.ISF)
+        np.testing.assert_allclose(a.ISF.toarray(), b.ISF.toarray())
+
+
+if __name__ == '__main__':
+    unittest.main()